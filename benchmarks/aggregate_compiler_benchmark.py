@@ -0,0 +1,57 @@
+"""
+Measures the streaming transform throughput of the example BTSs with the fields of the aggregates
+evaluated by a generated function per aggregate compared to evaluating each field expression, with
+and without skipping the fields that a record does not affect.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/aggregate_compiler_benchmark.py
+"""
+import os
+import tempfile
+import timeit
+
+import yaml
+
+from blurr.core.aggregate import AggregateSchema
+from blurr.runner.local_runner import LocalRunner
+
+EXAMPLES = [
+    ('tutorial', 'docs/examples/tutorial/tutorial2-streaming-bts.yml',
+     'docs/examples/tutorial/tutorial2-data.log'),
+    ('offer-ai', 'docs/examples/offer-ai/offer-ai-streaming-bts.yml',
+     'docs/examples/offer-ai/generated-events.json'),
+]
+
+
+def get_stream_bts_file(stream_bts_file: str, directory: str) -> str:
+    """ Copies the BTS adding the dateutil import that the offer-ai example relies on """
+    with open(stream_bts_file) as bts_file:
+        bts = yaml.safe_load(bts_file)
+    bts.setdefault('Import', [{'Module': 'dateutil', 'Identifiers': ['parser']}])
+    file_name = os.path.join(directory, os.path.basename(stream_bts_file))
+    with open(file_name, 'w') as bts_file:
+        yaml.safe_dump(bts, bts_file)
+    return file_name
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for label, stream_bts_file, data_file in EXAMPLES:
+            runner = LocalRunner(get_stream_bts_file(stream_bts_file, directory), None)
+            identity_records = runner.get_identity_records_from_json_files([data_file])
+            records = sum(len(records) for records in identity_records.values())
+
+            for mode, compile_fields, skip_fields in [('interpreted', False, False),
+                                                      ('compiled', True, False),
+                                                      ('compiled+skip', True, True)]:
+                AggregateSchema.COMPILE_FIELDS = compile_fields
+                AggregateSchema.SKIP_UNAFFECTED_FIELDS = skip_fields
+                runner = LocalRunner(get_stream_bts_file(stream_bts_file, directory), None)
+                seconds = min(
+                    timeit.repeat(lambda: runner.execute(identity_records), number=1, repeat=3))
+                print('{:<10} {:<14} {:>8.1f} us/record'.format(label, mode,
+                                                                seconds / records * 1e6))
+
+
+if __name__ == '__main__':
+    main()
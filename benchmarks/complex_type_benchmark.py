@@ -0,0 +1,94 @@
+"""
+Measures the evaluation of map, list and set heavy field expressions, as done by the `Value`
+expressions of a BTS, with the methods of the complex types wrapped once when the types are
+created compared to wrapping the methods on every attribute access.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/complex_type_benchmark.py [<evaluations>]
+"""
+import sys
+import timeit
+
+from blurr.core.field_complex import Map, List, Set
+
+EXPRESSIONS = {
+    'map': 'counts.increment(source.key).set("last", source.value)',
+    'list': 'items.append(source.value).append(source.key)',
+    'set': 'keys.add(source.key).add(source.value)',
+}
+
+
+class DynamicallyWrapped:
+    """ Wraps the methods of the types on every attribute access, as done before """
+
+    def __getattribute__(self, item):
+        attribute = super().__getattribute__(item)
+        if not callable(attribute) or (item.startswith('__') and item.endswith('__')):
+            return attribute
+
+        def wrapped_attribute(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if result is None:
+                return self
+            self_type = type(self)
+            if isinstance(result, self_type.__bases__) and not isinstance(result, self_type):
+                return self_type(result)
+            return result
+
+        return wrapped_attribute
+
+
+class DynamicMap(DynamicallyWrapped, dict):
+    def set(self, key, value):
+        if key is not None:
+            self[key] = value
+
+    def increment(self, key, by=1):
+        if key is not None:
+            self[key] = self.get(key, 0) + by
+
+
+class DynamicList(DynamicallyWrapped, list):
+    def append(self, obj):
+        if obj is not None:
+            super().append(obj)
+
+
+class DynamicSet(DynamicallyWrapped, set):
+    def add(self, element):
+        if element is not None:
+            super().add(element)
+
+
+class Source:
+    key = 'key'
+    value = 10
+
+
+def measure(evaluations: int, map_type, list_type, set_type) -> None:
+    context = {'counts': map_type(), 'items': list_type(), 'keys': set_type(), 'source': Source()}
+    for name, expression in EXPRESSIONS.items():
+        code = compile(expression, '<benchmark>', 'eval')
+        seconds = min(
+            timeit.repeat(
+                'for _ in range(evaluations): eval(code, context)',
+                globals={
+                    'evaluations': evaluations,
+                    'code': code,
+                    'context': context
+                },
+                number=1,
+                repeat=3))
+        print('  {:<5} {:>8.3f} us/evaluation'.format(name, seconds / evaluations * 1e6))
+
+
+def main() -> None:
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('wrapped on access')
+    measure(evaluations, DynamicMap, DynamicList, DynamicSet)
+    print('wrapped once')
+    measure(evaluations, Map, List, Set)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures the events per second processed by the json data processor, with the json and orjson (if
+installed) parsers, when the records only keep the keys that the streaming BTS reads compared to
+keeping the whole event, and the size of the pickled records that the runners spill or ship to
+other processes. The events of tests/data/raw.json are repeated, as is and with keys added that
+the BTS does not read.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/data_processor_benchmark.py [<events>]
+"""
+import json
+import pickle
+import sys
+import timeit
+
+from blurr.runner import data_processor
+from blurr.runner.data_processor import SimpleJsonDataProcessor
+from blurr.runner.local_runner import LocalRunner
+
+STREAM_BTS = 'tests/data/stream.yml'
+RAW_DATA = 'tests/data/raw.json'
+
+
+def generate_events(count: int, extra_keys: int):
+    with open(RAW_DATA) as raw_file:
+        events = [json.loads(line) for line in raw_file]
+    lines = []
+    for i in range(count):
+        event = dict(events[i % len(events)])
+        event.update({
+            'extra_{}'.format(j): {
+                'id': j,
+                'tags': ['a', 'b']
+            }
+            for j in range(extra_keys)
+        })
+        lines.append(json.dumps(event).encode('utf-8'))
+    return lines
+
+
+def process(processor: SimpleJsonDataProcessor, lines) -> None:
+    for line in lines:
+        processor.process_data(line)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runner = LocalRunner(STREAM_BTS, None)
+    projection = runner._get_streaming_transformer_schema(runner._schema_loader).source_projection
+    backends = [('json', None)] + ([('orjson', data_processor.orjson)]
+                                   if data_processor.orjson else [])
+
+    for extra_keys in [0, 20]:
+        lines = generate_events(count, extra_keys)
+        for backend, orjson in backends:
+            data_processor.orjson = orjson
+            for mode, processor in [('full', SimpleJsonDataProcessor()),
+                                    ('projected', SimpleJsonDataProcessor().project(projection))]:
+                seconds = min(timeit.repeat(lambda: process(processor, lines), number=1, repeat=3))
+                record_size = len(
+                    pickle.dumps(processor.process_data(lines[0])[0], pickle.HIGHEST_PROTOCOL))
+                print('{:>2} extra keys {:<7} {:<10} {:>9.0f} events/s {:>5} bytes/record'.format(
+                    extra_keys, backend, mode, count / seconds, record_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Measures the window BTS execution time of an identity with many blocks, and the parsing of the
+block keys, when the block times written with `isoformat()` are parsed by
+`blurr.core.datetime_parser` compared to `dateutil.parser.parse()`.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/datetime_benchmark.py [<blocks>]
+"""
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import yaml
+from dateutil import parser
+
+from blurr.core import field_simple, store_key
+from blurr.core.datetime_parser import parse_datetime
+from blurr.core.store_key import Key, KeyType
+from blurr.core.type import Type
+from blurr.runner.local_runner import LocalRunner
+
+IDENTITY = 'user0'
+
+STREAM_BTS = {
+    'Type': Type.BLURR_TRANSFORM_STREAMING.value,
+    'Version': '2018-03-01',
+    'Name': 'sessions',
+    'Identity': 'source.user_id',
+    'Time': 'source.event_time',
+    'Stores': [{
+        'Type': Type.BLURR_STORE_MEMORY.value,
+        'Name': 'memory'
+    }],
+    'Aggregates': [{
+        'Type': Type.BLURR_AGGREGATE_ACTIVITY.value,
+        'Name': 'session',
+        'SeparateByInactiveSeconds': 1800,
+        'Store': 'memory',
+        'Fields': [{
+            'Name': 'events',
+            'Type': Type.INTEGER.value,
+            'Value': 'session.events + 1'
+        }]
+    }]
+}
+
+WINDOW_BTS = {
+    'Type': Type.BLURR_TRANSFORM_WINDOW.value,
+    'Version': '2018-03-01',
+    'Name': 'windows',
+    'Anchor': {
+        'Condition': 'sessions.session.events % 100 == 0'
+    },
+    'Aggregates': [{
+        'Type': Type.BLURR_AGGREGATE_WINDOW.value,
+        'Name': 'last_sessions',
+        'WindowType': Type.COUNT.value,
+        'WindowValue': -20,
+        'Source': 'sessions.session',
+        'Fields': [{
+            'Name': 'events',
+            'Type': Type.INTEGER.value,
+            'Value': 'sum(source.events)'
+        }]
+    }]
+}
+
+
+def generate_state(blocks: int):
+    start = datetime(2018, 3, 7, tzinfo=timezone.utc)
+    state = {}
+    for i in range(blocks):
+        start_time = start + timedelta(hours=i)
+        state[Key(KeyType.TIMESTAMP, IDENTITY, 'session', [], start_time)] = {
+            '_identity': IDENTITY,
+            '_start_time': start_time.isoformat(),
+            '_end_time': (start_time + timedelta(minutes=10)).isoformat(),
+            'events': i + 1
+        }
+    return state
+
+
+def set_parser(parse) -> None:
+    field_simple.parse_datetime = parse
+    store_key.parse_datetime = parse
+
+
+def main() -> None:
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    state = generate_state(blocks)
+    key_strings = [str(key) for key in state]
+    with tempfile.TemporaryDirectory() as directory:
+        bts_files = []
+        for name, bts in [('stream.yml', STREAM_BTS), ('window.yml', WINDOW_BTS)]:
+            bts_files.append(os.path.join(directory, name))
+            with open(bts_files[-1], 'w') as bts_file:
+                yaml.safe_dump(bts, bts_file)
+        runner = LocalRunner(*bts_files)
+
+        for mode, parse in [('dateutil', parser.parse), ('isoformat', parse_datetime)]:
+            set_parser(parse)
+            seconds = min(
+                timeit.repeat(
+                    lambda: runner.execute_per_identity_records(IDENTITY, [], dict(state)),
+                    number=1,
+                    repeat=3))
+            key_seconds = min(
+                timeit.repeat(
+                    lambda: [Key.parse(key_string) for key_string in key_strings],
+                    number=1,
+                    repeat=3))
+            print('{:<10} window run {:>8.0f} ms, key parsing {:>6.2f} us/key'.format(
+                mode, seconds * 1e3, key_seconds / blocks * 1e6))
+    set_parser(parse_datetime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures the memory and the creation, hashing, lookup, sorting and formatting throughput of
+store keys, as used by the stores and the runners.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/key_benchmark.py [<keys>]
+"""
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from blurr.core.store_key import Key, KeyType
+
+IDENTITIES = 1000
+
+
+def create_keys(count: int):
+    start = datetime(2018, 3, 7, tzinfo=timezone.utc)
+    return [
+        Key(KeyType.TIMESTAMP, 'user{}'.format(i % IDENTITIES), 'session', [],
+            start + timedelta(minutes=i)) for i in range(count)
+    ]
+
+
+def measure(name: str, function, count: int) -> None:
+    seconds = min(timeit.repeat(function, number=1, repeat=3))
+    print('{:<8} {:>8.3f} us/key'.format(name, seconds / count * 1e6))
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    tracemalloc.start()
+    keys = create_keys(count)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<8} {:>8.0f} bytes/key'.format('memory', memory / count))
+
+    items = dict.fromkeys(keys)
+    copies = [Key(key.key_type, key.identity, key.group, [], key.timestamp) for key in keys]
+    measure('create', lambda: create_keys(count), count)
+    measure('hash', lambda: [hash(key) for key in keys], count)
+    measure('lookup', lambda: [key in items for key in copies], count)
+    measure('sort', lambda: sorted(reversed(keys)), count)
+    measure('str', lambda: [str(key) for key in keys], count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures MemoryStore save, get_all and range query throughput as the number of keys in the store
+grows. Each identity holds 5 TIMESTAMP and 5 DIMENSION keys.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/memory_store_benchmark.py [<keys> ...]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.store_key import Key, KeyType
+from blurr.core.type import Type
+from blurr.store.memory_store import MemoryStore
+
+BLOCKS_PER_IDENTITY = 5
+QUERIES = 1000
+START = datetime(2018, 3, 7, tzinfo=timezone.utc)
+
+
+def get_memory_store() -> MemoryStore:
+    schema_loader = SchemaLoader()
+    name = schema_loader.add_schema_spec({'Name': 'memstore', 'Type': Type.BLURR_STORE_MEMORY})
+    return schema_loader.get_store(name)
+
+
+def populate(store: MemoryStore, identities: int) -> None:
+    for i in range(identities):
+        identity = 'user{}'.format(i)
+        for j in range(BLOCKS_PER_IDENTITY):
+            start_time = START + timedelta(hours=j)
+            item = {'events': j, '_start_time': start_time.isoformat()}
+            store.save(Key(KeyType.TIMESTAMP, identity, 'session', [], start_time), dict(item))
+            store.save(Key(KeyType.DIMENSION, identity, 'session_dim', [str(j)]), dict(item))
+
+
+def measure(label: str, queries: int, function) -> None:
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print('    {:<24} {:>10.1f} us/op'.format(label, elapsed / queries * 1e6))
+
+
+def main(sizes) -> None:
+    for keys in sizes:
+        identities = keys // (2 * BLOCKS_PER_IDENTITY)
+        store = get_memory_store()
+        print('{} keys'.format(keys))
+        measure('save', keys, lambda: populate(store, identities))
+
+        sample = ['user{}'.format(random.randrange(identities)) for _ in range(QUERIES)]
+        anchor = START + timedelta(hours=BLOCKS_PER_IDENTITY // 2)
+        measure('get_all', QUERIES, lambda: [store.get_all(identity) for identity in sample])
+        measure('get_range timestamp', QUERIES, lambda: [
+            store.get_range(Key(KeyType.TIMESTAMP, identity, 'session'), anchor, None, -2)
+            for identity in sample
+        ])
+        measure('get_range dimension', QUERIES, lambda: [
+            store.get_range(
+                Key(KeyType.DIMENSION, identity, 'session_dim'), anchor, anchor + timedelta(
+                    hours=2)) for identity in sample
+        ])
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 100000, 1000000])
@@ -0,0 +1,78 @@
+"""
+Measures nested attribute access on records, as done by the expressions of a BTS, with the nested
+views cached in the record compared to wrapping the nested values on every access.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/record_benchmark.py [<accesses per record>]
+"""
+import sys
+import timeit
+from typing import Any
+
+from blurr.core.record import Record
+
+RECORDS = 10000
+EXPRESSION = compile('source.event.user.country', '<benchmark>', 'eval')
+
+
+def wrap(value: Any) -> Any:
+    if isinstance(value, dict):
+        return UncachedRecord(value)
+    elif isinstance(value, list) and len(value) > 0:
+        return UncachedRecordList(value)
+    return value
+
+
+class UncachedRecord(dict):
+    """ Record that wraps nested values on every access """
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError('Record object has no {} attribute.'.format(name))
+        return wrap(self[name]) if name in self else None
+
+    def __getitem__(self, item):
+        return wrap(super().__getitem__(item)) if item in self else None
+
+
+class UncachedRecordList(list):
+    def __getitem__(self, item):
+        return wrap(super().__getitem__(item))
+
+
+def generate_events():
+    return [{
+        'event': {
+            'id': i,
+            'user': {
+                'id': 'user{}'.format(i % 100),
+                'country': 'US',
+                'devices': ['ios', 'android']
+            },
+            'items': [{
+                'price': 10
+            }, {
+                'price': 20
+            }]
+        }
+    } for i in range(RECORDS)]
+
+
+def access(record_type: type, events, accesses: int) -> None:
+    for event in events:
+        context = {'source': record_type(event)}
+        for _ in range(accesses):
+            eval(EXPRESSION, context)
+
+
+def main() -> None:
+    accesses = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    events = generate_events()
+    for label, record_type in [('uncached', UncachedRecord), ('cached', Record)]:
+        seconds = min(timeit.repeat(lambda: access(record_type, events, accesses), number=1,
+                                    repeat=5))
+        print('{:<10} {:>8.3f} us/access'.format(label, seconds / (RECORDS * accesses) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Measures the per identity overhead of the runner when the compiled schema is reused across
+identities compared to rebuilding it for every identity.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/runner_benchmark.py [<identities>]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from blurr.core.record import Record
+from blurr.runner.local_runner import LocalRunner
+
+STREAM_BTS = 'tests/data/stream.yml'
+WINDOW_BTS = 'tests/data/window.yml'
+
+
+def generate_identity_records(identities: int):
+    start = datetime(2018, 3, 7, 22, 35, 31, tzinfo=timezone.utc)
+    identity_records = {}
+    for i in range(identities):
+        identity = 'user{}'.format(i)
+        identity_records[identity] = [(start + timedelta(minutes=j),
+                                       Record({
+                                           'user_id': identity,
+                                           'event_time': (start + timedelta(minutes=j)).isoformat(),
+                                           'country': 'US'
+                                       })) for j in range(2)]
+    return identity_records
+
+
+def run(runner: LocalRunner, identity_records, rebuild_schema: bool) -> None:
+    for identity, records in identity_records.items():
+        if rebuild_schema:
+            runner._compiled_schema_loader = None
+        runner.execute_per_identity_records(identity, list(records))
+
+
+def main(identities: int) -> None:
+    identity_records = generate_identity_records(identities)
+    runner = LocalRunner(STREAM_BTS, WINDOW_BTS)
+
+    for label, rebuild_schema in [('schema per identity', True), ('schema per runner', False)]:
+        seconds = min(
+            timeit.repeat(
+                lambda: run(runner, identity_records, rebuild_schema), number=1, repeat=3))
+        print('{:<20} {:>8.1f} us/identity'.format(label, seconds / identities * 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
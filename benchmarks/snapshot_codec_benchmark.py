@@ -0,0 +1,51 @@
+"""
+Compares the size and the encode and decode time of the aggregate snapshots of a streaming BTS
+with the binary snapshot codec against the JSON written by the local runner.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/snapshot_codec_benchmark.py [<streaming-bts> <raw-data>]
+"""
+import json
+import sys
+import timeit
+
+from blurr.core.snapshot_codec import BinarySnapshotCodec, msgpack
+from blurr.runner.json_encoder import BlurrJSONEncoder
+from blurr.runner.local_runner import LocalRunner
+
+
+def measure(name: str, function, count: int, size: int) -> None:
+    seconds = min(timeit.repeat(function, number=1, repeat=5))
+    print('{:<14} {:>8.2f} us/snapshot {:>8.1f} bytes/snapshot'.format(
+        name, seconds / count * 1e6, size / count))
+
+
+def main() -> None:
+    stream_bts_file, data_file = sys.argv[1:3] if len(sys.argv) > 2 else (
+        'docs/examples/tutorial/tutorial2-streaming-bts.yml',
+        'docs/examples/tutorial/tutorial2-data.log')
+    runner = LocalRunner(stream_bts_file)
+    output = runner.execute(runner.get_identity_records_from_json_files([data_file]))
+    snapshots = [(runner._get_aggregate_schema(key), snapshot)
+                 for block_data, _ in output.values() for key, snapshot in block_data.items()]
+    count = len(snapshots)
+    print('{} snapshots, binary codec packed with {}'.format(
+        count, 'msgpack' if msgpack else 'JSON'))
+
+    json_data = [json.dumps(snapshot, cls=BlurrJSONEncoder) for _, snapshot in snapshots]
+    measure('json encode', lambda: [json.dumps(s, cls=BlurrJSONEncoder) for _, s in snapshots],
+            count, sum(len(data.encode('utf-8')) for data in json_data))
+    measure('json decode', lambda: [json.loads(data) for data in json_data], count, 0)
+
+    codec = BinarySnapshotCodec()
+    binary_data = [(schema, codec.encode(schema, snapshot)) for schema, snapshot in snapshots]
+    assert [codec.decode(schema, data) for schema, data in binary_data] == [
+        snapshot for _, snapshot in snapshots]
+    measure('binary encode', lambda: [codec.encode(schema, s) for schema, s in snapshots], count,
+            sum(len(data) for _, data in binary_data))
+    measure('binary decode', lambda: [codec.decode(schema, data) for schema, data in binary_data],
+            count, 0)
+
+
+if __name__ == '__main__':
+    main()
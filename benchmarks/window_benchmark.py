@@ -0,0 +1,124 @@
+"""
+Measures the window BTS execution time of identities with many blocks, with an anchor on every
+block, when the window is slid over the blocks of the identity compared to reading and restoring
+the blocks of every window from the store, with and without the restored blocks cached and shared
+by the two window aggregates.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/window_benchmark.py [<blocks per identity>]
+"""
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import yaml
+
+from blurr.core.aggregate_window import WindowAggregateSchema
+from blurr.core.block_cache import BlockCache
+from blurr.core.record import Record
+from blurr.core.type import Type
+from blurr.runner.local_runner import LocalRunner
+
+IDENTITIES = 5
+WINDOW_COUNT = 20
+
+STREAM_BTS = {
+    'Type': Type.BLURR_TRANSFORM_STREAMING.value,
+    'Version': '2018-03-01',
+    'Name': 'sessions',
+    'Import': [{
+        'Module': 'dateutil.parser',
+        'Identifiers': ['parse']
+    }],
+    'Identity': 'source.user_id',
+    'Time': 'parse(source.event_time)',
+    'Stores': [{
+        'Type': Type.BLURR_STORE_MEMORY.value,
+        'Name': 'memory'
+    }],
+    'Aggregates': [{
+        'Type': Type.BLURR_AGGREGATE_ACTIVITY.value,
+        'Name': 'session',
+        'SeparateByInactiveSeconds': 1800,
+        'Store': 'memory',
+        'Fields': [{
+            'Name': 'events',
+            'Type': Type.INTEGER.value,
+            'Value': 'session.events + 1'
+        }]
+    }]
+}
+
+WINDOW_BTS = {
+    'Type': Type.BLURR_TRANSFORM_WINDOW.value,
+    'Version': '2018-03-01',
+    'Name': 'windows',
+    'Anchor': {
+        'Condition': 'sessions.session.events > 0'
+    },
+    'Aggregates': [{
+        'Type': Type.BLURR_AGGREGATE_WINDOW.value,
+        'Name': 'last_sessions',
+        'WindowType': Type.COUNT.value,
+        'WindowValue': -WINDOW_COUNT,
+        'Source': 'sessions.session',
+        'Fields': [{
+            'Name': 'events',
+            'Type': Type.INTEGER.value,
+            'Value': 'sum(source.events)'
+        }]
+    }, {
+        'Type': Type.BLURR_AGGREGATE_WINDOW.value,
+        'Name': 'next_day',
+        'WindowType': Type.DAY.value,
+        'WindowValue': 1,
+        'Source': 'sessions.session',
+        'Fields': [{
+            'Name': 'events',
+            'Type': Type.INTEGER.value,
+            'Value': 'sum(source.events)'
+        }]
+    }]
+}
+
+
+def generate_identity_records(blocks: int):
+    start = datetime(2018, 3, 7, tzinfo=timezone.utc)
+    identity_records = {}
+    for i in range(IDENTITIES):
+        identity = 'user{}'.format(i)
+        identity_records[identity] = [(start + timedelta(hours=j),
+                                       Record({
+                                           'user_id': identity,
+                                           'event_time': (start + timedelta(hours=j)).isoformat()
+                                       })) for j in range(blocks)]
+    return identity_records
+
+
+def main() -> None:
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    identity_records = generate_identity_records(blocks)
+    with tempfile.TemporaryDirectory() as directory:
+        bts_files = []
+        for name, bts in [('stream.yml', STREAM_BTS), ('window.yml', WINDOW_BTS)]:
+            bts_files.append(os.path.join(directory, name))
+            with open(bts_files[-1], 'w') as bts_file:
+                yaml.safe_dump(bts, bts_file)
+
+        max_size = BlockCache.MAX_SIZE
+        for mode, incremental, cache_size in [('store range', False, 0),
+                                              ('store range, cached', False, max_size),
+                                              ('incremental', True, 0),
+                                              ('incremental, cached', True, max_size)]:
+            WindowAggregateSchema.INCREMENTAL_WINDOWS = incremental
+            BlockCache.MAX_SIZE = cache_size
+            runner = LocalRunner(*bts_files)
+            seconds = min(
+                timeit.repeat(lambda: runner.execute(identity_records), number=1, repeat=3))
+            print('{:<20} {:>8.1f} ms/identity'.format(mode, seconds / IDENTITIES * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures the evaluation of window field expressions that aggregate a field of the window blocks
+(`sum`, `mean`, `max` and the 90th percentile of `source.events`), with the field values gathered
+for every reference compared to once per window, and aggregated in python compared to NumPy (when
+installed) for windows of different sizes.
+
+Usage (from blurr's base directory):
+    PYTHONPATH=. python benchmarks/window_column_benchmark.py
+"""
+import timeit
+from random import Random
+from types import SimpleNamespace
+
+from blurr.core import aggregate_window
+from blurr.core.aggregate_window import _WindowSource, WindowColumn
+
+WINDOWS = 20
+
+UNCACHED_EXPRESSIONS = [
+    'sum(source.events)', 'sum(source.events) / len(source.events)', 'max(source.events)',
+    'sorted(source.events)[int(len(source.events) * 0.9)]'
+]
+COLUMN_EXPRESSIONS = [
+    'source.events.sum()', 'source.events.mean()', 'source.events.max()',
+    'source.events.percentile(90)'
+]
+
+
+class UncachedWindowSource:
+    """ Window source that gathers the field values on every reference """
+
+    def __init__(self, block_list) -> None:
+        self.view = block_list
+
+    def __getattr__(self, item: str):
+        return [getattr(block, item) for block in self.view]
+
+
+def evaluate(window_source_type: type, expressions, blocks) -> None:
+    code = [compile(expression, '<benchmark>', 'eval') for expression in expressions]
+    for _ in range(WINDOWS):
+        context = {'source': window_source_type(blocks)}
+        for expression in code:
+            eval(expression, context)
+
+
+def main() -> None:
+    numpy = aggregate_window.numpy
+    modes = [('uncached', UncachedWindowSource, UNCACHED_EXPRESSIONS, None, None),
+             ('columns', _WindowSource, COLUMN_EXPRESSIONS, None, None)]
+    if numpy:
+        modes.append(('numpy', _WindowSource, COLUMN_EXPRESSIONS, numpy, 0))
+        modes.append(('default', _WindowSource, COLUMN_EXPRESSIONS, numpy, None))
+
+    default_min_length = WindowColumn.NUMPY_MIN_LENGTH
+    for block_count in [100, 1000, 10000, 100000]:
+        random = Random(0)
+        blocks = [SimpleNamespace(events=random.randint(0, 1000)) for _ in range(block_count)]
+        for mode, window_source_type, expressions, numpy_module, min_length in modes:
+            aggregate_window.numpy = numpy_module
+            WindowColumn.NUMPY_MIN_LENGTH = default_min_length if min_length is None else min_length
+            seconds = min(
+                timeit.repeat(
+                    lambda: evaluate(window_source_type, expressions, blocks), number=1, repeat=3))
+            print('{:>6} blocks {:<10} {:>10.1f} us/window'.format(block_count, mode,
+                                                                   seconds / WINDOWS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 """
 Usage:
     blurr validate [--debug] [<BTS> ...]
-    blurr transform [--debug] [--runner=<runner>] [--streaming-bts=<bts-file>] [--window-bts=<bts-file>] [--data-processor=<data-processor>] (--source=<raw-json-files> | <raw-json-files>)
+    blurr transform [--debug] [--runner=<runner>] [--streaming-bts=<bts-file>] [--window-bts=<bts-file>] [--data-processor=<data-processor>] [--workers=<n>] [--memory-budget=<mb>] (--source=<raw-json-files> | <raw-json-files>)
     blurr package-spark [--debug] [--source-dir=<dir>] [--target=<zip-file>]
     blurr -h | --help
 
@@ -39,6 +39,12 @@ Options:
                                         Possible values:
                                         simple - One event dictionary per line in the source file(s). <default>
                                         ipfix - Processor for IpFix format.
+    --workers=<n>               Number of processes the local runner shards identities
+                                across. [default: 1]
+    --memory-budget=<mb>        Runs the local runner in streaming mode where records are
+                                sorted by identity on disk, using at most around <mb>
+                                megabytes of memory for buffering records, and the output
+                                of each identity is written as soon as it is processed.
     --source-dir=<dir>          A directory containing a Spark app to be packaged. [default: ./]
     --target=<zip-file>         Filename of the generated Spark app zipfile. [default: spark-app.zip]
 """
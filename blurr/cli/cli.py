@@ -15,6 +15,7 @@ def cli(arguments: Dict[str, Any]) -> int:
         elif arguments['<raw-json-files>'] is not None:
             source = arguments['<raw-json-files>'].split(',')
         return transform(arguments['--runner'], arguments['--streaming-bts'],
-                         arguments['--window-bts'], arguments['--data-processor'], source)
+                         arguments['--window-bts'], arguments['--data-processor'], source,
+                         arguments.get('--workers'), arguments.get('--memory-budget'))
     elif arguments['package-spark']:
         return package_spark(arguments['--source-dir'], arguments['--target'])
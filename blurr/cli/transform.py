@@ -15,7 +15,9 @@ DATA_PROCESSOR_CLASS = {'ipfix': IpfixDataProcessor, 'simple': SimpleJsonDataPro
 
 
 def transform(runner: Optional[str], stream_bts_file: Optional[str], window_bts_file: Optional[str],
-              data_processor: Optional[str], raw_json_files: List[str]) -> int:
+              data_processor: Optional[str], raw_json_files: List[str],
+              workers: Optional[str] = None,
+              memory_budget: Optional[str] = None) -> int:
     if stream_bts_file is None and window_bts_file is None:
         stream_bts_file, window_bts_file = get_stream_window_bts_files(
             get_valid_yml_files(get_yml_files()))
@@ -40,9 +42,28 @@ def transform(runner: Optional[str], stream_bts_file: Optional[str], window_bts_
             runner, list(DATA_PROCESSOR_CLASS.keys())))
         return 1
 
+    if not workers:
+        workers = '1'
+
+    if not workers.isdigit() or int(workers) < 1:
+        eprint('Invalid workers: \'{}\'. Must be a positive integer.'.format(workers))
+        return 1
+
+    if memory_budget is not None and (not memory_budget.isdigit() or int(memory_budget) < 1):
+        eprint('Invalid memory-budget: \'{}\'. Must be a positive integer.'.format(memory_budget))
+        return 1
+
+    if memory_budget is not None and int(workers) > 1:
+        eprint('workers and memory-budget cannot be used together.')
+        return 1
+
     data_processor_obj = DATA_PROCESSOR_CLASS[data_processor]()
-    if runner == 'local':
-        return transform_local(stream_bts_file, window_bts_file, raw_json_files, data_processor_obj)
+    if runner == 'local' and memory_budget is not None:
+        return transform_local_streaming(stream_bts_file, window_bts_file, raw_json_files,
+                                         data_processor_obj, int(memory_budget))
+    elif runner == 'local':
+        return transform_local(stream_bts_file, window_bts_file, raw_json_files, data_processor_obj,
+                               int(workers))
     else:
         return transform_spark(stream_bts_file, window_bts_file, raw_json_files, data_processor_obj)
 
@@ -50,17 +71,34 @@ def transform(runner: Optional[str], stream_bts_file: Optional[str], window_bts_
 def transform_spark(stream_bts_file: Optional[str], window_bts_file: Optional[str],
                     raw_json_files: List[str], data_processor: DataProcessor) -> int:
     runner = SparkRunner(stream_bts_file, window_bts_file)
-    out = runner.execute(runner.get_record_rdd_from_json_files(raw_json_files, data_processor))
+    out = runner.execute_sorted(
+        runner.get_record_rdd_from_json_files(
+            raw_json_files, data_processor, group_by_identity=False))
     runner.print_output(out)
 
     return 0
 
 
-def transform_local(stream_bts_file: Optional[str], window_bts_file: Optional[str],
-                    raw_json_files: List[str], data_processor: DataProcessor) -> int:
-    runner = LocalRunner(stream_bts_file, window_bts_file)
+def transform_local(stream_bts_file: Optional[str],
+                    window_bts_file: Optional[str],
+                    raw_json_files: List[str],
+                    data_processor: DataProcessor,
+                    workers: int = 1) -> int:
+    runner = LocalRunner(stream_bts_file, window_bts_file, workers)
     out = runner.execute(
         runner.get_identity_records_from_json_files(raw_json_files, data_processor))
     runner.print_output(out)
 
     return 0
+
+
+def transform_local_streaming(stream_bts_file: Optional[str], window_bts_file: Optional[str],
+                              raw_json_files: List[str], data_processor: DataProcessor,
+                              memory_budget_mb: int) -> int:
+    runner = LocalRunner(stream_bts_file, window_bts_file)
+    out = runner.execute_streaming(
+        runner.get_sorted_identity_records_from_json_files(raw_json_files, data_processor,
+                                                           memory_budget_mb * 1024 * 1024))
+    runner.print_output(out)
+
+    return 0
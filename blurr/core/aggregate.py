@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod, abstractproperty
-from typing import Dict, Type, Any
+from copy import deepcopy
+from types import CodeType
+from typing import Dict, Type, Any, Callable, Optional, Tuple, Set
 
-from blurr.core.base import BaseSchemaCollection, BaseItemCollection, BaseItem
+from blurr.core.aggregate_compiler import compile_aggregate, build_function
+from blurr.core.base import BaseSchemaCollection, BaseItemCollection, BaseItem, BaseSchema
 from blurr.core.errors import MissingAttributeError
 from blurr.core.evaluation import EvaluationContext
-from blurr.core.field import Field
+from blurr.core.field import Field, FieldSchema
+from blurr.core.field_dependency import FieldDependency, IMMUTABLE_TYPES, build_dependency_graph, \
+    get_field_types, get_imported_names
 from blurr.core.loader import TypeLoader
 from blurr.core.schema_loader import SchemaLoader
 from blurr.core.store import StoreSchema, Store
@@ -23,6 +28,18 @@ class AggregateSchema(BaseSchemaCollection, ABC):
     ATTRIBUTE_STORE = 'Store'
     ATTRIBUTE_FIELDS = 'Fields'
 
+    # Evaluates the fields of the aggregates of streaming transformers with a generated function
+    # instead of evaluating each field expression separately.
+    COMPILE_FIELDS = True
+
+    # Skips the evaluation of the fields of the aggregates of streaming transformers for records
+    # that cannot change them. See `blurr.core.field_dependency`.
+    SKIP_UNAFFECTED_FIELDS = True
+
+    # Skips saving the aggregates whose snapshot has not changed since they were restored from the
+    # store
+    SKIP_UNCHANGED_SAVES = True
+
     def __init__(self, fully_qualified_name: str, schema_loader: SchemaLoader) -> None:
         """
         Initializing the nested field schema that all data groups contain
@@ -35,6 +52,85 @@ class AggregateSchema(BaseSchemaCollection, ABC):
             self.store_schema = self.schema_loader.get_nested_schema_object(
                 self.schema_loader.get_transformer_name(self.fully_qualified_name), store_name)
 
+        transformer_spec = self.schema_loader.get_schema_spec(
+            self.schema_loader.get_transformer_name(self.fully_qualified_name)) or {}
+        is_streaming = BtsType.is_type_equal(
+            transformer_spec.get(self.ATTRIBUTE_TYPE, ''), BtsType.BLURR_TRANSFORM_STREAMING)
+        self.compile_fields: bool = self.COMPILE_FIELDS and is_streaming
+        self._compiled_fields: Dict[Tuple[str, ...], Optional[CodeType]] = {}
+
+        self.skip_unaffected_fields: bool = self.SKIP_UNAFFECTED_FIELDS and is_streaming
+        self.field_dependencies: Dict[str, FieldDependency] = {}
+        self._analysed_fields: Dict[str, FieldSchema] = {}
+        self.add_field_dependencies(self.nested_schema)
+
+        # Number of saves of unchanged aggregates that were skipped
+        self.skipped_saves = 0
+
+    def add_field_dependencies(self, field_schemas: Dict[str, BaseSchema]) -> None:
+        """
+        Analyses the dependencies of the given fields so that their evaluation is skipped for
+        records that do not affect them.
+        """
+        if not self.skip_unaffected_fields:
+            return
+
+        transformer_spec = self.schema_loader.get_schema_spec(
+            self.schema_loader.get_transformer_name(self.fully_qualified_name))
+        aggregate_specs = transformer_spec.get('Aggregates', [])
+        field_types = get_field_types(aggregate_specs)
+        shadowed_names = get_imported_names(transformer_spec.get('Import', None)) | {
+            aggregate_spec.get(self.ATTRIBUTE_NAME, None)
+            for aggregate_spec in aggregate_specs
+        }
+
+        for name, field_schema in field_schemas.items():
+            if not isinstance(field_schema, FieldSchema) or field_schema.value is None:
+                continue
+
+            expressions = [field_schema.when, field_schema.value]
+            dependency = FieldDependency(self.name, name,
+                                         [expression for expression in expressions if expression],
+                                         shadowed_names)
+            if dependency.undefined_names:
+                # The field is always evaluated so that the `NameError` of an undefined name is
+                # raised
+                continue
+            # Changes to the inputs of derived fields are only detected for immutable values
+            dependency.is_derived = dependency.is_derived and all(
+                BtsType.is_type_in(field_types.get(field_reference, None), IMMUTABLE_TYPES)
+                for field_reference in dependency.field_references)
+            field_schema.dependency = dependency
+            self.field_dependencies[name] = dependency
+            self._analysed_fields[name] = field_schema
+
+    @property
+    def dependency_graph(self) -> Dict[str, Set[str]]:
+        """ Returns the fields of the aggregate that each field depends on """
+        return build_dependency_graph(self.field_dependencies, self.name)
+
+    @property
+    def skipped_fields(self) -> Dict[str, int]:
+        """ Returns the number of skipped evaluations of the fields that were skipped """
+        return {
+            name: field_schema.skipped_evaluations
+            for name, field_schema in self._analysed_fields.items()
+            if field_schema.skipped_evaluations
+        }
+
+    def get_compiled_fields(self, fields: Dict[str, BaseItem]) -> Optional[CodeType]:
+        """
+        Returns the compiled evaluation function of the given fields, or None if the fields cannot
+        be evaluated by a generated function.  The function is compiled once per schema.
+        """
+        if not self.compile_fields:
+            return None
+
+        names = tuple(fields)
+        if names not in self._compiled_fields:
+            self._compiled_fields[names] = compile_aggregate(self.name, self.when, fields)
+        return self._compiled_fields[names]
+
     def extend_schema_spec(self) -> None:
         """ Injects the identity field """
         super().extend_schema_spec()
@@ -76,6 +172,23 @@ class Aggregate(BaseItemCollection, ABC):
         if self._schema.store_schema:
             self._store = self._schema.schema_loader.get_store(
                 self._schema.store_schema.fully_qualified_name)
+        # Generated function that evaluates the fields. Built on the first evaluation as
+        # subclasses add fields after initialization.
+        self._evaluate_fields: Optional[Callable[[], None]] = None
+        # Snapshot the aggregate was restored from, used to skip saving an unchanged aggregate
+        self._restored_snapshot: Optional[Dict[str, Any]] = None
+
+    def run_evaluate(self) -> None:
+        if self._evaluate_fields is None:
+            code = self._schema.get_compiled_fields(self._nested_items)
+            self._evaluate_fields = build_function(
+                code, self._nested_items,
+                self._evaluation_context.global_context) if code else False
+
+        if self._evaluate_fields:
+            self._evaluate_fields()
+        else:
+            super().run_evaluate()
 
     @property
     def _nested_items(self) -> Dict[str, Field]:
@@ -94,12 +207,39 @@ class Aggregate(BaseItemCollection, ABC):
     def _key(self):
         return Key(KeyType.DIMENSION, self._identity, self._name)
 
+    def run_restore(self, snapshot: Dict[str, Any]) -> 'Aggregate':
+        super().run_restore(snapshot)
+        # The values of complex fields are restored with a shallow copy of the snapshot so nested
+        # values modified in place would also modify a snapshot kept as is.
+        self._restored_snapshot = deepcopy(
+            snapshot) if self._store and self._schema.SKIP_UNCHANGED_SAVES else None
+        return self
+
+    def run_reset(self) -> None:
+        super().run_reset()
+        self._restored_snapshot = None
+
     def _persist(self) -> None:
         """
         Persists the current data group
         """
         if self._store:
-            self._store.save(self._key, self._snapshot)
+            self._save(self._key)
+
+    def _save(self, key: Key) -> None:
+        """
+        Saves the snapshot of the aggregate in the store, unless the snapshot is the one that the
+        aggregate was restored from. Changes are detected on the snapshot rather than on field
+        assignments as the values of complex fields are modified in place.
+        """
+        snapshot = self._snapshot
+        if self._schema.SKIP_UNCHANGED_SAVES and snapshot == self._restored_snapshot:
+            self._schema.skipped_saves += 1
+            return
+
+        self._store.save(key, snapshot)
+        # The saved snapshot shares the values of complex fields, which can still be modified
+        self._restored_snapshot = None
 
     def __getattr__(self, item: str) -> Any:
         """
@@ -0,0 +1,236 @@
+"""
+Compiles the evaluation of the fields of an aggregate into a single generated python function.
+
+The interpreted evaluation runs a separate `eval()` for the `When` and the `Value` expressions of
+every field. The generated function evaluates all the fields of the aggregate in one call with
+the `When` expressions as `if` statements and the type casts inlined. References to the fields of
+the aggregate itself (e.g. `session.events`) read the field objects directly instead of going
+through the aggregate in the evaluation context. Evaluation errors are handled in the same way as
+`Expression.evaluate()` and `Field.run_evaluate()`, and fields are skipped under the same
+conditions as `Field.run_evaluate()` (see `blurr.core.field_dependency`).
+"""
+import ast
+from types import CodeType, FunctionType
+from typing import Any, Callable, Dict, List, Optional
+
+from blurr.core.evaluation import Expression, handle_evaluation_error
+from blurr.core.field import Field, FieldSchema
+from blurr.core.field_dependency import FieldDependency, SOURCE
+
+FUNCTION_NAME = 'evaluate'
+
+# Prefix of the names used in the generated function.  Expressions referencing names with this
+# prefix are not compiled.
+_PREFIX = '_blurr_'
+_EXPRESSION = _PREFIX + 'expression_{}'
+
+
+class _FieldReferenceTransformer(ast.NodeTransformer):
+    """ Replaces `<aggregate>.<field>` references with reads from the local field objects """
+
+    def __init__(self, aggregate_name: str, field_index: Dict[str, int]) -> None:
+        self._aggregate_name = aggregate_name
+        self._field_index = field_index
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        self.generic_visit(node)
+        if (isinstance(node.value, ast.Name) and node.value.id == self._aggregate_name
+                and isinstance(node.ctx, ast.Load) and node.attr in self._field_index):
+            return ast.copy_location(
+                ast.Attribute(
+                    value=ast.copy_location(
+                        ast.Name(
+                            id='{}f{}'.format(_PREFIX, self._field_index[node.attr]),
+                            ctx=ast.Load()), node.value),
+                    attr='value',
+                    ctx=ast.Load()), node)
+        return node
+
+
+class _ExpressionTransformer(ast.NodeTransformer):
+    """ Replaces the expression placeholders of the generated function with the expressions """
+
+    def __init__(self, expressions: List[ast.expr]) -> None:
+        self._expressions = expressions
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if not node.id.startswith(_EXPRESSION.format('')):
+            return node
+
+        expression = self._expressions[int(node.id[len(_EXPRESSION.format('')):])]
+        return ast.increment_lineno(expression, node.lineno - 1)
+
+
+class _FunctionBuilder:
+    """ Builds the source of the generated function """
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.expressions: List[Expression] = []
+        self._indent = 1
+
+    def add(self, *lines: str) -> None:
+        self.lines.extend('    ' * self._indent + line for line in lines)
+
+    def indent(self, steps: int) -> None:
+        self._indent += steps
+
+    def add_evaluation(self, target: str, expression: Expression) -> None:
+        """ Adds the evaluation of an expression to target with the error handling of eval """
+        self.add('try:', '    {} = {}'.format(target, _EXPRESSION.format(len(self.expressions))),
+                 'except Exception as {p}err:'.format(p=_PREFIX),
+                 '    {t} = {p}error({p}err, {code!r})'.format(
+                     t=target, p=_PREFIX, code=expression.code_string))
+        self.expressions.append(expression)
+
+    def add_assignment(self, target: str, expression: Expression) -> None:
+        """ Adds the evaluation of an expression that cannot fail to target """
+        self.add('{} = {}'.format(target, _EXPRESSION.format(len(self.expressions))))
+        self.expressions.append(expression)
+
+
+def _is_compilable(field: Field) -> bool:
+    return type(field) is Field and field._schema.value is not None
+
+
+def _uses_reserved_names(tree: ast.AST) -> bool:
+    """ Returns True when the expression uses the names of the generated function """
+    return any(
+        isinstance(node, ast.Name) and node.id.startswith(_PREFIX) for node in ast.walk(tree))
+
+
+def _binds_name(tree: ast.AST, name: str) -> bool:
+    """ Returns True when the expression binds the name, e.g. as a comprehension variable """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == name and not isinstance(node.ctx, ast.Load):
+            return True
+        if isinstance(node, ast.arg) and node.arg == name:
+            return True
+    return False
+
+
+def _add_skip_conditions(builder: _FunctionBuilder, dependency: Optional[FieldDependency],
+                         names: Dict[str, Any]) -> int:
+    """
+    Adds the conditions under which the evaluation of a field is skipped. The evaluation is added
+    by the caller in the returned number of indentation levels.
+    """
+    if not dependency:
+        return 0
+
+    depth = 0
+    if dependency.required_source_attributes:
+        builder.add('if {}:'.format(' or '.join(
+            '{!r} not in {p}source'.format(attribute, **names)
+            for attribute in sorted(dependency.required_source_attributes))),
+                    '    {f}.eval_error = True'.format(**names),
+                    '    {p}s{i}.skipped_evaluations += 1'.format(**names), 'else:')
+        builder.indent(1)
+        depth += 1
+
+    if dependency.is_derived:
+        builder.add_assignment(
+            _PREFIX + 'inputs',
+            Expression('({},)'.format(', '.join(
+                '{}.{}'.format(aggregate, field) for aggregate, field in dependency.inputs))))
+        builder.add('if {p}inputs == {f}.last_inputs:'.format(**names),
+                    '    {p}s{i}.skipped_evaluations += 1'.format(**names), 'else:',
+                    '    {f}.last_inputs = {p}inputs'.format(**names))
+        builder.indent(1)
+        depth += 1
+
+    return depth
+
+
+def compile_aggregate(aggregate_name: str, when: Optional[Expression],
+                      fields: Dict[str, Field]) -> Optional[CodeType]:
+    """
+    Generates and compiles the function that evaluates the fields of an aggregate.
+    :param aggregate_name: Name of the aggregate in the evaluation context
+    :param when: `When` expression of the aggregate
+    :param fields: Fields of the aggregate in evaluation order
+    :return: Code object of the function, or None if the fields cannot be compiled.
+    """
+    if not all(_is_compilable(field) for field in fields.values()):
+        return None
+
+    builder = _FunctionBuilder()
+    if when:
+        builder.add_evaluation(_PREFIX + 'when', when)
+        builder.add('if not {p}when:'.format(p=_PREFIX), '    return')
+    if any(field._schema.dependency and field._schema.dependency.required_source_attributes
+           for field in fields.values()):
+        builder.add('{p}source = {source}'.format(p=_PREFIX, source=SOURCE))
+
+    for i, field in enumerate(fields.values()):
+        schema: FieldSchema = field._schema
+        field_name = '{}f{}'.format(_PREFIX, i)
+        names = dict(p=_PREFIX, f=field_name, i=i)
+        depth = _add_skip_conditions(builder, schema.dependency, names)
+        builder.add('{f}.eval_error = False'.format(**names), '{p}result = None'.format(**names))
+        if schema.when:
+            builder.add_evaluation(_PREFIX + 'when', schema.when)
+            builder.add('if {p}when:'.format(**names))
+            builder.indent(1)
+        builder.add_evaluation(_PREFIX + 'result', schema.value)
+        if schema.when:
+            builder.indent(-1)
+
+        builder.add('if {p}result is None:'.format(**names), '    {f}.eval_error = True'.format(
+            **names), 'else:')
+        builder.indent(1)
+        builder.add('{p}ok = True'.format(**names))
+        if type(schema).is_type_of is FieldSchema.is_type_of:
+            builder.add('if not isinstance({p}result, {p}t{i}):'.format(**names))
+        else:
+            builder.add('if not {p}s{i}.is_type_of({p}result):'.format(**names))
+        builder.add('    try:', '        {p}result = {p}t{i}({p}result)'.format(**names),
+                    '    except Exception as {p}err:'.format(**names),
+                    '        {p}s{i}.log_cast_error({p}err, {p}result)'.format(**names),
+                    '        {p}ok = False'.format(**names))
+        if type(schema).sanitize_object is not FieldSchema.sanitize_object:
+            builder.add('if {p}ok:'.format(**names), '    try:',
+                        '        {p}result = {p}s{i}.sanitize_object({p}result)'.format(**names),
+                        '    except Exception as {p}err:'.format(**names),
+                        '        {p}s{i}.log_sanitize_error({p}err, {p}result)'.format(**names),
+                        '        {p}ok = False'.format(**names))
+        builder.add('if {p}ok:'.format(**names), '    {f}.value = {p}result'.format(**names),
+                    'else:', '    {f}.eval_error = True'.format(**names))
+        builder.indent(-1 - depth)
+
+    parameters = ['{}error=None'.format(_PREFIX)] + [
+        '{p}f{i}=None, {p}t{i}=None, {p}s{i}=None'.format(p=_PREFIX, i=i)
+        for i in range(len(fields))
+    ]
+    source = '\n'.join(['def {}({}):'.format(FUNCTION_NAME, ', '.join(parameters))] +
+                       (builder.lines or ['    pass']))
+
+    field_index = {name: i for i, name in enumerate(fields)}
+    expressions = []
+    for expression in builder.expressions:
+        tree = ast.parse(expression.code_string.strip(), mode='eval').body
+        if _uses_reserved_names(tree):
+            return None
+        if not _binds_name(tree, aggregate_name):
+            tree = _FieldReferenceTransformer(aggregate_name, field_index).visit(tree)
+        expressions.append(tree)
+
+    module = _ExpressionTransformer(expressions).visit(ast.parse(source))
+    code = compile(ast.fix_missing_locations(module), '<{}>'.format(aggregate_name), 'exec')
+    return next(
+        const for const in code.co_consts
+        if isinstance(const, CodeType) and const.co_name == FUNCTION_NAME)
+
+
+def build_function(code: CodeType, fields: Dict[str, Field],
+                   global_context: Dict) -> Callable[[], None]:
+    """
+    Creates the evaluation function of an aggregate instance from the compiled code.
+    :param code: Code object returned by `compile_aggregate()`
+    :param fields: Fields of the aggregate instance, in the order used for the compilation
+    :param global_context: Global context the expressions are evaluated in
+    """
+    defaults = [handle_evaluation_error]
+    for field in fields.values():
+        defaults.extend([field, field._schema.type_object, field._schema])
+    return FunctionType(code, global_context, FUNCTION_NAME, tuple(defaults))
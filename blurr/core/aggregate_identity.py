@@ -26,6 +26,7 @@ class IdentityAggregateSchema(AggregateSchema):
             for schema_spec in self._spec.get(self.ATTRIBUTE_DIMENSIONS, [])
         }
         self.key_type = KeyType.DIMENSION
+        self.add_field_dependencies(self.dimension_fields)
 
     def validate_schema_spec(self) -> None:
         super().validate_schema_spec()
@@ -107,4 +108,4 @@ class IdentityAggregate(Aggregate):
 
     def _persist(self) -> None:
         if self._existing_key:
-            self._store.save(self._existing_key, self._snapshot)
+            self._save(self._existing_key)
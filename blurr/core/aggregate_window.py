@@ -1,16 +1,31 @@
-from datetime import datetime, timedelta
-from typing import Any, List, Tuple
+import math
+import statistics
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Tuple
 
 from blurr.core.aggregate import Aggregate, AggregateSchema
 from blurr.core.aggregate_block import BlockAggregate, BlockAggregateSchema, TimeAggregate
 from blurr.core.aggregate_time import TimeAggregateSchema
+from blurr.core.block_cache import BlockCache
 from blurr.core.errors import PrepareWindowMissingBlocksError
 from blurr.core.evaluation import EvaluationContext
 from blurr.core.loader import TypeLoader
 from blurr.core.schema_loader import SchemaLoader
+from blurr.core.store import Store
 from blurr.core.store_key import Key, KeyType
 from blurr.core.type import Type
 
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional. Without it the window columns are aggregated in python.
+    numpy = None
+
+# NumPy types of the window columns by field type. Columns of other fields are object arrays.
+_NUMPY_TYPES = {Type.INTEGER: 'int64', Type.FLOAT: 'float64', Type.BOOLEAN: 'bool'}
+
 
 class WindowAggregateSchema(AggregateSchema):
 
@@ -18,6 +33,10 @@ class WindowAggregateSchema(AggregateSchema):
     ATTRIBUTE_WINDOW_TYPE = 'WindowType'
     ATTRIBUTE_SOURCE = 'Source'
 
+    # Read the source blocks of an identity once and slide the window over them, see
+    # `_SlidingWindow`. When False the blocks of each window are read from the store.
+    INCREMENTAL_WINDOWS = True
+
     def __init__(self, fully_qualified_name: str, schema_loader: SchemaLoader) -> None:
         super().__init__(fully_qualified_name, schema_loader)
 
@@ -35,16 +54,193 @@ class WindowAggregateSchema(AggregateSchema):
         self.validate_number_attribute(self.ATTRIBUTE_WINDOW_VALUE, int)
 
 
+class WindowColumn(list):
+    """
+    The values of a field in the blocks of a window, e.g. `source.events`. The column is a list of
+    the values, so that it can be used as before in expressions, with methods that aggregate the
+    values vectorized with NumPy when it is installed, e.g. `source.events.mean()`.
+    """
+
+    # Columns with fewer values are aggregated in python as converting the values to a NumPy
+    # array costs about as much as aggregating them in python.
+    NUMPY_MIN_LENGTH = 2000
+
+    def __init__(self, values: List[Any], field_type: Optional[Type] = None) -> None:
+        super().__init__(values)
+        self._field_type = field_type
+        self._array = None
+
+    @property
+    def array(self) -> Any:
+        """
+        NumPy array of the values typed from the field schema, or inferred from the values if the
+        field type is not known. Values other than numbers and booleans are kept as objects.
+        None without NumPy.
+        """
+        if numpy is None:
+            return None
+
+        if self._array is None:
+            try:
+                self._array = numpy.array(
+                    self, dtype=_NUMPY_TYPES.get(self._field_type, None
+                                                 if self._field_type is None else object))
+            except (TypeError, ValueError, OverflowError):
+                self._array = numpy.array(self, dtype=object)
+            if self._array.dtype.kind not in 'biuf':
+                self._array = self._array.astype(object)
+        return self._array
+
+    def _aggregate(self, numpy_function: str, python_function: Callable, *args) -> Any:
+        if numpy is None or len(self) < self.NUMPY_MIN_LENGTH:
+            return python_function(self, *args)
+        result = getattr(numpy, numpy_function)(self.array, *args)
+        # Values are returned as python objects
+        return result.item() if isinstance(result, numpy.generic) else result
+
+    def sum(self) -> Any:
+        # NumPy sums of integer arrays wrap around on overflow, so integers are summed in python
+        if numpy is not None and len(self) >= self.NUMPY_MIN_LENGTH and \
+                self.array.dtype.kind in 'iu':
+            return sum(self)
+        return self._aggregate('sum', sum)
+
+    def min(self) -> Any:
+        return self._aggregate('min', min)
+
+    def max(self) -> Any:
+        return self._aggregate('max', max)
+
+    def mean(self) -> float:
+        return self._aggregate('mean', lambda values: sum(values) / len(values))
+
+    def median(self) -> float:
+        return self._aggregate('median', lambda values: float(statistics.median(values)))
+
+    def std(self) -> float:
+        """ Population standard deviation of the values """
+        return self._aggregate('std', lambda values: float(statistics.pstdev(values)))
+
+    def percentile(self, q: float) -> float:
+        """ The q-th percentile of the values, interpolated linearly between the values """
+        return self._aggregate('percentile', _percentile, q)
+
+
+def _percentile(values: List[Any], q: float) -> float:
+    """ Linearly interpolated percentile, as computed by `numpy.percentile()` """
+    if not 0 <= q <= 100:
+        raise ValueError('Percentiles must be in the range [0, 100]')
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return float(values[lower] + (values[upper] - values[lower]) * (position - lower))
+
+
 class _WindowSource:
     """
     Represents a window on the pre-aggregated source data.
     """
 
-    def __init__(self, block_list: List[TimeAggregate]):
+    def __init__(self, block_list: List[TimeAggregate],
+                 schema: Optional[TimeAggregateSchema] = None) -> None:
         self.view: List[TimeAggregate] = block_list
+        self._schema = schema
 
-    def __getattr__(self, item: str) -> List[Any]:
-        return [getattr(block, item) for block in self.view]
+    def __getattr__(self, item: str) -> WindowColumn:
+        if item.startswith('__') and item.endswith('__'):
+            raise AttributeError(item)
+
+        field_schema = self._schema.nested_schema.get(item, None) if self._schema else None
+        field_type = None
+        if field_schema is not None and Type.contains(field_schema.type):
+            field_type = Type(field_schema.type)
+
+        column = WindowColumn([getattr(block, item) for block in self.view], field_type)
+        # The column is built once per window
+        setattr(self, item, column)
+        return column
+
+
+class _SlidingWindow:
+    """
+    Selects the blocks of windows from the blocks of the window source of an identity. The blocks
+    are read from the store once, with the same ordering and range semantics as
+    `Store.get_range()`. The restored blocks of the current window are kept in a deque that
+    slides as the window start time advances, so that each block is restored once when the windows
+    are prepared in time order.
+    """
+
+    def __init__(self, schema: TimeAggregateSchema, identity: str, blocks: List[Tuple[Key, Any]],
+                 block_cache: BlockCache) -> None:
+        self._schema = schema
+        self._identity = identity
+        self._block_cache = block_cache
+
+        sortable_blocks = [(self._get_sort_value(key, block), key, block) for key, block in blocks]
+        sortable_blocks = [
+            sortable_block for sortable_block in sortable_blocks if sortable_block[0] is not None
+        ]
+        sortable_blocks.sort(key=lambda sortable_block: sortable_block[0])
+        self._sort_values = [value for value, _, _ in sortable_blocks]
+        self._blocks = [(key, block) for _, key, block in sortable_blocks]
+
+        # Restored blocks with the indexes in [self._start, self._end)
+        self._window: deque = deque()
+        self._start = 0
+        self._end = 0
+
+    def _get_sort_value(self, key: Key, block: Any) -> Any:
+        if self._schema.key_type == KeyType.TIMESTAMP:
+            return key.timestamp
+        start_time = block.get('_start_time', datetime.min.isoformat()) if isinstance(
+            block, dict) else None
+        return start_time if isinstance(start_time, str) else None
+
+    def _to_sort_value(self, time: datetime) -> Any:
+        time = Store._add_timezone_if_required(time)
+        return time if self._schema.key_type == KeyType.TIMESTAMP else time.isoformat()
+
+    def get_range(self, start_time: datetime, end_time: Optional[datetime] = None,
+                  count: int = 0) -> List[TimeAggregate]:
+        """
+        Returns the restored blocks that `Store.get_range()` returns for the same arguments.
+        """
+        if count:
+            end_time = datetime.min.replace(
+                tzinfo=timezone.utc) if count < 0 else datetime.max.replace(tzinfo=timezone.utc)
+
+        lower, upper = self._to_sort_value(start_time), self._to_sort_value(end_time)
+        if upper < lower:
+            lower, upper = upper, lower
+
+        start = bisect_right(self._sort_values, lower)
+        end = max(start, bisect_left(self._sort_values, upper))
+        if count > 0:
+            end = min(end, start + count)
+        elif count < 0:
+            start = max(start, end + count)
+
+        self._slide(start, end)
+        return list(self._window)
+
+    def _slide(self, start: int, end: int) -> None:
+        """ Moves the window to the blocks with the indexes in [start, end) """
+        if start < self._start or start >= self._end:
+            self._window.clear()
+            self._start = self._end = start
+
+        while self._start < start:
+            self._window.popleft()
+            self._start += 1
+        while self._end > end:
+            self._window.pop()
+            self._end -= 1
+        while self._end < end:
+            key, block = self._blocks[self._end]
+            self._window.append(
+                self._block_cache.get(self._schema, self._identity, key, block))
+            self._end += 1
 
 
 class WindowAggregate(Aggregate):
@@ -56,6 +252,9 @@ class WindowAggregate(Aggregate):
                  evaluation_context: EvaluationContext) -> None:
         super().__init__(schema, identity, evaluation_context)
         self._window_source = None
+        self._sliding_window: Optional[_SlidingWindow] = None
+        # Replaced by the window transformer with the cache shared by its window aggregates
+        self.block_cache = BlockCache()
 
     def _prepare_window(self, start_time: datetime) -> None:
         """
@@ -66,19 +265,24 @@ class WindowAggregate(Aggregate):
         # evaluate window first which sets the correct window in the store
         store = self._schema.schema_loader.get_store(
             self._schema.source.store_schema.fully_qualified_name)
+        base_key = Key(self._schema.source.key_type, self._identity, self._schema.source.name)
         if Type.is_type_equal(self._schema.window_type, Type.DAY) or Type.is_type_equal(
                 self._schema.window_type, Type.HOUR):
-            block_list = self._load_blocks(
-                store.get_range(
-                    Key(self._schema.source.key_type, self._identity, self._schema.source.name),
-                    start_time, self._get_end_time(start_time)))
+            range_args = (start_time, self._get_end_time(start_time))
+        else:
+            range_args = (start_time, None, self._schema.window_value)
+
+        if self._schema.INCREMENTAL_WINDOWS:
+            if self._sliding_window is None:
+                # The source blocks of the identity are read once for all the windows
+                self._sliding_window = _SlidingWindow(
+                    self._schema.source, self._identity,
+                    store.get_range(base_key, datetime.min, datetime.max), self.block_cache)
+            block_list = self._sliding_window.get_range(*range_args)
         else:
-            block_list = self._load_blocks(
-                store.get_range(
-                    Key(self._schema.source.key_type, self._identity, self._schema.source.name),
-                    start_time, None, self._schema.window_value))
+            block_list = self._load_blocks(store.get_range(base_key, *range_args))
 
-        self._window_source = _WindowSource(block_list)
+        self._window_source = _WindowSource(block_list, self._schema.source)
         self._validate_view()
 
     def _validate_view(self):
@@ -116,9 +320,8 @@ class WindowAggregate(Aggregate):
         :return: List of BlockAggregate
         """
         return [
-            TypeLoader.load_item(self._schema.source.type)(self._schema.source, self._identity,
-                                                           EvaluationContext()).run_restore(block)
-            for (_, block) in blocks
+            self.block_cache.get(self._schema.source, self._identity, key, block)
+            for (key, block) in blocks
         ]
 
     def run_evaluate(self) -> None:
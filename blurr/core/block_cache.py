@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from typing import Any, Dict
+
+from blurr.core.aggregate_block import TimeAggregate
+from blurr.core.aggregate_time import TimeAggregateSchema
+from blurr.core.evaluation import EvaluationContext
+from blurr.core.loader import TypeLoader
+from blurr.core.store_key import Key
+
+
+class BlockCache:
+    """
+    Least recently used cache of the restored blocks of an identity by store key. The cache is
+    shared by the window aggregates of a window transformer so that a block is restored once for
+    all the windows that it is part of while it is cached. Restored blocks are only read by the
+    windows and must not be modified.
+    """
+
+    # Default number of restored blocks kept in the cache
+    MAX_SIZE = 1000
+
+    def __init__(self, max_size: int = None) -> None:
+        self.max_size = self.MAX_SIZE if max_size is None else max_size
+        self._blocks: Dict[Key, TimeAggregate] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, schema: TimeAggregateSchema, identity: str, key: Key,
+            snapshot: Dict[str, Any]) -> TimeAggregate:
+        """
+        Returns the restored block of the key, restoring it from the snapshot if not cached.
+        :param schema: Schema of the block aggregate
+        :param identity: Identity of the block
+        :param key: Store key of the block
+        :param snapshot: Snapshot of the block as read from the store
+        """
+        block = self._blocks.get(key, None)
+        if block is not None:
+            self.hits += 1
+            self._blocks.move_to_end(key)
+            return block
+
+        self.misses += 1
+        block = TypeLoader.load_item(schema.type)(schema, identity,
+                                                  EvaluationContext()).run_restore(snapshot)
+        if self.max_size > 0:
+            self._blocks[key] = block
+            if len(self._blocks) > self.max_size:
+                self._blocks.popitem(last=False)
+                self.evictions += 1
+        return block
+
+    def clear(self) -> None:
+        """ Removes all the blocks from the cache """
+        self._blocks.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """ Hit, miss and eviction counts and the number of cached blocks """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._blocks)
+        }
@@ -0,0 +1,49 @@
+"""
+Parses the datetime strings written by blurr in snapshots and store keys.
+
+Datetimes are always written with `datetime.isoformat()`, so they are parsed with the ISO format
+parser of the standard library and only strings in any other format are parsed with the much
+slower `dateutil.parser.parse()`. Parsed strings are memoized as the same block times are parsed
+repeatedly from the keys and the snapshots of the blocks.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from dateutil import parser
+
+# Number of parsed strings that are memoized
+CACHE_SIZE = 4096
+
+# Format written by `datetime.isoformat()`, for Python versions without `datetime.fromisoformat()`
+_ISO_FORMAT = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{6}))?'
+                         r'(?:([+-])(\d\d):(\d\d))?$')
+
+
+def _fromisoformat(value: str) -> datetime:
+    match = _ISO_FORMAT.match(value)
+    if not match:
+        raise ValueError('Invalid isoformat string: {!r}'.format(value))
+
+    parts = match.groups()
+    tzinfo = None
+    if parts[7]:
+        offset = timedelta(hours=int(parts[8]), minutes=int(parts[9]))
+        tzinfo = timezone(-offset if parts[7] == '-' else offset)
+    return datetime(*[int(part) for part in parts[:6]], int(parts[6] or 0), tzinfo=tzinfo)
+
+
+_parse_isoformat = getattr(datetime, 'fromisoformat', _fromisoformat)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_datetime(value: str) -> datetime:
+    """
+    Parses a datetime string, with a fast path for the strings written with `isoformat()`.
+    :param value: Datetime string
+    :return: The datetime, which is naive if the string has no UTC offset.
+    """
+    try:
+        return _parse_isoformat(value)
+    except ValueError:
+        return parser.parse(value)
@@ -377,3 +377,10 @@ class KeyError(Exception):
     Raised when an issues happens with respect to the store Key.
     """
     pass
+
+
+class StoreBatchError(Exception):
+    """
+    Raised when the store could not process all the items of a batch request after retries.
+    """
+    pass
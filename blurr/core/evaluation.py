@@ -135,15 +135,25 @@ class Expression:
                             evaluation_context.local_context)
 
         except Exception as err:
-            # Evaluation exceptions are expected because of missing fields in the source 'Record'.
-            logging.debug('{} in evaluating expression {}. Error: {}'.format(
-                type(err).__name__, self.code_string, err))
-            # These should result in an exception being raised:
-            # NameError - Exceptions thrown because of using names in the expression which are not
-            #   present in EvaluationContext. A common cause for this is typos in the BTS.
-            # MissingAttributeError - Exception thrown when a BTS nested item is used which does not
-            #   exist. Should only happen for erroneous BTSs.
-            # ImportError - Thrown when there is a failure in importing other modules.
-            if isinstance(err, (NameError, MissingAttributeError, ImportError)):
-                raise err
+            handle_evaluation_error(err, self.code_string)
             return None
+
+
+def handle_evaluation_error(err: Exception, code_string: str) -> None:
+    """
+    Handles an exception raised in evaluating an expression. Errors expected because of missing
+    fields in the source record are logged and swallowed, all other errors are re-raised.
+    :param err: Exception raised by the evaluation
+    :param code_string: Python code of the expression evaluated
+    """
+    # Evaluation exceptions are expected because of missing fields in the source 'Record'.
+    logging.debug('{} in evaluating expression {}. Error: {}'.format(
+        type(err).__name__, code_string, err))
+    # These should result in an exception being raised:
+    # NameError - Exceptions thrown because of using names in the expression which are not
+    #   present in EvaluationContext. A common cause for this is typos in the BTS.
+    # MissingAttributeError - Exception thrown when a BTS nested item is used which does not
+    #   exist. Should only happen for erroneous BTSs.
+    # ImportError - Thrown when there is a failure in importing other modules.
+    if isinstance(err, (NameError, MissingAttributeError, ImportError)):
+        raise err
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from functools import wraps
+from types import FunctionType
+from typing import Any, Callable, Optional, Tuple
 
 from blurr.core import logging
 from blurr.core.base import BaseSchema, BaseItem
 from blurr.core.evaluation import Expression, EvaluationContext
+from blurr.core.field_dependency import FieldDependency
 from blurr.core.schema_loader import SchemaLoader
 
 
@@ -26,6 +29,11 @@ class FieldSchema(BaseSchema, ABC):
 
         self.value: Expression = self.build_expression(self.ATTRIBUTE_VALUE)
 
+        # Set by the aggregate schema when the evaluation of the field can be skipped for records
+        # that do not affect the field
+        self.dependency: Optional[FieldDependency] = None
+        self.skipped_evaluations = 0
+
     def validate_schema_spec(self) -> None:
         super().validate_schema_spec()
         self.validate_required_attributes(self.ATTRIBUTE_VALUE)
@@ -69,6 +77,14 @@ class FieldSchema(BaseSchema, ABC):
     def decoder(self, value: Any) -> Any:
         return self.sanitize_object(self.type_object(value))
 
+    def log_cast_error(self, err: Exception, value: Any) -> None:
+        logging.debug('{} in casting {} to {} for field {}. Error: {}'.format(
+            type(err).__name__, value, self.type, self.fully_qualified_name, err))
+
+    def log_sanitize_error(self, err: Exception, value: Any) -> None:
+        logging.debug('{} in sanitizing {} of type {} for field {}. Error: {}'.format(
+            type(err).__name__, value, self.type, self.fully_qualified_name, err))
+
 
 class Field(BaseItem):
     """
@@ -86,12 +102,18 @@ class Field(BaseItem):
         # When the field is created, the value is set to the field type default
         self.value = self._schema.default
         self.eval_error = False
+        # Values of the inputs of a derived field when it was last evaluated
+        self.last_inputs: Optional[Tuple] = None
 
     def run_evaluate(self) -> None:
         """
         Overrides the base evaluation to set the value to the evaluation result of the value
         expression in the schema
         """
+        if self._schema.dependency and self._is_unaffected():
+            self._schema.skipped_evaluations += 1
+            return
+
         result = None
         self.eval_error = False
         if self._needs_evaluation:
@@ -106,23 +128,43 @@ class Field(BaseItem):
             try:
                 result = self._schema.type_object(result)
             except Exception as err:
-                logging.debug('{} in casting {} to {} for field {}. Error: {}'.format(
-                    type(err).__name__, result, self._schema.type,
-                    self._schema.fully_qualified_name, err))
+                self._schema.log_cast_error(err, result)
                 self.eval_error = True
                 return
 
         try:
             result = self._schema.sanitize_object(result)
         except Exception as err:
-            logging.debug('{} in sanitizing {} of type {} for field {}. Error: {}'.format(
-                type(err).__name__, result, self._schema.type, self._schema.fully_qualified_name,
-                err))
+            self._schema.log_sanitize_error(err, result)
             self.eval_error = True
             return
 
         self.value = result
 
+    def _is_unaffected(self) -> bool:
+        """
+        Returns True when evaluating the field would not change its value and evaluation error,
+        either because a source attribute required by the field is absent or because the inputs of
+        a derived field have not changed since its last evaluation.
+        """
+        dependency = self._schema.dependency
+        global_context = self._evaluation_context.global_context
+        if dependency.required_source_attributes:
+            source = global_context['source']
+            for attribute in dependency.required_source_attributes:
+                if attribute not in source:
+                    self.eval_error = True
+                    return True
+
+        if dependency.is_derived:
+            inputs = tuple(
+                global_context[aggregate][field] for aggregate, field in dependency.inputs)
+            if inputs == self.last_inputs:
+                return True
+            self.last_inputs = inputs
+
+        return False
+
     @property
     def _snapshot(self) -> Any:
         """
@@ -135,52 +177,66 @@ class Field(BaseItem):
         Restores the value of a field from a snapshot
         """
         self.value = self._schema.decoder(snapshot)
+        self.last_inputs = None
 
     def run_reset(self) -> None:
         self.value = self._schema.default
+        self.last_inputs = None
 
     def __repr__(self):
         return str(self._snapshot)
 
 
-class ComplexTypeBase(ABC):
-    """
-    Implements a wrapper for base methods declared in base types such that the current object
-    is returned in cases there are no returned values.  This ensures that evaluating the `Value`
-    expression for field always returns an object.
-    """
+# Methods of python classes and of builtin types
+_METHOD_TYPES = (FunctionType, type(list.append))
+
+
+def _return_self_method(method: Callable) -> Callable:
+    """ Wraps a method to return the object when the method does not return a value """
+
+    @wraps(method)
+    def wrapped_method(self, *args, **kwargs):
 
-    def __getattribute__(self, item):
-        """ Overrides the default getattribute to return self"""
+        # Executing the underlying method
+        result = method(self, *args, **kwargs)
 
-        # Resolve the attribute by inspecting the current object
-        attribute = super().__getattribute__(item)
+        # If the execution does not return a value
+        if result is None:
+            return self
 
-        # Return the attribute as-is when it is NOT a function
-        if not callable(attribute) or (item.startswith('__') and item.endswith('__')):
-            return attribute
+        # Get the type of the current object
+        self_type = type(self)
 
-        # Wrap the attribute in a function that changes its return value
-        def wrapped_attribute(*args, **kwargs):
+        # If the method executed is defined in the base type and a base type object is returned
+        # (and not the current type), then wrap the base object into an object of the current type
+        if isinstance(result, self_type.__bases__) and not isinstance(result, self_type):
+            return self_type(result)
 
-            # Executing the underlying method
-            result = attribute(*args, **kwargs)
+        # Return the result as-is on all other conditions
+        return result
 
-            # If the execution does not return a value
-            if result is None:
-                return self
+    wrapped_method._returns_self = True
+    return wrapped_method
 
-            # Get the type of the current object
-            self_type = type(self)
 
-            # If the method executed is defined in the base type and a base type object is returned
-            # (and not the current type), then wrap the base object into an object of the current type
-            if isinstance(result, self_type.__bases__) and not isinstance(result, self_type):
-                return self_type(result)
-                # TODO This creates a shallow copy of the object - find a way to optimize this
+class ComplexTypeBase(ABC):
+    """
+    Implements a wrapper for base methods declared in base types such that the current object
+    is returned in cases there are no returned values.  This ensures that evaluating the `Value`
+    expression for field always returns an object.
 
-            # Return the result as-is on all other conditions
-            return result
+    The methods are wrapped once when a subclass is created, by overriding every public method of
+    the subclass and of its base types, so that calling a method does not allocate a wrapper.
+    """
 
-        # Return the wrapped attribute instead of the default
-        return wrapped_attribute
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        for name in dir(cls):
+            if name.startswith('__') and name.endswith('__'):
+                continue
+
+            # Resolve the attribute without binding it, in the same order as attribute lookups
+            owner = next(klass for klass in cls.__mro__ if name in vars(klass))
+            attribute = vars(owner)[name]
+            if isinstance(attribute, _METHOD_TYPES) and not hasattr(attribute, '_returns_self'):
+                setattr(cls, name, _return_self_method(attribute))
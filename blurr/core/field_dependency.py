@@ -0,0 +1,302 @@
+"""
+Analyses the names referenced by the `Value` and `When` expressions of the fields of an aggregate
+to find the fields whose evaluation can be skipped for a record without changing the result:
+
+1. Fields that require a `source` attribute that is absent in the record. The expressions of
+   such fields evaluate to None when the attribute is absent (e.g. `source.amount + 1` or
+   `source.name` itself) so the field keeps its value and is marked with an evaluation error.
+2. Fields derived only from other fields (e.g. `session.won / session.played`) whose inputs have
+   not changed since the field was last evaluated. Only fields of immutable types are considered
+   as inputs and the expressions must not call any function.
+
+Fields whose expressions use a name that is not known to be defined in the evaluation context are
+never skipped, so that the `NameError` of a misspelled name is raised for every record.
+"""
+import ast
+import builtins
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from blurr.core.evaluation import Expression
+from blurr.core.record import Record
+from blurr.core.type import Type
+
+SOURCE = 'source'
+IDENTITY = 'identity'
+TIME = 'time'
+
+# Field types whose values are not modified in place, so that a changed value is always detected
+IMMUTABLE_TYPES = [Type.INTEGER, Type.FLOAT, Type.STRING, Type.BOOLEAN, Type.DATETIME]
+
+# Attributes of a record that are not read from its keys, e.g. `source.get`
+_RECORD_ATTRIBUTES = set(dir(Record))
+
+# Names defined in the evaluation context of the streaming aggregates other than the names defined
+# by the transformer
+_CONTEXT_NAMES = {SOURCE, IDENTITY, TIME} | set(dir(builtins))
+
+# Builtin functions that raise an error when called with None
+_STRICT_FUNCTIONS = {'int', 'float'}
+
+# Expression nodes that can be part of an expression derived only from other fields
+_DERIVED_NODES = (ast.Expression, ast.Name, ast.Attribute, ast.Constant, ast.BinOp, ast.UnaryOp,
+                  ast.BoolOp, ast.Compare, ast.IfExp, ast.Subscript, ast.Tuple, ast.Slice,
+                  ast.Load, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+if sys.version_info < (3, 9):
+    _DERIVED_NODES += (ast.Index, ast.Num, ast.Str, ast.NameConstant)
+    _INDEX = ast.Index
+    _STRING_NODES = (ast.Constant, ast.Str)
+else:
+    _INDEX = ()
+    _STRING_NODES = (ast.Constant, )
+
+
+def get_source_attribute(node: ast.AST) -> Optional[str]:
+    """
+    Returns the attribute name if the node is a `source.<attribute>` reference to a key of the
+    record, as opposed to a method of the record like `source.get`
+    """
+    if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+            and node.value.id == SOURCE and node.attr not in _RECORD_ATTRIBUTES):
+        return node.attr
+    return None
+
+
+def _get_string(node: ast.AST) -> Optional[str]:
+    """ Returns the value of a string literal node """
+    if not isinstance(node, _STRING_NODES):
+        return None
+    value = node.value if isinstance(node, ast.Constant) else node.s
+    return value if isinstance(value, str) else None
+
+
+class _StrictAttributeFinder:
+    """
+    Finds the `source` attributes whose absence makes an expression evaluate to None, i.e. the
+    expression either is the attribute itself or raises an error when the attribute is None.
+    """
+
+    def __init__(self, shadowed_names: Set[str]) -> None:
+        self._shadowed_names = shadowed_names
+
+    def find(self, node: ast.AST) -> Set[str]:
+        """ Attributes whose absence makes the node evaluate to None or raise an error """
+        attribute = get_source_attribute(node)
+        if attribute:
+            return {attribute}
+
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            # `None and x` is None
+            return self.find(node.values[0])
+
+        if isinstance(node, ast.IfExp):
+            return self.find_raising(node.test) | (self.find(node.body) & self.find(node.orelse))
+
+        return self.find_raising(node)
+
+    def find_raising(self, node: ast.AST) -> Set[str]:
+        """ Attributes whose absence makes the evaluation of the node raise an error """
+        if get_source_attribute(node):
+            return set()
+
+        if isinstance(node, (ast.Attribute, ast.Subscript)):
+            # None.x and None[x] raise
+            return self.find(node.value)
+
+        if isinstance(node, ast.BinOp):
+            # None <op> x raises. x % None does not raise when x is a format string.
+            return self.find(node.left) | (self.find_raising(node.right) if isinstance(
+                node.op, ast.Mod) else self.find(node.right))
+
+        if isinstance(node, ast.UnaryOp):
+            return self.find_raising(node.operand) if isinstance(node.op, ast.Not) else self.find(
+                node.operand)
+
+        if isinstance(node, ast.Compare):
+            # Only the first comparison is always evaluated
+            left, operator, right = node.left, node.ops[0], node.comparators[0]
+            attributes = self.find_raising(left) | self.find_raising(right)
+            if isinstance(operator, (ast.Lt, ast.LtE, ast.Gt, ast.GtE)):
+                attributes |= self.find(left) | self.find(right)
+            elif isinstance(operator, (ast.In, ast.NotIn)):
+                attributes |= self.find(right)
+            return attributes
+
+        if isinstance(node, ast.BoolOp):
+            # Only the first value is always evaluated
+            return self.find_raising(node.values[0])
+
+        if isinstance(node, ast.IfExp):
+            return self.find_raising(node.test) | (
+                self.find_raising(node.body) & self.find_raising(node.orelse))
+
+        if isinstance(node, ast.Call):
+            attributes = self.find(node.func)
+            for argument in node.args:
+                if not isinstance(argument, ast.Starred):
+                    attributes |= self.find_raising(argument)
+            if (isinstance(node.func, ast.Name) and node.func.id in _STRICT_FUNCTIONS
+                    and node.func.id not in self._shadowed_names and len(node.args) == 1
+                    and not node.keywords and not isinstance(node.args[0], ast.Starred)):
+                attributes |= self.find(node.args[0])
+            return attributes
+
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            return set().union(*[
+                self.find_raising(element)
+                for element in node.elts
+                if not isinstance(element, ast.Starred)
+            ])
+
+        return set()
+
+
+def _get_source_key(node: ast.AST) -> Optional[str]:
+    """ Returns the key if the node is a `source.<key>` or `source['<key>']` reference """
+    key = get_source_attribute(node)
+    if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and node.value.id == SOURCE):
+        return _get_string(node.slice.value if isinstance(node.slice, _INDEX) else node.slice)
+    return key
+
+
+def get_source_reference(expression: Expression) -> Optional[str]:
+    """
+    Returns the key of the record if the expression is only a `source.<key>` or `source['<key>']`
+    reference, so that its value is the value of the key.
+    """
+    tree = ast.parse(expression.code_string.strip(), mode='eval')
+    return _get_source_key(tree.body)
+
+
+def get_source_projection(expressions: Iterable[Expression]) -> Optional[Set[str]]:
+    """
+    Returns the top level keys of the record read by the expressions through `source.<key>` and
+    `source['<key>']` references, or None when an expression uses `source` in any other way (e.g.
+    `source.get(key)` or `str(source)`) so that the expressions may read any key of the record.
+    """
+    projection = set()
+    for expression in expressions:
+        tree = ast.parse(expression.code_string.strip(), mode='eval')
+        attribute_names = set()
+        for node in ast.walk(tree):
+            key = _get_source_key(node)
+            if key:
+                attribute_names.add(node.value)
+                projection.add(key)
+        if any(
+                isinstance(node, ast.Name) and node.id == SOURCE and node not in attribute_names
+                for node in ast.walk(tree)):
+            return None
+    return projection
+
+
+def get_imported_names(import_spec: Optional[List[Dict]]) -> Set[str]:
+    """ Returns the names defined in the evaluation context by the imports of a transformer """
+    names = set()
+    for custom_import in import_spec or []:
+        identifiers = custom_import.get('Identifiers', None)
+        for name in identifiers or [custom_import.get('Module', '')]:
+            name = str(name)
+            names.add(name.split()[-1] if ' as ' in name else name.split('.')[0])
+    return names
+
+
+class FieldDependency:
+    """
+    Names referenced by the expressions of a field.
+    """
+
+    def __init__(self, aggregate_name: str, field_name: str, expressions: List[Expression],
+                 shadowed_names: Set[str]) -> None:
+        """
+        Analyses the expressions of a field
+        :param aggregate_name: Name of the aggregate that contains the field
+        :param field_name: Name of the field
+        :param expressions: `When` and `Value` expressions of the field, in evaluation order
+        :param shadowed_names: Names defined in the evaluation context by the transformer
+        """
+        trees = [
+            ast.parse(expression.code_string.strip(), mode='eval') for expression in expressions
+        ]
+
+        # Source attributes that must be present in the record for the field to be evaluated
+        self.required_source_attributes: Set[str] = set()
+        finder = _StrictAttributeFinder(shadowed_names)
+        for tree in trees:
+            self.required_source_attributes |= finder.find(tree.body)
+
+        self.source_attributes: Set[str] = set()
+        # (aggregate, field) references
+        self.field_references: Set[Tuple[str, str]] = set()
+        # Names referenced other than through an attribute, e.g. `time` or `identity`
+        self.names: Set[str] = set()
+        is_derived = True
+        for tree in trees:
+            attribute_names = set()
+            for node in ast.walk(tree):
+                is_derived = is_derived and isinstance(node, _DERIVED_NODES)
+                if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+                    attribute_names.add(node.value)
+                    if node.value.id == SOURCE:
+                        self.source_attributes.add(node.attr)
+                    elif node.value.id == TIME:
+                        attribute_names.discard(node.value)
+                    else:
+                        self.field_references.add((node.value.id, node.attr))
+            self.names |= {
+                node.id
+                for node in ast.walk(tree)
+                if isinstance(node, ast.Name) and node not in attribute_names
+            }
+
+        # Names that are neither bound by the expressions nor known to be defined in the
+        # evaluation context, e.g. misspelled names
+        bound_names = {
+            node.id if isinstance(node, ast.Name) else node.arg
+            for tree in trees for node in ast.walk(tree)
+            if isinstance(node, ast.arg) or (isinstance(node, ast.Name)
+                                              and not isinstance(node.ctx, ast.Load))
+        }
+        self.undefined_names: Set[str] = {
+            node.id
+            for tree in trees for node in ast.walk(tree) if isinstance(node, ast.Name)
+        } - bound_names - shadowed_names - _CONTEXT_NAMES
+
+        # Fields that only depend on the values of other fields
+        self.is_derived = (is_derived and bool(self.field_references)
+                           and (aggregate_name, field_name) not in self.field_references
+                           and not self.source_attributes
+                           and self.names <= {IDENTITY})
+
+    @property
+    def inputs(self) -> List[Tuple[str, str]]:
+        """ Fields whose values determine the result of a derived field, in a stable order """
+        return sorted(self.field_references)
+
+
+def build_dependency_graph(dependencies: Dict[str, FieldDependency],
+                           aggregate_name: str) -> Dict[str, Set[str]]:
+    """
+    Returns the fields of the aggregate that each field depends on.
+    :param dependencies: Field dependencies by field name
+    :param aggregate_name: Name of the aggregate
+    """
+    return {
+        name: {
+            field
+            for aggregate, field in dependency.field_references
+            if aggregate == aggregate_name and field in dependencies
+        }
+        for name, dependency in dependencies.items()
+    }
+
+
+def get_field_types(aggregate_specs: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Any]:
+    """ Returns the type of each (aggregate, field) defined in the aggregates of a transformer """
+    field_types = {}
+    for aggregate_spec in aggregate_specs:
+        for field_spec in aggregate_spec.get('Fields', []) + aggregate_spec.get('Dimensions', []):
+            field_types[(aggregate_spec.get('Name', None),
+                         field_spec.get('Name', None))] = field_spec.get('Type', None)
+    return field_types
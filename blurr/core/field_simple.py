@@ -1,8 +1,7 @@
 from datetime import datetime, timezone
 from typing import Any
 
-from dateutil import parser
-
+from blurr.core.datetime_parser import parse_datetime
 from blurr.core.field import FieldSchema
 
 
@@ -67,4 +66,4 @@ class DateTimeFieldSchema(FieldSchema):
         return value.isoformat() if value else None
 
     def decoder(self, value: Any) -> datetime:
-        return self.sanitize_object(parser.parse(value)) if value else None
+        return self.sanitize_object(parse_datetime(value)) if value else None
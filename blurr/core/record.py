@@ -13,8 +13,14 @@ def wrap(value: Any) -> Any:
 
 class Record(dict):
     """
-    Wraps a dictionary into an object to allow dictionary keys to be accessed as object properties
+    Wraps a dictionary into an object to allow dictionary keys to be accessed as object properties.
+
+    Nested dictionaries and lists are wrapped on first access and the wrapped views are cached in
+    the record, so that evaluating the same path (e.g. `source.a.b`) for multiple fields does not
+    wrap the nested values again. Records are meant to be read-only: setting or deleting a key
+    drops its cached view but in-place changes to the nested values are not reflected in the views.
     """
+    __slots__ = ('__views', )
 
     def __getattr__(self, name):
         """
@@ -22,14 +28,64 @@ class Record(dict):
         """
         if name.startswith('__') and name.endswith('__'):
             raise AttributeError('Record object has no {} attribute.'.format(name))
-        return wrap(self[name]) if name in self else None
+        if name == '_Record__views':
+            # The cache is created on first use to keep the creation of records cheap
+            self.__views = {}
+            return self.__views
+        return self.__getitem__(name)
 
     def __getitem__(self, item):
-        return wrap(super().__getitem__(item)) if item in self else None
+        value = dict.get(self, item)
+        if not isinstance(value, (dict, list)):
+            return value
+
+        views = self.__views
+        if item not in views:
+            views[item] = wrap(value)
+        return views[item]
+
+    def __setitem__(self, key, value) -> None:
+        self.__views.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self.__views.pop(key, None)
+        super().__delitem__(key)
+
+    def __reduce__(self):
+        # The cached views are not pickled
+        return Record, (dict(self), )
 
 
 class RecordList(list):
-    """ Wraps a list to list of Records"""
+    """
+    Wraps a list to list of Records. Like in `Record` the wrapped elements are cached.
+    """
+    __slots__ = ('__views', )
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.__views = {}
 
     def __getitem__(self, item):
-        return wrap(super().__getitem__(item))
+        value = super().__getitem__(item)
+        if isinstance(item, slice) or not isinstance(value, (dict, list)):
+            return wrap(value)
+
+        if item < 0:
+            item += len(self)
+        views = self.__views
+        if item not in views:
+            views[item] = wrap(value)
+        return views[item]
+
+    def __setitem__(self, key, value) -> None:
+        self.__views.clear()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self.__views.clear()
+        super().__delitem__(key)
+
+    def __reduce__(self):
+        return RecordList, (list(self), )
@@ -0,0 +1,173 @@
+"""
+Codecs that convert the snapshots of aggregates, as created by `BaseItemCollection._snapshot` and
+consumed by `BaseItemCollection.run_restore`, to and from the representation that is persisted by
+the stores and in state files.
+
+`DictSnapshotCodec` keeps the snapshots as dictionaries of field names and encoded field values.
+`BinarySnapshotCodec` encodes a snapshot as bytes: the fields are written by their position in the
+aggregate schema instead of by name and UTC datetimes as microseconds since the epoch, packed with
+msgpack when it is installed or as a compact JSON array otherwise. Decoding returns the same
+dictionary that was encoded. Binary snapshots are smaller, but slower to encode and decode, than
+dictionaries, see `benchmarks/snapshot_codec_benchmark.py`. Field positions are only valid for the
+BTS the snapshot was encoded with, so the encoded snapshot carries a fingerprint of the field names
+that is checked on decode.
+"""
+import json
+import re
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from blurr.core.base import BaseSchemaCollection
+from blurr.core.datetime_parser import parse_datetime
+from blurr.core.errors import SnapshotError
+from blurr.core.field_simple import DateTimeFieldSchema
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Strings created by `isoformat()` of UTC datetimes, which are the only ones that are encoded as
+# integers so that they are decoded to the same string
+_UTC_ISOFORMAT = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.(?!000000)\d{6})?\+00:00\Z')
+
+
+class SnapshotCodec(ABC):
+    """ Converts the snapshots of aggregates to and from their persisted representation """
+
+    @abstractmethod
+    def encode(self, schema: Optional[BaseSchemaCollection], snapshot: Dict[str, Any]) -> Any:
+        """
+        Encodes a snapshot.
+        :param schema: Schema of the aggregate of the snapshot, if known
+        :param snapshot: Dictionary of field name and encoded field value
+        """
+        raise NotImplementedError('encode() must be implemented')
+
+    @abstractmethod
+    def decode(self, schema: Optional[BaseSchemaCollection], data: Any) -> Dict[str, Any]:
+        """
+        Decodes a snapshot encoded with `encode()` with the same schema.
+        :param schema: Schema of the aggregate of the snapshot, if known
+        :param data: Encoded snapshot
+        """
+        raise NotImplementedError('decode() must be implemented')
+
+
+class DictSnapshotCodec(SnapshotCodec):
+    """ Keeps snapshots as dictionaries """
+
+    def encode(self, schema: Optional[BaseSchemaCollection], snapshot: Dict[str, Any]) -> Any:
+        return snapshot
+
+    def decode(self, schema: Optional[BaseSchemaCollection], data: Any) -> Dict[str, Any]:
+        return data
+
+
+class _Layout:
+    """ Positions of the fields of an aggregate in binary snapshots """
+
+    def __init__(self, schema: Optional[BaseSchemaCollection]) -> None:
+        nested_schema = schema.nested_schema if schema else {}
+        self.names: List[str] = list(nested_schema)
+        self.positions: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.datetime_positions: Set[int] = {
+            i
+            for i, field_schema in enumerate(nested_schema.values())
+            if isinstance(field_schema, DateTimeFieldSchema)
+        }
+        self.fingerprint: int = zlib.crc32(','.join(self.names).encode('utf-8'))
+
+
+class BinarySnapshotCodec(SnapshotCodec):
+    """
+    Encodes snapshots as bytes with the fields in the order of the aggregate schema. Fields that
+    are not in the schema are kept by name.
+    """
+
+    def __init__(self) -> None:
+        self._layouts: Dict[Optional[str], _Layout] = {}
+
+    def _get_layout(self, schema: Optional[BaseSchemaCollection]) -> _Layout:
+        name = schema.fully_qualified_name if schema else None
+        if name not in self._layouts:
+            self._layouts[name] = _Layout(schema)
+        return self._layouts[name]
+
+    def encode(self, schema: Optional[BaseSchemaCollection], snapshot: Dict[str, Any]) -> bytes:
+        layout = self._get_layout(schema)
+        positions = layout.positions
+        values = [None] * len(layout.names)
+        extras = {}
+        for name, value in snapshot.items():
+            position = positions.get(name, None)
+            if position is None:
+                extras[name] = value
+            else:
+                values[position] = value
+
+        for position in layout.datetime_positions:
+            if values[position].__class__ is str:
+                values[position] = _encode_datetime(values[position])
+
+        absent = [] if len(snapshot) - len(extras) == len(values) else [
+            i for i, name in enumerate(layout.names) if name not in snapshot
+        ]
+        return _pack([layout.fingerprint, values, absent, extras])
+
+    def decode(self, schema: Optional[BaseSchemaCollection], data: bytes) -> Dict[str, Any]:
+        layout = self._get_layout(schema)
+        fingerprint, values, absent, extras = _unpack(data)
+        if fingerprint != layout.fingerprint:
+            raise SnapshotError('Snapshot was not encoded with the fields of {}'.format(
+                schema.fully_qualified_name if schema else 'an unknown aggregate'))
+
+        for position in layout.datetime_positions:
+            if values[position].__class__ is int:
+                # Formatting the naive datetime is much faster than formatting the UTC offset
+                time = _NAIVE_EPOCH + values[position] * _MICROSECOND
+                values[position] = time.isoformat() + '+00:00'
+
+        snapshot = dict(zip(layout.names, values))
+        for position in absent:
+            del snapshot[layout.names[position]]
+        snapshot.update(extras)
+        return snapshot
+
+
+def _encode_datetime(value: str) -> Any:
+    """ Encodes a UTC datetime string as microseconds since the epoch if it is in isoformat """
+    if not _UTC_ISOFORMAT.match(value):
+        return value
+    try:
+        return (parse_datetime(value) - _EPOCH) // _MICROSECOND
+    except ValueError:
+        return value
+
+
+def _pack(payload: List) -> bytes:
+    if msgpack:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def _unpack(data: bytes) -> List:
+    # JSON payloads are arrays while msgpack arrays of 4 items start with 0x94
+    if data[:1] == b'[':
+        return json.loads(data.decode('utf-8'))
+    if not msgpack:
+        raise SnapshotError('msgpack must be installed to decode the snapshot')
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+SNAPSHOT_CODECS = {'dict': DictSnapshotCodec, 'binary': BinarySnapshotCodec}
+
+
+def get_snapshot_codec(name: str) -> SnapshotCodec:
+    """ Returns a new codec by name, one of `SNAPSHOT_CODECS` """
+    return SNAPSHOT_CODECS[name]()
@@ -1,13 +1,36 @@
 from abc import abstractmethod, ABC
 from datetime import datetime, timezone
-from typing import Any, List, Tuple, Dict
+from typing import Any, List, Tuple, Dict, Optional, Iterable
 
-from blurr.core.base import BaseSchema
+from blurr.core.base import BaseSchema, BaseSchemaCollection
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.snapshot_codec import SNAPSHOT_CODECS, SnapshotCodec, get_snapshot_codec
 from blurr.core.store_key import Key, KeyType
 
 
 class StoreSchema(BaseSchema):
-    pass
+    ATTRIBUTE_CODEC = 'Codec'
+
+    def __init__(self, fully_qualified_name: str, schema_loader: SchemaLoader) -> None:
+        super().__init__(fully_qualified_name, schema_loader)
+        # Codec of the snapshots persisted by the store. See `blurr.core.snapshot_codec`.
+        self.codec_name: str = self._spec.get(self.ATTRIBUTE_CODEC, 'dict')
+
+    def validate_schema_spec(self) -> None:
+        super().validate_schema_spec()
+        self.validate_enum_attribute(self.ATTRIBUTE_CODEC, set(SNAPSHOT_CODECS))
+
+    def get_codec(self) -> SnapshotCodec:
+        return get_snapshot_codec(self.codec_name)
+
+    def get_aggregate_schema(self, name: str) -> Optional[BaseSchemaCollection]:
+        """ Returns the schema of an aggregate of the transformer that the store is defined in """
+        fully_qualified_name = self.schema_loader.get_fully_qualified_name(
+            self.schema_loader.get_transformer_name(self.fully_qualified_name), name)
+        if not self.schema_loader.has_schema_spec(fully_qualified_name):
+            return None
+        schema = self.schema_loader.get_schema_object(fully_qualified_name)
+        return schema if isinstance(schema, BaseSchemaCollection) else None
 
 
 class Store(ABC):
@@ -27,6 +50,13 @@ class Store(ABC):
         """
         raise NotImplementedError()
 
+    def batch_get(self, keys: Iterable[Key]) -> Dict[Key, Any]:
+        """
+        Gets the items of the given keys. Item is None for keys that do not exist. Stores that can
+        read several items in one request override this.
+        """
+        return {key: self.get(key) for key in keys}
+
     def get_range(self,
                   base_key: Key,
                   start_time: datetime,
@@ -1,8 +1,9 @@
+import sys
 from datetime import datetime, timezone
 from enum import Enum
-from typing import List, Any
+from typing import List, Any, Optional, Tuple
 
-from dateutil import parser
+from blurr.core.datetime_parser import parse_datetime
 
 
 class KeyType(Enum):
@@ -13,22 +14,31 @@ class KeyType(Enum):
 
 class Key:
     """
-    A record in the store is identified by a key
+    A record in the store is identified by a key.
+
+    Keys are immutable values, with read-only attributes, that are hashed and compared constantly
+    by the stores and the runners, so the hash and the sort key string are computed once on first
+    use. Keys are totally ordered by identity and group, then DIMENSION keys by dimensions before
+    TIMESTAMP keys by timestamp, so that they can be used directly with `sorted()` and `bisect`.
     """
     PARTITION = '/'
     DIMENSION_PARTITION = ':'
 
+    __slots__ = ('_key_type', '_identity', '_group', '_dimensions', '_timestamp', '_order', '_hash',
+                 '_sort_key')
+
     # TODO: Consider adding a * to force parameterization of attributes.
     def __init__(self,
                  key_type: KeyType,
                  identity: str,
                  group: str,
-                 dimensions: List[str] = list(),
+                 dimensions: List[str] = (),
                  timestamp: datetime = None) -> None:
         """
         Initializes a new key for storing data
         :param identity: Primary identity of the record being stored
         :param group: Secondary identity of the record
+        :param dimensions: Dimension values of the record, kept as a tuple
         :param timestamp: Optional timestamp that can be used for time range queries
         """
         if not identity or identity.isspace():
@@ -40,18 +50,53 @@ class Key:
         if dimensions and timestamp:
             raise ValueError('Both dimensions and timestamp should not be set together.')
 
-        if key_type == KeyType.DIMENSION and timestamp:
+        if timestamp and key_type == KeyType.DIMENSION:
             raise ValueError('`timestamp` should not be set for KeyType.DIMENSION.')
 
-        if key_type == KeyType.TIMESTAMP and dimensions:
+        if dimensions and key_type == KeyType.TIMESTAMP:
             raise ValueError('`dimensions` should not be set for KeyType.TIMESTAMP.')
 
-        self.key_type = key_type
-        self.identity = identity
-        self.group = group
-        self.timestamp = timestamp if not timestamp or timestamp.tzinfo else timestamp.replace(
-            tzinfo=timezone.utc)
-        self.dimensions = dimensions
+        # Identities and groups are repeated across many keys so a single copy is kept
+        identity = sys.intern(identity)
+        group = sys.intern(group)
+        dimensions = tuple(dimensions) if dimensions else ()
+        if timestamp and not timestamp.tzinfo:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        self._key_type = key_type
+        self._identity = identity
+        self._group = group
+        self._dimensions = dimensions
+        self._timestamp = timestamp
+        # Only one of the dimensions and the timestamp can be set
+        self._order = (identity, group, 1, timestamp) if timestamp else (identity, group, 0,
+                                                                         dimensions)
+        self._hash = None
+        self._sort_key = None
+
+    @property
+    def key_type(self) -> KeyType:
+        return self._key_type
+
+    @property
+    def identity(self) -> str:
+        return self._identity
+
+    @property
+    def group(self) -> str:
+        return self._group
+
+    @property
+    def dimensions(self) -> Tuple[str, ...]:
+        return self._dimensions
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        return self._timestamp
+
+    def __reduce__(self) -> Tuple:
+        return Key, (self._key_type, self._identity, self._group, self._dimensions,
+                     self._timestamp)
 
     # TODO: Handle '/' and ':' values in dimensions
     @property
@@ -67,7 +112,7 @@ class Key:
             key_type = KeyType.TIMESTAMP
         return Key(key_type, parts[0], parts[1], parts[2].split(Key.DIMENSION_PARTITION)
                    if parts[2] else [],
-                   parser.parse(parts[3]) if parts[3] else None)
+                   parse_datetime(parts[3]) if parts[3] else None)
 
     @staticmethod
     def parse_sort_key(identity: str, sort_key_string: str) -> 'Key':
@@ -78,7 +123,7 @@ class Key:
             key_type = KeyType.TIMESTAMP
         return Key(key_type, identity, parts[0], parts[1].split(Key.DIMENSION_PARTITION)
                    if parts[1] else [],
-                   parser.parse(parts[2]) if parts[2] else None)
+                   parse_datetime(parts[2]) if parts[2] else None)
 
     def __str__(self):
         """ Returns the string representation of the key"""
@@ -86,9 +131,11 @@ class Key:
 
     @property
     def sort_key(self):
-        return Key.PARTITION.join(
-            [self.group, self.dimensions_str,
-             self.timestamp.isoformat() if self.timestamp else ''])
+        if self._sort_key is None:
+            self._sort_key = Key.PARTITION.join(
+                [self._group, self.dimensions_str,
+                 self._timestamp.isoformat() if self._timestamp else ''])
+        return self._sort_key
 
     @property
     def sort_prefix_key(self):
@@ -103,40 +150,39 @@ class Key:
         return self.__str__()
 
     def __eq__(self, other: 'Key') -> bool:
-        return other and (self.identity, self.group, self.timestamp,
-                          self.dimensions) == (other.identity, other.group, other.timestamp,
-                                               other.dimensions)
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order == other._order
 
-    def __lt__(self, other: 'Key') -> bool:
-        """
-        Does a less than comparison on two keys. A None timestamp is considered
-        larger than a timestamp that has been set.
-        """
-        if (self.identity, self.group, self.key_type) != (other.identity, other.group,
-                                                          other.key_type):
-            return False
+    def __ne__(self, other: 'Key') -> bool:
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order != other._order
 
-        if self.key_type == KeyType.TIMESTAMP:
-            return self.timestamp < other.timestamp
+    def __lt__(self, other: 'Key') -> bool:
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order < other._order
 
-        return self.dimensions < other.dimensions
+    def __le__(self, other: 'Key') -> bool:
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order <= other._order
 
     def __gt__(self, other: 'Key') -> bool:
-        """
-        Does a greater than comparison on two keys. A None timestamp is
-        considered larger than a timestamp that has been set.
-        """
-        if (self.identity, self.group, self.key_type) != (other.identity, other.group,
-                                                          other.key_type):
-            return False
-
-        if self.key_type == KeyType.TIMESTAMP:
-            return self.timestamp > other.timestamp
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order > other._order
 
-        return self.dimensions > other.dimensions
+    def __ge__(self, other: 'Key') -> bool:
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self._order >= other._order
 
     def __hash__(self):
-        return hash((self.identity, self.group, self.timestamp, self.dimensions_str))
+        if self._hash is None:
+            self._hash = hash(self._order)
+        return self._hash
 
     def starts_with(self, other: 'Key') -> bool:
         """
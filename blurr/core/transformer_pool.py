@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Any
+
+from blurr.core.transformer_streaming import StreamingTransformer, StreamingTransformerSchema
+
+
+class TransformerPool:
+    """
+    Streaming transformers of recently active identities kept in memory, so that the aggregates and
+    fields of an identity are not created and its state is not restored from the store again for
+    every batch of its records. Transformers are evicted when the pool is over its size, least
+    recently used first, or when they have not been used for `ttl` seconds. Evicted transformers are
+    finalized so that their state is saved in the store, from which a new transformer of the
+    identity restores it.
+    """
+
+    # Default number of transformers kept in the pool
+    MAX_SIZE = 10000
+
+    def __init__(self,
+                 schema: StreamingTransformerSchema,
+                 max_size: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param schema: Schema of the transformers
+        :param max_size: Maximum number of transformers in the pool
+        :param ttl: Seconds after their last use after which transformers are evicted. Idle
+            transformers are kept until evicted by size when None.
+        :param clock: Returns the current time in seconds
+        """
+        self._schema = schema
+        self.max_size = self.MAX_SIZE if max_size is None else max_size
+        self.ttl = ttl
+        self._clock = clock
+        # Transformers and the time they were last used, least recently used first
+        self._transformers: Dict[str, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, identity: str) -> StreamingTransformer:
+        """ Returns the transformer of the identity, creating it if it is not in the pool """
+        now = self._clock()
+        entry = self._transformers.pop(identity, None)
+        if entry is not None and (self.ttl is None or now - entry[1] <= self.ttl):
+            self.hits += 1
+            self._transformers[identity] = (entry[0], now)
+            return entry[0]
+
+        if entry is not None:
+            entry[0].run_finalize()
+            self.expirations += 1
+
+        self.misses += 1
+        transformer = StreamingTransformer(self._schema, identity)
+        self._transformers[identity] = (transformer, now)
+        while len(self._transformers) > max(self.max_size, 1):
+            _, (evicted, _) = self._transformers.popitem(last=False)
+            evicted.run_finalize()
+            self.evictions += 1
+        return transformer
+
+    def expire(self) -> int:
+        """ Evicts the transformers that have not been used for `ttl` seconds """
+        if self.ttl is None:
+            return 0
+
+        expired = 0
+        deadline = self._clock() - self.ttl
+        while self._transformers:
+            identity, (transformer, last_used) = next(iter(self._transformers.items()))
+            if last_used >= deadline:
+                break
+            del self._transformers[identity]
+            transformer.run_finalize()
+            expired += 1
+        self.expirations += expired
+        return expired
+
+    def finalize(self, identity: Optional[str] = None) -> None:
+        """
+        Saves the state of the transformer of the identity, or of all the transformers when None,
+        in the store without evicting them.
+        """
+        if identity is None:
+            for transformer, _ in self._transformers.values():
+                transformer.run_finalize()
+        elif identity in self._transformers:
+            self._transformers[identity][0].run_finalize()
+
+    def clear(self) -> None:
+        """ Finalizes and removes all the transformers from the pool """
+        self.finalize()
+        self._transformers.clear()
+
+    def __contains__(self, identity: str) -> bool:
+        return identity in self._transformers
+
+    def __len__(self) -> int:
+        return len(self._transformers)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """ Hit, miss, eviction and expiration counts, hit ratio and number of transformers """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': len(self._transformers)
+        }
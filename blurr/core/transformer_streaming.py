@@ -1,6 +1,10 @@
 from datetime import datetime, timezone
+from typing import Generator, Optional, Set
 
+from blurr.core.base import BaseSchema
 from blurr.core.errors import IdentityError, TimeError
+from blurr.core.evaluation import Expression
+from blurr.core.field_dependency import get_source_projection
 from blurr.core.field_simple import DateTimeFieldSchema
 from blurr.core.record import Record
 from blurr.core.schema_loader import SchemaLoader
@@ -15,11 +19,26 @@ class StreamingTransformerSchema(TransformerSchema):
     ATTRIBUTE_IDENTITY = 'Identity'
     ATTRIBUTE_TIME = 'Time'
 
+    # Only keep the keys of the records that the expressions read, see `source_projection`
+    PROJECT_SOURCE = True
+
     def __init__(self, fully_qualified_name: str, schema_loader: SchemaLoader) -> None:
         super().__init__(fully_qualified_name, schema_loader)
 
         self.identity = self.build_expression(self.ATTRIBUTE_IDENTITY)
         self.time = self.build_expression(self.ATTRIBUTE_TIME)
+        self._source_projection = False
+
+    @property
+    def source_projection(self) -> Optional[Set[str]]:
+        """
+        Top level keys of the records that are read by the expressions of the transformer and its
+        aggregates and fields. None if all the keys may be read.
+        """
+        if self._source_projection is False:
+            self._source_projection = get_source_projection(
+                _get_expressions(self)) if self.PROJECT_SOURCE else None
+        return self._source_projection
 
     def validate_schema_spec(self) -> None:
         super().validate_schema_spec()
@@ -57,6 +76,19 @@ class StreamingTransformerSchema(TransformerSchema):
         return time
 
 
+def _get_expressions(schema: BaseSchema) -> Generator[Expression, None, None]:
+    """ Yields the expressions of a schema and of the schema nested in it """
+    for value in vars(schema).values():
+        if isinstance(value, Expression):
+            yield value
+        elif isinstance(value, BaseSchema):
+            yield from _get_expressions(value)
+        elif isinstance(value, dict):
+            for nested_value in value.values():
+                if isinstance(nested_value, BaseSchema):
+                    yield from _get_expressions(nested_value)
+
+
 class StreamingTransformer(Transformer):
     def __init__(self, schema: TransformerSchema, identity: str) -> None:
         super().__init__(schema, identity)
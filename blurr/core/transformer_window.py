@@ -3,6 +3,7 @@ from typing import Dict, Optional
 from blurr.core.aggregate_block import BlockAggregate, TimeAggregate
 from blurr.core.aggregate_window import WindowAggregate
 from blurr.core.anchor import Anchor
+from blurr.core.block_cache import BlockCache
 from blurr.core.errors import AnchorBlockNotDefinedError
 from blurr.core.evaluation import Context, EvaluationContext
 from blurr.core.schema_loader import SchemaLoader
@@ -43,11 +44,25 @@ class WindowTransformer(Transformer):
     block data.
     """
 
-    def __init__(self, schema: WindowTransformerSchema, identity: str, context: Context) -> None:
+    def __init__(self,
+                 schema: WindowTransformerSchema,
+                 identity: str,
+                 context: Context,
+                 block_cache: Optional[BlockCache] = None) -> None:
+        """
+        Initializes the window transformer of an identity.
+        :param block_cache: Cache of the restored blocks of the identity shared by all the window
+        aggregates. A new cache is used if not provided.
+        """
         super().__init__(schema, identity)
         self._evaluation_context.merge(EvaluationContext(context))
         self._anchor = Anchor(schema.anchor)
 
+        self.block_cache = block_cache if block_cache is not None else BlockCache()
+        for item in self._nested_items.values():
+            if isinstance(item, WindowAggregate):
+                item.block_cache = self.block_cache
+
     def run_evaluate(self, block: TimeAggregate) -> bool:
         """
         Evaluates the anchor condition against the specified block.
@@ -1,24 +1,76 @@
 import json
+import re
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from copy import copy
+from typing import List, Dict, Optional, Set, Any, Union
 
 from blurr.core.record import Record
 
+try:
+    import orjson
+except ImportError:
+    # orjson is an optional faster json parser
+    orjson = None
+
+
+# Runs of digits that can be integers outside of the 64 bit range that orjson parses as floats
+_LONG_DIGITS = re.compile('[0-9]{19}')
+_LONG_DIGITS_BYTES = re.compile(b'[0-9]{19}')
+
+
+def loads(data_string: Union[str, bytes]) -> Any:
+    """
+    Parses a json string with orjson when it is installed. Documents that orjson does not accept,
+    like the ones with NaN and Infinity constants, and documents with digit runs long enough to
+    be integers larger than 64 bits, which orjson parses as floats, are parsed with json so that
+    the parsed values do not depend on orjson being installed.
+    """
+    if orjson is not None:
+        long_digits = _LONG_DIGITS_BYTES if isinstance(data_string, bytes) else _LONG_DIGITS
+        if not long_digits.search(data_string):
+            try:
+                return orjson.loads(data_string)
+            except ValueError:
+                pass
+    return json.loads(data_string)
+
 
 class DataProcessor(ABC):
+    # Top level keys of the records that are kept, all keys are kept when None
+    projection: Optional[Set[str]] = None
+
     @abstractmethod
     def process_data(self, data_string: str) -> List[Record]:
         pass
 
+    def project(self, projection: Optional[Set[str]]) -> 'DataProcessor':
+        """
+        Returns a copy of the data processor that only keeps the given top level keys in the
+        records that it creates with `create_record()`.
+        :param projection: Keys to keep. All the keys are kept when None.
+        """
+        if projection == self.projection:
+            return self
+        data_processor = copy(self)
+        data_processor.projection = None if projection is None else frozenset(projection)
+        return data_processor
+
+    def create_record(self, data: Dict) -> Record:
+        """ Creates a record with the keys of the projection """
+        if (self.projection is None or not isinstance(data, dict)
+                or self.projection.issuperset(data)):
+            return Record(data)
+        return Record({key: data[key] for key in self.projection if key in data})
+
 
 class SimpleJsonDataProcessor(DataProcessor):
     def process_data(self, data_string: str) -> List[Record]:
-        return [Record(json.loads(data_string))]
+        return [self.create_record(loads(data_string))]
 
 
 class SimpleDictionaryDataProcessor(DataProcessor):
     def process_data(self, data_dict: Dict) -> List[Record]:
-        return [Record(data_dict)]
+        return [self.create_record(data_dict)]
 
 
 class IpfixDataProcessor(DataProcessor):
@@ -32,7 +84,7 @@ class IpfixDataProcessor(DataProcessor):
     }
 
     def process_data(self, data_string: str) -> List[Record]:
-        data = json.loads(data_string)
+        data = loads(data_string)
         if not isinstance(data, dict):
             return []
 
@@ -43,6 +95,6 @@ class IpfixDataProcessor(DataProcessor):
                 i = event_dict.get('I', 0)
                 record[self.IPFIX_EVENT_MAPPER.get(i, i)] = event_dict['V']
             if self.IPFIX_EVENT_MAPPER[56] in record:
-                record_list.append(Record(record))
+                record_list.append(self.create_record(record))
 
         return record_list
@@ -4,24 +4,85 @@ Usage:
     local_runner.py (-h | --help)
 """
 import csv
+import heapq
 import json
+import pickle
+import struct
+import tempfile
+import zlib
 from collections import defaultdict
-from typing import List, Optional, Dict, Tuple
+from datetime import datetime
+from itertools import count, groupby
+from multiprocessing import Pool
+from operator import itemgetter
+from typing import List, Optional, Dict, Tuple, Any, Iterable, Generator, Union
 
 from smart_open import smart_open
 
 from blurr.cli.validate import validate
+from blurr.core.base import BaseSchemaCollection
+from blurr.core.snapshot_codec import BinarySnapshotCodec
+from blurr.core.store_key import Key
 from blurr.runner.data_processor import DataProcessor, SimpleJsonDataProcessor
 from blurr.runner.json_encoder import BlurrJSONEncoder
-from blurr.runner.runner import Runner, TimeAndRecord
+from blurr.runner.runner import Runner, TimeAndRecord, merge_state
+
+# Default amount of memory used to buffer records before they are spilled to disk in the streaming
+# mode.
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Sort key used for the records in the streaming mode. The sequence number of the record ensures
+# that records with the same identity and time are processed in the order they were read.
+SortKey = Tuple[str, datetime, int]
+
+# Length prefix of the keys and snapshots in state files
+_FRAME_LENGTH = struct.Struct('>I')
+
+# The runner used by a worker process. This is set once per worker by the pool initializer so that
+# the runner is not serialized again for every shard that the worker processes.
+_worker_runner: 'LocalRunner' = None
+
+
+def _init_worker(runner: 'LocalRunner') -> None:
+    global _worker_runner
+    _worker_runner = runner
+
+
+def _execute_shard(shard: List[Tuple[str, List[TimeAndRecord], Optional[Dict]]]
+                   ) -> List[Tuple[str, Tuple[Dict, List]]]:
+    return list(_worker_runner.execute_all_identity_records(shard))
 
 
 class LocalRunner(Runner):
-    def __init__(self, stream_bts_file: str, window_bts_file: Optional[str] = None):
-        super().__init__(stream_bts_file, window_bts_file)
+    def __init__(self,
+                 stream_bts_file: str,
+                 window_bts_file: Optional[str] = None,
+                 workers: int = 1,
+                 delta_state: bool = False):
+        """
+        Initialize LocalRunner.
+
+        :param stream_bts_file: Streaming BTS to use. Must be provided.
+        :param window_bts_file: Window BTS to use. If none is provided only the streaming BTS output
+            is generated.
+        :param workers: Number of worker processes the identities are sharded across. Identities
+            are processed serially in the current process when set to 1.
+        :param delta_state: Only output the Streaming BTS State items created or modified by the
+            execution. Identities of the old state without records are not output.
+        """
+        if workers < 1:
+            raise ValueError('`workers` must be greater than 0.')
+        super().__init__(stream_bts_file, window_bts_file, delta_state)
 
+        self._workers = workers
         self._per_user_data = {}
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # The output collected so far is not needed by the worker processes.
+        state = super().__getstate__()
+        state['_per_user_data'] = {}
+        return state
+
     def _validate_bts_syntax(self) -> None:
         validate(self._stream_bts)
         if self._window_bts is not None:
@@ -32,15 +93,46 @@ class LocalRunner(Runner):
                                     old_state: Optional[Dict[str, Dict]] = None) -> None:
         if not old_state:
             old_state = {}
-        for identity, records in identity_records.items():
-            _, data = self.execute_per_identity_records(identity, records,
-                                                        old_state.get(identity, None))
-            self._per_user_data[identity] = data
+        if self._workers > 1:
+            self._execute_for_all_identities_in_pool(identity_records, old_state)
+        else:
+            for identity, data in self.execute_all_identity_records(
+                (identity, records, old_state.get(identity, None))
+                    for identity, records in identity_records.items()):
+                self._per_user_data[identity] = data
+
+        if self._delta_state:
+            return
 
         for identity, state in old_state.items():
             if identity not in self._per_user_data:
                 self._per_user_data[identity] = (old_state[identity], [])
 
+    def _execute_for_all_identities_in_pool(self,
+                                            identity_records: Dict[str, List[TimeAndRecord]],
+                                            old_state: Dict[str, Dict]) -> None:
+        """
+        Hash partitions the identities into one shard per worker and executes the shards in a
+        process pool. The results are merged back in the order of `identity_records` so that the
+        output is identical to a serial execution.
+        """
+        shards = [[] for _ in range(self._workers)]
+        for identity, records in identity_records.items():
+            shards[self._get_shard_index(identity)].append((identity, records,
+                                                            old_state.get(identity, None)))
+
+        with Pool(self._workers, initializer=_init_worker, initargs=(self, )) as pool:
+            results = dict(
+                result for shard_result in pool.map(_execute_shard, [s for s in shards if s])
+                for result in shard_result)
+
+        for identity in identity_records:
+            self._per_user_data[identity] = results[identity]
+
+    def _get_shard_index(self, identity: str) -> int:
+        # crc32 is used instead of hash() as string hashes are randomized per process.
+        return zlib.crc32(identity.encode('utf-8')) % self._workers
+
     def get_identity_records_from_json_files(
             self, json_files: List[str], data_processor: DataProcessor = SimpleJsonDataProcessor()
     ) -> Dict[str, List[TimeAndRecord]]:
@@ -52,14 +144,126 @@ class LocalRunner(Runner):
                     identity_records[identity].append(record_with_datetime)
         return identity_records
 
+    def get_sorted_identity_records_from_json_files(
+            self,
+            json_files: List[str],
+            data_processor: DataProcessor = SimpleJsonDataProcessor(),
+            memory_budget: int = DEFAULT_MEMORY_BUDGET,
+            spill_dir: Optional[str] = None
+    ) -> Generator[Tuple[str, List[TimeAndRecord]], None, None]:
+        """
+        Reads the records from the json files and yields the records of one identity at a time,
+        sorted by identity and time. Records are buffered in memory until the size of the buffered
+        records exceeds `memory_budget`, at which point they are sorted and spilled to disk as a
+        run. The runs are then merged so that only the records of the current identity are held in
+        memory.
+
+        :param json_files: List of json file paths.
+        :param data_processor: `DataProcessor` to process each event in the json files.
+        :param memory_budget: Approximate number of bytes of records to buffer before spilling.
+        :param spill_dir: Directory to write the sorted runs to. The system temporary directory is
+            used if None is provided.
+        :return: Generator of Tuple[Identity, List[TimeAndRecord]] which can be used in
+            `execute_streaming()`
+        """
+        with tempfile.TemporaryDirectory(dir=spill_dir) as run_dir:
+            buffer = []
+            buffer_size = 0
+            run_files = []
+            sequence = count()
+            for file in json_files:
+                with smart_open(file) as file_stream:
+                    for identity, (time, record) in self.get_per_identity_records(
+                            file_stream, data_processor):
+                        payload = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+                        buffer.append(((identity, time, next(sequence)), payload))
+                        buffer_size += len(payload)
+                        if buffer_size >= memory_budget:
+                            run_files.append(self._write_sorted_run(buffer, run_dir))
+                            buffer, buffer_size = [], 0
+
+            # Records are only spilled to disk if they do not fit in the memory budget
+            if run_files:
+                if buffer:
+                    run_files.append(self._write_sorted_run(buffer, run_dir))
+                    buffer = []
+                sorted_items = heapq.merge(
+                    *[self._read_sorted_run(run_file) for run_file in run_files],
+                    key=itemgetter(0))
+            else:
+                buffer.sort(key=itemgetter(0))
+                sorted_items = iter(buffer)
+
+            for identity, items in groupby(sorted_items, key=lambda item: item[0][0]):
+                yield identity, [(time, pickle.loads(payload))
+                                 for (_, time, _), payload in items]
+
+    @staticmethod
+    def _write_sorted_run(buffer: List[Tuple[SortKey, bytes]], run_dir: str) -> str:
+        buffer.sort(key=itemgetter(0))
+        with tempfile.NamedTemporaryFile(dir=run_dir, suffix='.run', delete=False) as run_file:
+            for item in buffer:
+                pickle.dump(item, run_file, pickle.HIGHEST_PROTOCOL)
+        return run_file.name
+
+    @staticmethod
+    def _read_sorted_run(run_file_name: str) -> Generator[Tuple[SortKey, bytes], None, None]:
+        with open(run_file_name, 'rb') as run_file:
+            while True:
+                try:
+                    yield pickle.load(run_file)
+                except EOFError:
+                    return
+
     def execute(self,
                 identity_records: Dict[str, List[TimeAndRecord]],
                 old_state: Optional[Dict[str, Dict]] = None) -> Dict[str, Tuple[Dict, List]]:
         self._execute_for_all_identities(identity_records, old_state)
         return self._per_user_data
 
+    def execute_streaming(self,
+                          identity_records: Iterable[Tuple[str, List[TimeAndRecord]]],
+                          old_state: Optional[Dict[str, Dict]] = None
+                          ) -> Generator[Tuple[str, Tuple[Dict, List]], None, None]:
+        """
+        Executes the BTS one identity at a time and yields the output of each identity as soon as
+        it is processed. Unlike `execute()` the output is not held in memory.
+
+        :param identity_records: Iterable of Tuple[Identity, List[TimeAndRecord]] with each
+            identity occurring only once.
+        :param old_state: Streaming BTS state dictionary from a previous execution.
+        :return: Generator of Tuple[Identity, Tuple[Streaming BTS state dictionary,
+            List of window BTS output]] which can be passed to `print_output()` or
+            `write_output_file()`.
+        """
+        if not old_state:
+            old_state = {}
+        processed_identities = set()
+
+        def get_identity_records_with_state():
+            for identity, records in identity_records:
+                if old_state:
+                    processed_identities.add(identity)
+                yield identity, records, old_state.get(identity, None)
+
+        yield from self.execute_all_identity_records(get_identity_records_with_state())
+
+        if self._delta_state:
+            return
+
+        for identity, state in old_state.items():
+            if identity not in processed_identities:
+                yield identity, (state, [])
+
+    @staticmethod
+    def _get_items(per_user_data: Union[Dict[str, Tuple[Dict, List]], Iterable[Tuple[str, Tuple[
+            Dict, List]]]]) -> Iterable[Tuple[str, Tuple[Dict, List]]]:
+        """ Output can be provided as the dictionary from `execute()` or the generator from
+        `execute_streaming()` """
+        return per_user_data.items() if isinstance(per_user_data, dict) else per_user_data
+
     def print_output(self, per_user_data) -> None:
-        for id, (block_data, window_data) in per_user_data.items():
+        for id, (block_data, window_data) in self._get_items(per_user_data):
             if not self._window_bts:
                 for data in block_data.items():
                     print(json.dumps(data, cls=BlurrJSONEncoder))
@@ -69,19 +273,78 @@ class LocalRunner(Runner):
     def write_output_file(self, output_file: str, per_user_data):
         if not self._window_bts:
             with smart_open(output_file, 'w') as file:
-                for block_data, _ in per_user_data.values():
+                for _, (block_data, _) in self._get_items(per_user_data):
                     for row in block_data.items():
                         file.write(json.dumps(row, cls=BlurrJSONEncoder))
                         file.write('\n')
         else:
-            header = []
-            for _, window_data in per_user_data.values():
-                for data_row in window_data:
-                    header = list(data_row.keys())
-                    break
-            header.sort()
             with smart_open(output_file, 'w') as csv_file:
-                writer = csv.DictWriter(csv_file, header)
-                writer.writeheader()
-                for _, window_data in per_user_data.values():
-                    writer.writerows(window_data)
+                # The header is created from the first window row so that the rows can be written
+                # out as they are generated.
+                writer = None
+                for _, (_, window_data) in self._get_items(per_user_data):
+                    for data_row in window_data:
+                        if writer is None:
+                            writer = csv.DictWriter(csv_file, sorted(data_row.keys()))
+                            writer.writeheader()
+                        writer.writerow(data_row)
+
+                if writer is None:
+                    csv.DictWriter(csv_file, []).writeheader()
+
+    def write_state_file(self, state_file: str, per_user_data) -> None:
+        """
+        Writes the streaming BTS state of the output of `execute()` or `execute_streaming()`
+        encoded with the `BinarySnapshotCodec`. The state can be read back with
+        `read_state_file()` and passed as the old state of a later execution.
+        """
+        codec = BinarySnapshotCodec()
+        with smart_open(state_file, 'wb') as file:
+            for _, (block_data, _) in self._get_items(per_user_data):
+                for key, snapshot in block_data.items():
+                    data = codec.encode(self._get_aggregate_schema(key), snapshot)
+                    for frame in (str(key).encode('utf-8'), data):
+                        file.write(_FRAME_LENGTH.pack(len(frame)))
+                        file.write(frame)
+
+    def read_state_file(self, state_file: str) -> Dict[str, Dict[Key, Any]]:
+        """
+        Reads a state file written by `write_state_file()` with the same streaming BTS.
+        :return: Streaming BTS state dictionary by identity.
+        """
+        codec = BinarySnapshotCodec()
+        state = defaultdict(dict)
+        with smart_open(state_file, 'rb') as file:
+            while True:
+                key_frame = self._read_frame(file)
+                if key_frame is None:
+                    return dict(state)
+                key = Key.parse(key_frame.decode('utf-8'))
+                state[key.identity][key] = codec.decode(
+                    self._get_aggregate_schema(key), self._read_frame(file))
+
+    def compact_state_files(self, base_state_file: Optional[str], delta_state_files: List[str],
+                            state_file: str) -> None:
+        """
+        Merges the state files written for the delta states of incremental executions into a base
+        state file, see `merge_state()`.
+        :param base_state_file: State file of the base state. None to start from an empty state.
+        :param delta_state_files: State files of the delta states in the order they were created.
+        :param state_file: State file to write the compacted state to.
+        """
+        base_state = self.read_state_file(base_state_file) if base_state_file else {}
+        state = merge_state(base_state, *[self.read_state_file(file) for file in delta_state_files])
+        self.write_state_file(state_file,
+                              ((identity, (items, [])) for identity, items in state.items()))
+
+    def _get_aggregate_schema(self, key: Key) -> Optional[BaseSchemaCollection]:
+        return self._schema_loader.get_nested_schema_object(
+            self._get_streaming_transformer_schema(self._schema_loader).fully_qualified_name,
+            key.group)
+
+    @staticmethod
+    def _read_frame(file) -> Optional[bytes]:
+        header = file.read(_FRAME_LENGTH.size)
+        if not header:
+            return None
+        return file.read(_FRAME_LENGTH.unpack(header)[0])
@@ -1,25 +1,40 @@
+import json
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import List, Optional, Tuple, Any, Dict, Iterable, Generator
+from copy import deepcopy
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from typing import List, Optional, Tuple, Any, Dict, Iterable, Generator, Iterator, Union
 
 import yaml
 from smart_open import smart_open
 
 from blurr.core import logging
+from blurr.core.aggregate import AggregateSchema
+from blurr.core.aggregate_activity import ActivityAggregateSchema
 from blurr.core.aggregate_block import BlockAggregate, TimeAggregate
+from blurr.core.aggregate_identity import IdentityAggregateSchema
+from blurr.core.block_cache import BlockCache
+from blurr.core.datetime_parser import parse_datetime
 from blurr.core.errors import PrepareWindowMissingBlocksError
 from blurr.core.evaluation import Context
+from blurr.core.field_dependency import FieldDependency
 from blurr.core.record import Record
 from blurr.core.schema_loader import SchemaLoader
 from blurr.core.store import Store
-from blurr.core.store_key import Key
+from blurr.core.store_key import Key, KeyType
 from blurr.core.transformer_streaming import StreamingTransformer, StreamingTransformerSchema
-from blurr.core.transformer_window import WindowTransformer
+from blurr.core.transformer_window import WindowTransformer, WindowTransformerSchema
 from blurr.core.type import Type
 from blurr.runner.data_processor import DataProcessor
+from blurr.store.memory_store import MemoryStore
 
 TimeAndRecord = Tuple[datetime, Record]
 
+# Compiled schema loaders of the runners deserialized in the current process, by the contents of
+# their BTS. This is kept at module level so that the schema is built once per process (e.g. once
+# per Spark executor python worker) and not once for every task that deserializes the runner.
+_deserialized_schema_loaders: Dict[str, SchemaLoader] = {}
+
 
 class Runner(ABC):
     """
@@ -37,12 +52,26 @@ class Runner(ABC):
         - This returns Tuple[Identity, Tuple[Streaming BTS State, List of Window BTS output]].
         - `execute_per_identity_records()` can take in a existing old_state (old Streaming BTS
             State) so as to allow batch execution to make use of previous output.
+
+    When `delta_state` is set the Streaming BTS State returned for an identity only contains the
+    items created or modified by the execution, instead of the complete state including the old
+    state. The deltas of incremental runs are combined with a base state by `merge_state()`.
     """
 
-    def __init__(self, stream_bts_file: str, window_bts_file: Optional[str]):
+    # Number of identities whose identity aggregates are read from the store with one
+    # `Store.batch_get()` by `execute_all_identity_records()`
+    PRELOAD_IDENTITIES = 100
+
+    def __init__(self, stream_bts_file: str, window_bts_file: Optional[str],
+                 delta_state: bool = False):
         self._stream_bts = yaml.safe_load(smart_open(stream_bts_file))
         self._window_bts = None if window_bts_file is None else yaml.safe_load(
             smart_open(window_bts_file))
+        self._delta_state = delta_state
+        # Compiled schema loader, which is not serialized with the runner
+        self._compiled_schema_loader: Optional[SchemaLoader] = None
+        # Set on the copies of the runner deserialized in other processes
+        self._is_deserialized = False
 
         # TODO: Assume validation will be done separately.
         # This causes a problem when running the code on spark
@@ -52,6 +81,62 @@ class Runner(ABC):
         # if self._window_bts is not None:
         #     validate_schema_spec(self._window_bts)
 
+    @property
+    def _schema_loader(self) -> SchemaLoader:
+        """
+        Returns the schema loader containing the compiled streaming and window BTS schema. The
+        schema is built once and shared by all the identities processed by the runner. Only the
+        per identity state (store contents and field values) is created for each identity.
+        """
+        if self._compiled_schema_loader is None:
+            if not self._is_deserialized:
+                self._compiled_schema_loader = self._build_schema_loader()
+            else:
+                bts_key = json.dumps([self._stream_bts, self._window_bts],
+                                     sort_keys=True,
+                                     default=str)
+                if bts_key not in _deserialized_schema_loaders:
+                    _deserialized_schema_loaders[bts_key] = self._build_schema_loader()
+                self._compiled_schema_loader = _deserialized_schema_loaders[bts_key]
+
+        return self._compiled_schema_loader
+
+    def _build_schema_loader(self) -> SchemaLoader:
+        # Schema objects extend the spec they are built from so a copy of the BTS is used to
+        # keep the original BTS unchanged for other processes.
+        schema_loader = SchemaLoader()
+        for bts in [self._stream_bts, self._window_bts]:
+            if bts is not None:
+                schema_loader.get_schema_object(schema_loader.add_schema_spec(deepcopy(bts)))
+        return schema_loader
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['_compiled_schema_loader'] = None
+        state['_is_deserialized'] = True
+        return state
+
+    def execute_all_identity_records(
+            self, identity_records: Iterable[Tuple[str, List[TimeAndRecord], Optional[Dict]]]
+    ) -> Generator[Tuple[str, Tuple[Dict, List]], None, None]:
+        """
+        Executes `execute_per_identity_records()` for each identity, records and old state. The
+        identity aggregates of `PRELOAD_IDENTITIES` identities at a time are read from the store
+        with one `Store.batch_get()` and the store is finalized after the last identity, so that
+        persistent stores read and write the state of several identities per request.
+        :return: Yields the output of `execute_per_identity_records()` for each identity.
+        """
+        identity_records = iter(identity_records)
+        try:
+            batch = list(islice(identity_records, self.PRELOAD_IDENTITIES))
+            while batch:
+                self._preload_state([identity for identity, _, _ in batch])
+                for identity, records, old_state in batch:
+                    yield self.execute_per_identity_records(identity, records, old_state)
+                batch = list(islice(identity_records, self.PRELOAD_IDENTITIES))
+        finally:
+            self._finalize_store()
+
     def execute_per_identity_records(
             self,
             identity: str,
@@ -62,36 +147,101 @@ class Runner(ABC):
         which initializes the state for execution. This is useful for batch execution where the
         previous state is written out to storage and can be loaded for the next batch run.
 
+        Persistent stores may buffer the state until the store is finalized, see
+        `execute_all_identity_records()`.
+
         :param identity: Identity of the records.
         :param records: List of TimeAndRecord to be processed.
         :param old_state: Streaming BTS state dictionary from a previous execution.
         :return: Tuple[Identity, Tuple[Identity, Tuple[Streaming BTS state dictionary,
             List of window BTS output]].
         """
-        schema_loader = SchemaLoader()
         if records:
             records.sort(key=lambda x: x[0])
         else:
             records = []
 
+        return self.execute_per_identity_sorted_records(identity, records, old_state)
+
+    def execute_per_identity_sorted_records(
+            self,
+            identity: str,
+            records: Union[List[TimeAndRecord], Iterator[TimeAndRecord]],
+            old_state: Optional[Dict[Key, Any]] = None) -> Tuple[str, Tuple[Dict, List]]:
+        """
+        Executes the streaming and window BTS on records that are already sorted by time. The
+        records are consumed one at a time so they can be provided lazily by an iterator, which
+        must yield at least one record, without holding all the records of the identity in memory.
+        See `execute_per_identity_records()`.
+        """
+        schema_loader = self._schema_loader
+        self._reset_store(schema_loader)
+
         block_data = self._execute_stream_bts(records, identity, schema_loader, old_state)
         window_data = self._execute_window_bts(identity, schema_loader)
 
         return identity, (block_data, window_data)
 
+    def execute_per_identity_segment(
+            self,
+            identity: str,
+            records: Union[List[TimeAndRecord], Iterator[TimeAndRecord]],
+            old_state: Optional[Dict[Key, Any]] = None) -> Dict[Key, Any]:
+        """
+        Executes the streaming BTS on a time segment of the sorted records of an identity. The
+        segments of an identity split after `split_interval` of inactivity can be executed
+        independently, with the old state given to the first segment only, and combined with
+        `merge_per_identity_segments()`.
+        :return: Streaming BTS state dictionary of the segment.
+        """
+        schema_loader = self._schema_loader
+        self._reset_store(schema_loader)
+        return self._execute_stream_bts(records, identity, schema_loader, old_state)
+
+    def merge_per_identity_segments(
+            self,
+            identity: str,
+            segment_states: List[Dict[Key, Any]],
+            old_state: Optional[Dict[Key, Any]] = None) -> Tuple[str, Tuple[Dict, List]]:
+        """
+        Merges the streaming BTS states of the segments of an identity and executes the window BTS
+        on the merged state. The output is the same as the output of executing all the records of
+        the identity with `execute_per_identity_records()`.
+        :param identity: Identity of the segments.
+        :param segment_states: Output of `execute_per_identity_segment()` for the segments, in time
+            order.
+        :param old_state: Streaming BTS state dictionary that the first segment was executed with.
+        """
+        block_data = {}
+        for segment_state in segment_states:
+            block_data.update(segment_state)
+        if self._delta_state and old_state:
+            block_data = {
+                key: item
+                for key, item in block_data.items() if old_state.get(key, None) != item
+            }
+
+        schema_loader = self._schema_loader
+        self._reset_store(schema_loader)
+        store = self._get_store(schema_loader)
+        for key, item in chain((old_state or {}).items(), block_data.items()):
+            store.save(key, item)
+        window_data = self._execute_window_bts(identity, schema_loader)
+
+        return identity, (block_data, window_data)
+
     def get_per_identity_records(self, events: Iterable, data_processor: DataProcessor
                                  ) -> Generator[Tuple[str, TimeAndRecord], None, None]:
         """
         Uses the given iteratable events and the data processor convert the event into a list of
-        Records along with its identity and time.
+        Records along with its identity and time. Only the keys of the events that are read by the
+        streaming BTS are kept in the Records.
         :param events: iteratable events.
         :param data_processor: DataProcessor to process each event in events.
         :return: yields Tuple[Identity, TimeAndRecord] for all Records in events,
         """
-        schema_loader = SchemaLoader()
-        stream_bts_name = schema_loader.add_schema_spec(self._stream_bts)
-        stream_transformer_schema: StreamingTransformerSchema = schema_loader.get_schema_object(
-            stream_bts_name)
+        stream_transformer_schema = self._get_streaming_transformer_schema(self._schema_loader)
+        data_processor = data_processor.project(stream_transformer_schema.source_projection)
         for event in events:
             try:
                 for record in data_processor.process_data(event):
@@ -105,20 +255,21 @@ class Runner(ABC):
                 logging.error('{} in parsing Event {}.'.format(err, event))
 
     def _execute_stream_bts(self,
-                            identity_events: List[TimeAndRecord],
+                            identity_events: Union[List[TimeAndRecord], Iterator[TimeAndRecord]],
                             identity: str,
                             schema_loader: SchemaLoader,
                             old_state: Optional[Dict] = None) -> Dict[Key, Any]:
         if self._stream_bts is None:
             return {}
 
-        stream_bts_name = schema_loader.add_schema_spec(self._stream_bts)
-        stream_transformer_schema = schema_loader.get_schema_object(stream_bts_name)
+        stream_transformer_schema = self._get_streaming_transformer_schema(schema_loader)
         store = self._get_store(schema_loader)
 
         if old_state:
+            # The store keeps the saved items, whose nested values are modified in place by the
+            # execution, so copies are saved to keep the old state unchanged for the delta
             for k, v in old_state.items():
-                store.save(k, v)
+                store.save(k, deepcopy(v))
 
         if identity_events:
             stream_transformer = StreamingTransformer(stream_transformer_schema, identity)
@@ -126,10 +277,21 @@ class Runner(ABC):
             for time, event in identity_events:
                 stream_transformer.run_evaluate(event)
             stream_transformer.run_finalize()
+            logging.debug('Skipped saves of unchanged aggregates: {}'.format(self.skipped_saves))
 
-        return self._get_store(schema_loader).get_all(identity)
+        all_data = self._get_store(schema_loader).get_all(identity)
+        if self._delta_state and old_state:
+            return {key: item for key, item in all_data.items() if old_state.get(key, None) != item}
+        return all_data
 
-    def _execute_window_bts(self, identity: str, schema_loader: SchemaLoader) -> List[Dict]:
+    def _execute_window_bts(self,
+                            identity: str,
+                            schema_loader: SchemaLoader,
+                            since: Optional[datetime] = None) -> List[Dict]:
+        """
+        Executes the window BTS on the blocks of the identity in the store.
+        :param since: Only the blocks that end at or after this time are evaluated as anchors.
+        """
         if self._window_bts is None:
             logging.debug('Window BTS not provided')
             return []
@@ -156,9 +318,11 @@ class Runner(ABC):
 
         window_data = []
 
-        window_bts_name = schema_loader.add_schema_spec(self._window_bts)
-        window_transformer_schema = schema_loader.get_schema_object(window_bts_name)
-        window_transformer = WindowTransformer(window_transformer_schema, identity, exec_context)
+        window_transformer_schema = self._get_window_transformer_schema(schema_loader)
+        # Blocks restored for the windows are shared by all the window aggregates of the identity
+        block_cache = BlockCache()
+        window_transformer = WindowTransformer(window_transformer_schema, identity, exec_context,
+                                               block_cache)
 
         logging.debug('Running Window BTS for identity {}'.format(identity))
 
@@ -167,6 +331,9 @@ class Runner(ABC):
         for key, data in all_data.items():
             if key.group != block_obj._schema.name:
                 continue
+            if since is not None and data.get('_end_time', None) and parse_datetime(
+                    data['_end_time']) < since:
+                continue
             try:
                 blocks += 1
                 if window_transformer.run_evaluate(block_obj.run_restore(data)):
@@ -178,9 +345,103 @@ class Runner(ABC):
         if anchors == 0:
             logging.debug('No anchors found for identity {} out of {} blocks'.format(
                 identity, blocks))
+        logging.debug('Window block cache for identity {}: {}'.format(identity, block_cache.stats))
 
         return window_data
 
+    @property
+    def split_interval(self) -> Optional[timedelta]:
+        """
+        Returns the period of inactivity after which the sorted records of an identity can be split
+        into segments that are executed independently, see `execute_per_identity_segment()`. None
+        when the streaming BTS keeps state across such periods.
+
+        Activity aggregates start a new block from a reset state after their separation interval,
+        so identities can be split when the streaming BTS is held in a memory store and only has
+        activity aggregates whose fields do not reference the other aggregates.
+        """
+        if self._stream_bts is None:
+            return None
+
+        schema_loader = self._schema_loader
+        if not isinstance(self._get_store(schema_loader), MemoryStore):
+            return None
+
+        aggregate_schemas = list(
+            self._get_streaming_transformer_schema(schema_loader).nested_schema.values())
+        if not all(isinstance(schema, ActivityAggregateSchema) for schema in aggregate_schemas):
+            return None
+
+        aggregate_names = {schema.name for schema in aggregate_schemas}
+        for schema in aggregate_schemas:
+            for name, field_schema in schema.nested_schema.items():
+                dependency = FieldDependency(
+                    schema.name, name,
+                    [expression for expression in (field_schema.when, field_schema.value)
+                     if expression], aggregate_names)
+                referenced_names = dependency.names | {
+                    aggregate for aggregate, _ in dependency.field_references
+                }
+                if referenced_names & (aggregate_names - {schema.name}):
+                    return None
+
+        return max(schema.separation_interval for schema in aggregate_schemas)
+
+    @property
+    def skipped_saves(self) -> Dict[str, int]:
+        """
+        Returns the number of saves of unchanged streaming BTS aggregates that were skipped, by
+        aggregate name, for the identities processed by the runner in the current process.
+        """
+        if self._stream_bts is None:
+            return {}
+
+        return {
+            name: schema.skipped_saves
+            for name, schema in self._get_streaming_transformer_schema(
+                self._schema_loader).nested_schema.items() if isinstance(schema, AggregateSchema)
+        }
+
+    def _preload_state(self, identities: List[str]) -> None:
+        """
+        Reads the identity aggregates without dimensions of the identities from a persistent store
+        so that the store serves them without a request per identity.
+        """
+        if self._stream_bts is None:
+            return
+
+        schema_loader = self._schema_loader
+        store = self._get_store(schema_loader)
+        if isinstance(store, MemoryStore):
+            return
+
+        names = [
+            schema.name for schema in self._get_streaming_transformer_schema(
+                schema_loader).nested_schema.values()
+            if isinstance(schema, IdentityAggregateSchema) and not schema.dimension_fields
+        ]
+        if names:
+            store.batch_get([
+                Key(KeyType.DIMENSION, identity, name) for identity in identities for name in names
+            ])
+
+    def _finalize_store(self) -> None:
+        """ Writes the state buffered by the store of the streaming BTS """
+        if self._stream_bts is not None:
+            self._get_store(self._schema_loader).finalize()
+
+    def _reset_store(self, schema_loader: SchemaLoader) -> None:
+        """
+        Clears the state left behind by the previously processed identity when the state is held
+        in memory. Persistent stores are left as-is as they are shared by all identities.
+        """
+        if self._stream_bts is None:
+            return
+
+        store = self._get_store(schema_loader)
+        if isinstance(store, MemoryStore):
+            store.clear()
+
     @staticmethod
     def _get_store(schema_loader: SchemaLoader) -> Store:
         stores = schema_loader.get_all_stores()
@@ -197,6 +458,11 @@ class Runner(ABC):
         fq_name_and_schema = schema_loader.get_schema_specs_of_type(Type.BLURR_TRANSFORM_STREAMING)
         return schema_loader.get_schema_object(next(iter(fq_name_and_schema)))
 
+    @staticmethod
+    def _get_window_transformer_schema(schema_loader: SchemaLoader) -> WindowTransformerSchema:
+        fq_name_and_schema = schema_loader.get_schema_specs_of_type(Type.BLURR_TRANSFORM_WINDOW)
+        return schema_loader.get_schema_object(next(iter(fq_name_and_schema)))
+
     @abstractmethod
     def execute(self, *args, **kwargs):
         NotImplemented('execute must be implemented')
@@ -208,3 +474,19 @@ class Runner(ABC):
     @abstractmethod
     def print_output(self, *args, **kwargs):
         NotImplemented('execute must be implemented')
+
+
+def merge_state(base_state: Dict[str, Dict[Key, Any]],
+                *delta_states: Dict[str, Dict[Key, Any]]) -> Dict[str, Dict[Key, Any]]:
+    """
+    Compacts the Streaming BTS State deltas of incremental executions into a base state.
+    :param base_state: Streaming BTS State dictionary by identity. It is not modified.
+    :param delta_states: Streaming BTS State deltas by identity in the order they were created.
+        Items of a later delta replace the items of the same key.
+    :return: Streaming BTS State dictionary by identity.
+    """
+    state = {identity: dict(items) for identity, items in base_state.items()}
+    for delta_state in delta_states:
+        for identity, items in delta_state.items():
+            state.setdefault(identity, {}).update(items)
+    return state
@@ -1,25 +1,178 @@
 import json
-from typing import List, Optional, Tuple, Dict, Union
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import List, Optional, Tuple, Dict, Union, Iterable, Any, Generator, Callable
 
+from blurr.core import logging
+from blurr.core.aggregate import AggregateSchema
+from blurr.core.datetime_parser import parse_datetime
+from blurr.core.field import FieldSchema
+from blurr.core.field_complex import MapFieldSchema, ListFieldSchema, SetFieldSchema
+from blurr.core.field_dependency import get_source_reference
+from blurr.core.field_simple import IntegerFieldSchema, FloatFieldSchema, BooleanFieldSchema, \
+    DateTimeFieldSchema
+from blurr.core.record import Record
 from blurr.runner.data_processor import DataProcessor, SimpleJsonDataProcessor, \
     SimpleDictionaryDataProcessor
 from blurr.runner.json_encoder import BlurrJSONEncoder
-from blurr.runner.runner import Runner
+from blurr.runner.runner import Runner, TimeAndRecord
 
 _spark_import_err = None
 try:
     from pyspark import RDD, SparkContext
-    from pyspark.sql import SparkSession
+    from pyspark.rdd import portable_hash
+    from pyspark.sql import DataFrame, Row, SparkSession
+    from pyspark.sql import functions
+    from pyspark.sql.types import ArrayType, BooleanType, DataType, DoubleType, LongType, \
+        MapType, StringType, StructField, StructType, TimestampType
 except ImportError as err:
     # Ignore import error because the CLI can be used even if spark is not
     # installed.
     _spark_import_err = err
 
+# Columns of the identity and of the time in microseconds since the epoch computed by Spark in
+# `get_record_rdd_from_dataframe()`
+_IDENTITY_COLUMN = '__blurr_identity'
+_TIME_COLUMN = '__blurr_time'
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
 # Setting these at module level as they cannot be part of the spark runner object because they
 # cannot be serialized
 _module_spark_session: 'SparkSession' = None
 
 
+def _partition_by_identity(key: Tuple) -> int:
+    return portable_hash(key[0])
+
+
+def _iterate_sorted_groups(keyed_records: Iterable[Tuple[Tuple, Any]]
+                           ) -> Generator[Tuple[Any, Iterable[TimeAndRecord], Optional[Dict]], None,
+                                          None]:
+    """
+    Iterates over the groups of records sorted by `repartitionAndSortWithinPartitions` where the
+    records are keyed by (group, 1, time) and the old state by (group, 0). The records of a group
+    must be consumed before moving to the next group.
+    """
+    for group, group_items in groupby(keyed_records, key=lambda x: x[0][0]):
+        key, value = next(group_items)
+        old_state = None
+        if len(key) == 2:
+            old_state = value
+            first_record = next(group_items, None)
+            if first_record is None:
+                yield group, [], old_state
+                continue
+            key, value = first_record
+
+        yield group, chain([(key[2], value)],
+                           ((time, record) for (_, _, time), record in group_items)), old_state
+
+
+def _get_range_stats(keyed_times: Iterable[Tuple[Tuple, None]], split_interval: timedelta
+                     ) -> Generator[Tuple[Tuple, Tuple], None, None]:
+    for time_range, range_items in groupby(keyed_times, key=lambda x: x[0][0]):
+        first_time = last_time = next(range_items)[0][1]
+        gap_time = None
+        for (_, time), _ in range_items:
+            if gap_time is None and time - last_time > split_interval:
+                gap_time = time
+            last_time = time
+        yield time_range, (first_time, last_time, gap_time)
+
+
+def get_segment_cuts(range_stats: List[Tuple[datetime, datetime, Optional[datetime]]],
+                     split_interval: timedelta) -> List[datetime]:
+    """
+    Returns the times at which the sorted records of an identity are split into segments. A
+    segment starts with the first record after a period of inactivity longer than
+    `split_interval`, at the start of a time range and at the first such period within it.
+
+    :param range_stats: (First time, last time, time of the first record after a gap longer than
+        `split_interval`) of the records in each time range of the identity, in time order.
+    :param split_interval: `Runner.split_interval` of the BTS.
+    """
+    cuts = []
+    for i, (first_time, _, gap_time) in enumerate(range_stats):
+        if i > 0 and first_time - range_stats[i - 1][1] > split_interval:
+            cuts.append(first_time)
+        if gap_time is not None:
+            cuts.append(gap_time)
+    return cuts
+
+
+def _merge_tagged_states(states: Iterable[Tuple[int, Dict]]) -> Dict:
+    merged_state = {}
+    for _, state in sorted(states, key=itemgetter(0)):
+        merged_state.update(state)
+    return merged_state
+
+
+def _to_json(value: Any) -> Optional[str]:
+    return value if value is None or isinstance(value, str) else json.dumps(
+        value, cls=BlurrJSONEncoder)
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def _get_spark_type(field_schema: Optional[FieldSchema]
+                    ) -> Tuple['DataType', Callable[[Any], Any]]:
+    """
+    Returns the Spark SQL type of a BTS field and the function that converts the snapshot values
+    of the field to the type. Maps, lists and sets can hold values of any type so their values
+    are written as strings, with the values that are not strings encoded as JSON.
+    """
+    if isinstance(field_schema, IntegerFieldSchema):
+        return LongType(), int
+    if isinstance(field_schema, FloatFieldSchema):
+        return DoubleType(), float
+    if isinstance(field_schema, BooleanFieldSchema):
+        return BooleanType(), bool
+    if isinstance(field_schema, DateTimeFieldSchema):
+        return TimestampType(), _to_datetime
+    if isinstance(field_schema, MapFieldSchema):
+        return MapType(StringType(), StringType()), lambda value: {
+            str(key): _to_json(item) for key, item in value.items()}
+    if isinstance(field_schema, (ListFieldSchema, SetFieldSchema)):
+        return ArrayType(StringType()), lambda value: [_to_json(item) for item in value]
+    return StringType(), _to_json
+
+
+def _get_row_converter(columns: List[Tuple[str, Optional[FieldSchema]]]
+                       ) -> Tuple['StructType', Callable[[Dict], Tuple]]:
+    """
+    Returns the Spark SQL schema of the given columns and the function that converts a dictionary
+    of the column values to a row of the schema.
+    """
+    fields = []
+    converters = []
+    for name, field_schema in columns:
+        spark_type, converter = _get_spark_type(field_schema)
+        fields.append(StructField(name, spark_type))
+        converters.append((name, converter))
+
+    def convert(data: Dict) -> Tuple:
+        return tuple(None if data.get(name, None) is None else converter(data[name])
+                     for name, converter in converters)
+
+    return StructType(fields), convert
+
+
+def _collect_flattened_maps(row: Dict, map_columns: List[Tuple[str, str]]) -> Dict:
+    for column, field_name in map_columns:
+        prefix = field_name + '.'
+        row[column] = {
+            key[len(prefix):]: value
+            for key, value in row.items() if key.startswith(prefix)
+        }
+    return row
+
+
 def get_spark_session(spark_session: Optional['SparkSession'] = None) -> 'SparkSession':
     if spark_session:
         return spark_session
@@ -54,28 +207,52 @@ class SparkRunner(Runner):
     # output]] format. These two can then be written out to external storage for passing BTS State
     # for the next execution run and as the training data for the model respectively.
     ```
+
+    `execute()` groups the records of an identity into a list before processing them. For
+    identities with too many records to hold in memory the records can be sorted by Spark instead
+    and streamed through the BTS:
+    ```
+    records_rdd = runner.get_record_rdd_from_json_files(json_files, group_by_identity=False)
+    output_rdd = runner.execute_sorted(records_rdd)
+    ```
+
+    Events in columnar files are read as a DataFrame so that only the columns used by the BTS are
+    read:
+    ```
+    records_rdd = runner.get_record_rdd_from_dataframe(spark.read.parquet(path))
+    ```
     """
 
-    def __init__(self, stream_bts_file: str, window_bts_file: Optional[str] = None):
+    def __init__(self,
+                 stream_bts_file: str,
+                 window_bts_file: Optional[str] = None,
+                 delta_state: bool = False):
         """
         Initialize SparkRunner.
 
         :param stream_bts_file: Streaming BTS to use. Must be provded.
         :param window_bts_file: Window BTS to use. If none is provided only the streaming BTS output
             is generated.
+        :param delta_state: Only output the Streaming BTS State items created or modified by the
+            execution. The deltas can be merged into a base state with `compact_state()`.
+            Identities without new records are not output.
         """
         if _spark_import_err:
             raise _spark_import_err
-        super().__init__(stream_bts_file, window_bts_file)
+        super().__init__(stream_bts_file, window_bts_file, delta_state)
+        # Estimated number of records of the identities split by the last `execute_sorted()`
+        self.split_identities: Dict[str, int] = {}
 
-    def _execute_per_identity_records(
-            self, identity_records_with_state: Tuple[str, Union[List, Tuple[List, Dict]]]):
-        identity, records_with_state = identity_records_with_state
-        if isinstance(records_with_state, tuple):
-            record, state = records_with_state
-        else:
-            record, state = records_with_state, None
-        return self.execute_per_identity_records(identity, record, state)
+    @staticmethod
+    def _get_records_with_state(
+            identity_records_with_state: Iterable[Tuple[str, Union[List, Tuple[List, Dict]]]]
+    ) -> Generator[Tuple[str, List, Optional[Dict]], None, None]:
+        for identity, records_with_state in identity_records_with_state:
+            if isinstance(records_with_state, tuple):
+                records, state = records_with_state
+            else:
+                records, state = records_with_state, None
+            yield identity, records, state
 
     def execute(self, identity_records: 'RDD', old_state_rdd: Optional['RDD'] = None) -> 'RDD':
         """
@@ -88,14 +265,189 @@ class SparkRunner(Runner):
         :return: RDD[Identity, Tuple[Streaming BTS State, List of Window BTS output]]
         """
         identity_records_with_state = identity_records
-        if old_state_rdd:
+        if old_state_rdd and self._delta_state:
+            # The delta state of the identities without records is empty
+            identity_records_with_state = identity_records.leftOuterJoin(old_state_rdd)
+        elif old_state_rdd:
             identity_records_with_state = identity_records.fullOuterJoin(old_state_rdd)
-        return identity_records_with_state.map(lambda x: self._execute_per_identity_records(x))
+        return identity_records_with_state.mapPartitions(
+            lambda x: self.execute_all_identity_records(self._get_records_with_state(x)))
+
+    def execute_sorted(self,
+                       identity_records: 'RDD',
+                       old_state_rdd: Optional['RDD'] = None,
+                       num_partitions: Optional[int] = None,
+                       split_records: Optional[int] = None,
+                       sample_fraction: float = 0.01) -> 'RDD':
+        """
+        Executes Blurr BTS with the given records without grouping the records of an identity. The
+        records are partitioned by identity and sorted by identity and time within the partitions
+        with `repartitionAndSortWithinPartitions` so that the records of each identity are streamed
+        through the BTS one at a time.
+
+        A few identities with a very large number of records keep a single task busy long after
+        the others are done. With `split_records` the records of the identities estimated, from a
+        sample of the records, to have more records than that are split in time segments at
+        periods of inactivity longer than the `split_interval` of the BTS. The segments are
+        executed in parallel and their states are merged before the window BTS is executed. The
+        identities that were split are reported in `split_identities`. When the BTS cannot be split
+        the records of all identities are executed serially.
+
+        :param identity_records: RDD of the form Tuple[Identity, TimeAndRecord], as returned by the
+            `get_record_rdd_*` functions with `group_by_identity=False`
+        :param old_state_rdd: A previous streaming BTS state RDD as Tuple[Identity, Streaming BTS
+            State]
+        :param num_partitions: Number of partitions to sort the records into. Defaults to the
+            default parallelism of Spark.
+        :param split_records: Estimated number of records above which the records of an identity
+            are split. Identities are not split by default.
+        :param sample_fraction: Fraction of the records sampled to estimate the number of records
+            of the identities.
+        :return: RDD[Identity, Tuple[Streaming BTS State, List of Window BTS output]]
+        """
+        self.split_identities = {}
+        split_interval = self.split_interval if split_records else None
+        if split_records and split_interval is None:
+            logging.warning('Identities are not split as the streaming BTS keeps state across '
+                            'periods of inactivity.')
+        if split_interval is None:
+            return self._execute_sorted(identity_records, old_state_rdd, num_partitions)
+
+        split_ranges = self._get_split_ranges(identity_records, split_records, sample_fraction)
+        if not split_ranges:
+            return self._execute_sorted(identity_records, old_state_rdd, num_partitions)
+
+        def is_split(identity_item: Tuple[str, Any]) -> bool:
+            return identity_item[0] in split_ranges
+
+        def is_not_split(identity_item: Tuple[str, Any]) -> bool:
+            return identity_item[0] not in split_ranges
+
+        light_state_rdd = old_state_rdd.filter(is_not_split) if old_state_rdd else None
+        heavy_state_rdd = old_state_rdd.filter(is_split) if old_state_rdd else None
+        return self._execute_sorted(
+            identity_records.filter(is_not_split), light_state_rdd, num_partitions).union(
+                self._execute_split(
+                    identity_records.filter(is_split), heavy_state_rdd, split_ranges,
+                    split_interval, num_partitions))
+
+    def _execute_sorted(self, identity_records: 'RDD', old_state_rdd: Optional['RDD'],
+                        num_partitions: Optional[int]) -> 'RDD':
+        # Records are keyed by (identity, 1, time) and the old state by (identity, 0) so that the
+        # old state of an identity is sorted before its records
+        keyed_records = identity_records.map(lambda x: ((x[0], 1, x[1][0]), x[1][1]))
+        if old_state_rdd:
+            keyed_records = keyed_records.union(old_state_rdd.map(lambda x: ((x[0], 0), x[1])))
+        return keyed_records.repartitionAndSortWithinPartitions(
+            num_partitions, partitionFunc=_partition_by_identity).mapPartitions(
+                lambda x: self._execute_sorted_partition(x))
+
+    def _execute_sorted_partition(self, keyed_records: Iterable[Tuple[Tuple, Any]]
+                                  ) -> Generator[Tuple[str, Tuple[Dict, List]], None, None]:
+        for identity, records, old_state in _iterate_sorted_groups(keyed_records):
+            # Identities without records are only sorted as an empty list of records
+            if self._delta_state and records == []:
+                continue
+            yield self.execute_per_identity_sorted_records(identity, records, old_state)
+        self._finalize_store()
+
+    def _get_split_ranges(self, identity_records: 'RDD', split_records: int,
+                          sample_fraction: float) -> Dict[str, List[datetime]]:
+        """
+        Returns the boundaries of time ranges of roughly `split_records` records each for the
+        identities that are estimated to have more than `split_records` records.
+        """
+        sample_records = split_records * sample_fraction
+        sampled_times = identity_records.sample(False, sample_fraction, seed=0).map(
+            lambda x: (x[0], x[1][0])).groupByKey().filter(
+                lambda x: len(x[1]) > sample_records).mapValues(sorted).collectAsMap()
+
+        split_ranges = {}
+        for identity, times in sampled_times.items():
+            range_count = math.ceil(len(times) / sample_records)
+            split_ranges[identity] = sorted(
+                {times[len(times) * i // range_count]
+                 for i in range(1, range_count)})
+            self.split_identities[identity] = int(len(times) / sample_fraction)
+
+        if split_ranges:
+            logging.info('Splitting the records of {} identities: {}'.format(
+                len(split_ranges), self.split_identities))
+        return split_ranges
+
+    def _execute_split(self, identity_records: 'RDD', old_state_rdd: Optional['RDD'],
+                       split_ranges: Dict[str, List[datetime]], split_interval: timedelta,
+                       num_partitions: Optional[int]) -> 'RDD':
+        # The first and last times and the first gap in each time range are collected to find the
+        # periods of inactivity to split the records at. Ranges are keyed by (identity, range) so
+        # that the ranges of an identity are spread across partitions.
+        range_stats = identity_records.map(
+            lambda x: (((x[0], bisect_right(split_ranges[x[0]], x[1][0])), x[1][0]), None)) \
+            .repartitionAndSortWithinPartitions(
+                num_partitions, partitionFunc=_partition_by_identity) \
+            .mapPartitions(lambda x: _get_range_stats(x, split_interval)).collectAsMap()
+        segment_cuts = {
+            identity: get_segment_cuts([
+                range_stats[(identity, i)] for i in range(len(boundaries) + 1)
+                if (identity, i) in range_stats
+            ], split_interval)
+            for identity, boundaries in split_ranges.items()
+        }
+
+        # Segments are executed like identities, with the old state given to the first segment.
+        # Split identities always have records so they are output with or without `delta_state`.
+        keyed_records = identity_records.map(
+            lambda x: (((x[0], bisect_right(segment_cuts[x[0]], x[1][0])), 1, x[1][0]), x[1][1]))
+        if old_state_rdd:
+            keyed_records = keyed_records.union(
+                old_state_rdd.map(lambda x: (((x[0], 0), 0), x[1])))
+        segment_states = keyed_records.repartitionAndSortWithinPartitions(
+            num_partitions, partitionFunc=_partition_by_identity).mapPartitions(
+                lambda x: self._execute_segment_partition(x))
+
+        # The old state is tagged with -1 so that it is sorted before the segments when merging
+        if old_state_rdd:
+            segment_states = segment_states.union(
+                old_state_rdd.mapValues(lambda state: (-1, state)))
+        return segment_states.groupByKey().map(lambda x: self._merge_segments(x[0], x[1]))
+
+    def _execute_segment_partition(self, keyed_records: Iterable[Tuple[Tuple, Any]]
+                                   ) -> Generator[Tuple[str, Tuple[int, Dict]], None, None]:
+        for (identity, segment), records, old_state in _iterate_sorted_groups(keyed_records):
+            yield identity, (segment,
+                             self.execute_per_identity_segment(identity, records, old_state))
+
+    def _merge_segments(self, identity: str, tagged_states: Iterable[Tuple[int, Dict]]
+                        ) -> Tuple[str, Tuple[Dict, List]]:
+        tagged_states = sorted(tagged_states, key=itemgetter(0))
+        old_state = tagged_states[0][1] if tagged_states[0][0] < 0 else None
+        return self.merge_per_identity_segments(
+            identity, [state for segment, state in tagged_states if segment >= 0], old_state)
+
+    @staticmethod
+    def compact_state(base_state_rdd: 'RDD', *delta_state_rdds: 'RDD') -> 'RDD':
+        """
+        Merges the Streaming BTS State deltas of incremental executions into a base state.
+
+        :param base_state_rdd: Streaming BTS State RDD as Tuple[Identity, Streaming BTS State]
+        :param delta_state_rdds: Streaming BTS State delta RDDs as Tuple[Identity, Streaming BTS
+            State] in the order they were created. Items of a later delta replace the items of
+            the same key.
+        :return: RDD[Identity, Streaming BTS State]
+        """
+        # States are tagged with their position as grouping does not keep the order of the RDDs
+        state_rdds = [
+            rdd.mapValues(lambda state, position=position: (position, state))
+            for position, rdd in enumerate((base_state_rdd, ) + delta_state_rdds)
+        ]
+        return base_state_rdd.context.union(state_rdds).groupByKey().mapValues(
+            _merge_tagged_states)
 
     def get_record_rdd_from_json_files(self,
                                        json_files: List[str],
                                        data_processor: DataProcessor = SimpleJsonDataProcessor(),
-                                       spark_session: Optional['SparkSession'] = None) -> 'RDD':
+                                       spark_session: Optional['SparkSession'] = None,
+                                       group_by_identity: bool = True) -> 'RDD':
         """
         Reads the data from the given json_files path and converts them into the `Record`s format for
         processing. `data_processor` is used to process the per event data in those files to convert
@@ -105,57 +457,168 @@ class SparkRunner(Runner):
         :param data_processor: `DataProcessor` to process each event in the json files.
         :param spark_session: `SparkSession` to use for execution. If None is provided then a basic
             `SparkSession` is created.
+        :param group_by_identity: Groups the records of each identity into a list.
         :return: RDD containing Tuple[Identity, List[TimeAndRecord]] which can be used in
-            `execute()`
+            `execute()`, or Tuple[Identity, TimeAndRecord] which can be used in `execute_sorted()`
+            when `group_by_identity` is False.
         """
         spark_context = get_spark_session(spark_session).sparkContext
         raw_records: 'RDD' = spark_context.union(
             [spark_context.textFile(file) for file in json_files])
-        return raw_records.mapPartitions(
-            lambda x: self.get_per_identity_records(x, data_processor)).groupByKey().mapValues(list)
+        return self._get_record_rdd(raw_records, data_processor, group_by_identity)
 
-    def get_record_rdd_from_rdd(
-            self,
-            rdd: 'RDD',
-            data_processor: DataProcessor = SimpleDictionaryDataProcessor(),
-    ) -> 'RDD':
+    def get_record_rdd_from_rdd(self,
+                                rdd: 'RDD',
+                                data_processor: DataProcessor = SimpleDictionaryDataProcessor(),
+                                group_by_identity: bool = True) -> 'RDD':
         """
         Converts a RDD of raw events into the `Record`s format for processing. `data_processor` is
         used to process the per row data to convert them into `Record`.
 
         :param rdd: RDD containing the raw events.
         :param data_processor: `DataProcessor` to process each row in the given `rdd`.
+        :param group_by_identity: Groups the records of each identity into a list.
         :return: RDD containing Tuple[Identity, List[TimeAndRecord]] which can be used in
-            `execute()`
+            `execute()`, or Tuple[Identity, TimeAndRecord] which can be used in `execute_sorted()`
+            when `group_by_identity` is False.
+        """
+        return self._get_record_rdd(rdd, data_processor, group_by_identity)
+
+    def get_record_rdd_from_dataframe(self, dataframe: 'DataFrame',
+                                      group_by_identity: bool = True) -> 'RDD':
         """
-        return rdd.mapPartitions(
-            lambda x: self.get_per_identity_records(x, data_processor)).groupByKey().mapValues(list)
+        Converts a DataFrame of raw events, e.g. read from Parquet, ORC or JSON files with
+        `spark.read`, into the `Record`s format for processing. Each row is an event with the
+        columns as the top level keys of the record.
+
+        Only the columns read by the streaming BTS are selected so that Spark can push the
+        projection down to the source and only these columns are sent to the Python workers. When
+        the identity of the streaming BTS is a `source` column, and when the time is a `source`
+        column of timestamp type, they are computed by Spark instead of being evaluated for each
+        record in Python. Timestamp columns kept in the records are converted from the local
+        datetimes created by Spark to UTC datetimes, as the times of the records are, so that they
+        can be compared with the time of the record in the BTS.
+
+        :param dataframe: DataFrame containing the raw events.
+        :param group_by_identity: Groups the records of each identity into a list.
+        :return: RDD containing Tuple[Identity, List[TimeAndRecord]] which can be used in
+            `execute()`, or Tuple[Identity, TimeAndRecord] which can be used in `execute_sorted()`
+            when `group_by_identity` is False.
+        """
+        stream_transformer_schema = self._get_streaming_transformer_schema(self._schema_loader)
+        projection = stream_transformer_schema.source_projection
+        column_types = dict(dataframe.dtypes)
+        columns = [
+            dataframe[column] for column in dataframe.columns
+            if projection is None or column in projection
+        ]
+
+        identity_column = get_source_reference(stream_transformer_schema.identity)
+        if identity_column in column_types:
+            columns.append(dataframe[identity_column].alias(_IDENTITY_COLUMN))
+        time_column = get_source_reference(stream_transformer_schema.time)
+        if column_types.get(time_column, None) == 'timestamp':
+            # Seconds since the epoch and the microseconds of the second, with the datetime
+            # patterns of Spark 3
+            time = dataframe[time_column]
+            columns.append((time.cast('long') * 1000000 + functions.date_format(
+                time, 'SSSSSS').cast('long')).alias(_TIME_COLUMN))
+
+        timestamp_columns = [
+            column for column, column_type in column_types.items()
+            if column_type == 'timestamp' and (projection is None or column in projection)
+        ]
+        records = dataframe.select(*columns).rdd.mapPartitions(
+            lambda x: self._get_per_identity_rows(x, timestamp_columns))
+        return records.groupByKey().mapValues(list) if group_by_identity else records
+
+    def _get_per_identity_rows(self, rows: Iterable['Row'], timestamp_columns: List[str]
+                               ) -> Generator[Tuple[str, TimeAndRecord], None, None]:
+        stream_transformer_schema = self._get_streaming_transformer_schema(self._schema_loader)
+        for row in rows:
+            data = row.asDict(recursive=True)
+            for column in timestamp_columns:
+                if data[column] is not None:
+                    data[column] = data[column].astimezone(timezone.utc)
+            identity = data.pop(_IDENTITY_COLUMN, None)
+            time = data.pop(_TIME_COLUMN, None)
+            record = Record(data)
+            try:
+                # Missing values are evaluated to raise the same errors as other records
+                identity = identity or stream_transformer_schema.get_identity(record)
+                time = _EPOCH + time * _MICROSECOND if time is not None else \
+                    stream_transformer_schema.get_time(record)
+                yield (identity, (time, record))
+            except Exception as err:
+                logging.error('{} in parsing Record {}.'.format(err, record))
+
+    def _get_record_rdd(self, rdd: 'RDD', data_processor: DataProcessor,
+                        group_by_identity: bool) -> 'RDD':
+        records = rdd.mapPartitions(lambda x: self.get_per_identity_records(x, data_processor))
+        return records.groupByKey().mapValues(list) if group_by_identity else records
 
     def write_output_file(self,
                           path: str,
                           per_identity_data: 'RDD',
-                          spark_session: Optional['SparkSession'] = None) -> None:
+                          spark_session: Optional['SparkSession'] = None,
+                          output_format: str = 'parquet',
+                          partition_by: Optional[List[str]] = None,
+                          options: Optional[Dict[str, str]] = None) -> None:
         """
         Basic helper function to persist data to disk.
 
-        If window BTS was provided then the window BTS output to written in csv format, otherwise,
-        the streaming BTS output is written in JSON format to the `path` provided
+        If window BTS was provided then the window BTS output is written to the `path` provided,
+        otherwise, the streaming BTS output is written to a directory for each aggregate under
+        `path`, with the string of the key of each item in the `_key` column. The schema of the
+        output is created from the types of the fields of the BTS so that Spark does not infer it
+        from the data.
 
         :param path: Path where the output should be written.
         :param per_identity_data: Output of the `execute()` call.
         :param spark_session: `SparkSession` to use for execution. If None is provided then a basic
             `SparkSession` is created.
+        :param output_format: Format of the output, any format supported by
+            `DataFrameWriter.format()`. Map, list and set fields cannot be written as csv.
+        :param partition_by: Columns to partition the output by.
+        :param options: Options of the `DataFrameWriter`, e.g. `{'compression': 'snappy'}`.
         :return:
         """
         _spark_session_ = get_spark_session(spark_session)
         if not self._window_bts:
-            per_identity_data.flatMap(
-                lambda x: [json.dumps(data, cls=BlurrJSONEncoder) for data in x[1][0].items()]
-            ).saveAsTextFile(path)
+            schema = self._get_streaming_transformer_schema(self._schema_loader)
+            for name, aggregate_schema in schema.nested_schema.items():
+                if not isinstance(aggregate_schema, AggregateSchema) or \
+                        aggregate_schema.store_schema is None:
+                    continue
+                data = per_identity_data.flatMap(lambda x, name=name: [
+                    dict(item, _key=str(key)) for key, item in x[1][0].items() if key.group == name
+                ])
+                columns = [('_key', None)] + list(aggregate_schema.nested_schema.items())
+                self._write_dataframe(_spark_session_, data, columns, '{}/{}'.format(
+                    path.rstrip('/'), name), output_format, partition_by, options)
         else:
-            # Convert to a DataFrame first so that the data can be saved as a CSV
-            _spark_session_.createDataFrame(per_identity_data.flatMap(lambda x: x[1][1])).write.csv(
-                path, header=True)
+            schema = self._get_window_transformer_schema(self._schema_loader)
+            columns = [('{}.{}'.format(name, field_name), field_schema)
+                       for name, aggregate_schema in schema.nested_schema.items()
+                       for field_name, field_schema in aggregate_schema.nested_schema.items()]
+            # The window BTS output flattens the maps to a column per key named <field>.<key>
+            map_columns = [(column, column.split('.', 1)[1]) for column, field_schema in columns
+                           if isinstance(field_schema, MapFieldSchema)]
+            data = per_identity_data.flatMap(lambda x: x[1][1])
+            if map_columns:
+                data = data.map(lambda row: _collect_flattened_maps(row, map_columns))
+            self._write_dataframe(_spark_session_, data, columns, path, output_format,
+                                  partition_by, options)
+
+    @staticmethod
+    def _write_dataframe(spark_session: 'SparkSession', data: 'RDD',
+                         columns: List[Tuple[str, Optional[FieldSchema]]], path: str,
+                         output_format: str, partition_by: Optional[List[str]],
+                         options: Optional[Dict[str, str]]) -> None:
+        spark_schema, convert = _get_row_converter(columns)
+        spark_session.createDataFrame(
+            data.map(convert), spark_schema, verifySchema=False).write.save(
+                path, format=output_format, partitionBy=partition_by, **(options or {}))
 
     def print_output(self, per_identity_data: 'RDD') -> None:
         """
@@ -0,0 +1,285 @@
+"""
+Runs the BTS continuously on the events read in micro-batches from an `EventSource`.
+
+The `StreamingTransformer` of the recently active identities are kept in a `TransformerPool` so
+that the state of an identity is not restored from the store for every batch. With a window BTS
+the state of the identities with records in a batch is saved in the store configured in the
+streaming BTS at the end of the batch, after which the window BTS is executed on the blocks of
+these identities that were active in the batch. Without a window BTS the state is only saved when
+a transformer is evicted from the pool, by `flush()` and by `close()`.
+"""
+import json
+import os
+import queue
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Generator
+
+from blurr.core import logging
+from blurr.core.store_key import Key
+from blurr.core.transformer_pool import TransformerPool
+from blurr.runner.data_processor import DataProcessor, SimpleJsonDataProcessor
+from blurr.runner.json_encoder import BlurrJSONEncoder
+from blurr.runner.runner import Runner, TimeAndRecord
+
+# An event and the time, as returned by `time.time()`, at which it was read from the source
+TimedEvent = Tuple[Any, float]
+
+
+class EventSource(ABC):
+    """ Source of the events processed by the `StreamingRunner` """
+
+    @abstractmethod
+    def read_batch(self, max_events: int, timeout: float) -> List[TimedEvent]:
+        """
+        Returns the events that are available, up to `max_events`, waiting for up to `timeout`
+        seconds for events to arrive when none are available.
+        """
+        raise NotImplementedError('read_batch() must be implemented')
+
+    def close(self) -> None:
+        """ Releases the resources held by the source """
+        pass
+
+
+class QueueEventSource(EventSource):
+    """ Events put in an in-process queue, e.g. by another thread """
+
+    def __init__(self) -> None:
+        self._queue = queue.Queue()
+
+    def put(self, event: Any) -> None:
+        self._queue.put((event, time.time()))
+
+    def read_batch(self, max_events: int, timeout: float) -> List[TimedEvent]:
+        try:
+            events = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(events) < max_events:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+class FileEventSource(EventSource):
+    """
+    Lines appended to a file, or to the files of a directory in the order of their names, as in
+    `tail -f`. Only complete lines are read. Files are read from their start unless `from_end` is
+    set, in which case the lines that are in the files when the source is first read are skipped.
+    """
+
+    # Seconds between the checks for new lines
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, path: str, from_end: bool = False) -> None:
+        self._path = path
+        self._from_end = from_end
+        self._offsets: Dict[str, int] = {}
+        self._started = False
+
+    def _get_files(self) -> List[str]:
+        if os.path.isdir(self._path):
+            return [
+                os.path.join(self._path, name) for name in sorted(os.listdir(self._path))
+                if os.path.isfile(os.path.join(self._path, name))
+            ]
+        return [self._path] if os.path.isfile(self._path) else []
+
+    def _read_lines(self, max_events: int) -> List[TimedEvent]:
+        events = []
+        for file in self._get_files():
+            if file not in self._offsets:
+                self._offsets[file] = os.path.getsize(file) if self._from_end and not \
+                    self._started else 0
+            if len(events) >= max_events or os.path.getsize(file) <= self._offsets[file]:
+                continue
+
+            read_time = time.time()
+            with open(file, 'rb') as f:
+                f.seek(self._offsets[file])
+                for line in f:
+                    if not line.endswith(b'\n') or len(events) >= max_events:
+                        break
+                    self._offsets[file] += len(line)
+                    if line.strip():
+                        events.append((line.decode('utf-8'), read_time))
+        self._started = True
+        return events
+
+    def read_batch(self, max_events: int, timeout: float) -> List[TimedEvent]:
+        deadline = time.time() + timeout
+        events = self._read_lines(max_events)
+        while not events and time.time() < deadline:
+            time.sleep(min(self.POLL_INTERVAL, max(deadline - time.time(), 0)))
+            events = self._read_lines(max_events)
+        return events
+
+
+class StreamingRunner(Runner):
+    """
+    Executes the streaming and window BTS on the events of a source in micro-batches:
+    ```
+    runner = StreamingRunner(stream_bts_file, window_bts_file, FileEventSource(events_dir))
+    for window_data in runner.execute():
+        runner.print_output(window_data)
+    ```
+
+    Each batch outputs the window BTS output of the identities with records in the batch, for the
+    blocks that ended in or after the earliest record of the identity in the batch. `metrics`
+    reports the number of processed events and the end-to-end latency, from when an event was
+    read from the source to when the output of its batch was created.
+    """
+
+    def __init__(self,
+                 stream_bts_file: str,
+                 window_bts_file: Optional[str] = None,
+                 source: Optional[EventSource] = None,
+                 data_processor: DataProcessor = SimpleJsonDataProcessor(),
+                 batch_size: int = 1000,
+                 batch_interval: float = 1.0,
+                 max_identities: Optional[int] = None,
+                 identity_ttl: Optional[float] = None):
+        """
+        Initialize StreamingRunner.
+
+        :param stream_bts_file: Streaming BTS to use. Must be provided.
+        :param window_bts_file: Window BTS to use. If none is provided only the streaming BTS state
+            is updated.
+        :param source: Source of the events read by `execute()`.
+        :param data_processor: `DataProcessor` to process the events of the source.
+        :param batch_size: Maximum number of events in a batch.
+        :param batch_interval: Seconds to wait for events before an empty batch is skipped.
+        :param max_identities: Number of identities whose transformers are kept in memory, least
+            recently active first out. Defaults to `TransformerPool.MAX_SIZE`.
+        :param identity_ttl: Seconds of inactivity after which the transformer of an identity is
+            evicted from memory.
+        """
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be greater than 0.')
+        super().__init__(stream_bts_file, window_bts_file)
+
+        self._source = source
+        self._data_processor = data_processor
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+        self._pool = TransformerPool(
+            self._get_streaming_transformer_schema(self._schema_loader), max_identities,
+            identity_ttl)
+        self._metrics = {
+            'batches': 0,
+            'events': 0,
+            'records': 0,
+            'window_rows': 0,
+            'batch_seconds': 0.0,
+            'latency_seconds': 0.0,
+            'max_latency_seconds': 0.0,
+        }
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Counts of the processed batches, events, records and window BTS rows. `batch_seconds` is
+        the processing time and `latency_seconds` the end-to-end latency of the earliest read
+        event of the last batch, and `max_latency_seconds` the largest latency of all the batches.
+        `transformers` has the `TransformerPool.stats` of the transformers kept in memory.
+        """
+        return dict(self._metrics, identities=len(self._pool), transformers=self._pool.stats)
+
+    def execute(self, max_batches: Optional[int] = None
+                ) -> Generator[Dict[str, List[Dict]], None, None]:
+        """
+        Reads and executes batches of events from the source until `max_batches` non-empty
+        batches are executed, or indefinitely when None.
+        :return: Yields the output of `execute_batch()` for each batch.
+        """
+        if self._source is None:
+            raise ValueError('`source` must be provided to execute the runner.')
+
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            events = self._source.read_batch(self._batch_size, self._batch_interval)
+            if events:
+                batches += 1
+                yield self.execute_batch(events)
+
+    def execute_batch(self, events: List[TimedEvent]) -> Dict[str, List[Dict]]:
+        """
+        Executes the streaming BTS on the records of a batch of events and the window BTS for the
+        identities with records in the batch.
+        :param events: Events and the times they were read, see `EventSource.read_batch()`.
+        :return: Window BTS output by identity for the identities with records in the batch.
+        """
+        start_time = time.time()
+        identity_records: Dict[str, List[TimeAndRecord]] = defaultdict(list)
+        for identity, time_and_record in self.get_per_identity_records(
+                (event for event, _ in events), self._data_processor):
+            identity_records[identity].append(time_and_record)
+
+        schema_loader = self._schema_loader
+        new_identities = [identity for identity in identity_records if identity not in self._pool]
+        self._preload_state(new_identities)
+        for identity, records in identity_records.items():
+            records.sort(key=lambda x: x[0])
+            transformer = self._pool.get(identity)
+            for _, record in records:
+                transformer.run_evaluate(record)
+            if self._window_bts:
+                transformer.run_finalize()
+        self._pool.expire()
+        self._get_store(schema_loader).finalize()
+
+        window_data = {
+            identity: self._execute_window_bts(identity, schema_loader, records[0][0])
+            for identity, records in identity_records.items()
+        }
+
+        end_time = time.time()
+        latency = end_time - min(read_time for _, read_time in events) if events else 0.0
+        metrics = self._metrics
+        metrics['batches'] += 1
+        metrics['events'] += len(events)
+        metrics['records'] += sum(len(records) for records in identity_records.values())
+        metrics['window_rows'] += sum(len(rows) for rows in window_data.values())
+        metrics['batch_seconds'] = end_time - start_time
+        metrics['latency_seconds'] = latency
+        metrics['max_latency_seconds'] = max(metrics['max_latency_seconds'], latency)
+        logging.debug('Executed batch of {} events for {} identities: {}'.format(
+            len(events), len(identity_records), self.metrics))
+
+        return window_data
+
+    def get_state(self, identity: str) -> Dict[Key, Any]:
+        """ Returns the streaming BTS state of the identity, saving it in the store first """
+        self._pool.finalize(identity)
+        store = self._get_store(self._schema_loader)
+        store.finalize()
+        return store.get_all(identity)
+
+    def flush(self) -> None:
+        """ Saves the state of the transformers kept in memory in the store """
+        self._pool.finalize()
+        self._get_store(self._schema_loader).finalize()
+
+    def close(self) -> None:
+        """ Saves the state of the transformers kept in memory and closes the source """
+        self._pool.clear()
+        self._get_store(self._schema_loader).finalize()
+        if self._source is not None:
+            self._source.close()
+
+    def write_output_file(self, output_file: str, window_data: Dict[str, List[Dict]]) -> None:
+        """ Appends the window BTS output of a batch to a file as a JSON line per row """
+        with open(output_file, 'a') as file:
+            for identity, rows in window_data.items():
+                for row in rows:
+                    file.write(json.dumps((identity, row), cls=BlurrJSONEncoder) + '\n')
+
+    def print_output(self, window_data: Dict[str, List[Dict]]) -> None:
+        for identity, rows in window_data.items():
+            for row in rows:
+                print(json.dumps((identity, row), cls=BlurrJSONEncoder))
@@ -1,10 +1,16 @@
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from itertools import islice
+from typing import Any, Callable, Dict, List, Tuple, Iterable, Generator
 
 import boto3
 from boto3.dynamodb.conditions import Key as DynamoKey, Attr
-from dateutil import parser
 
+from blurr.core import logging
+from blurr.core.errors import StoreBatchError
 from blurr.core.schema_loader import SchemaLoader
 from blurr.core.store import Store, Key, StoreSchema
 from blurr.core.store_key import KeyType
@@ -14,27 +20,68 @@ class DynamoStoreSchema(StoreSchema):
     ATTRIBUTE_TABLE = 'Table'
     ATTRIBUTE_READ_CAPACITY_UNITS = 'ReadCapacityUnits'
     ATTRIBUTE_WRITE_CAPACITY_UNITS = 'WriteCapacityUnits'
-    QUERY_LIMIT = 1000
+    ATTRIBUTE_WRITE_BUFFER_SIZE = 'WriteBufferSize'
+    ATTRIBUTE_WRITE_BUFFER_SECONDS = 'WriteBufferSeconds'
+    ATTRIBUTE_QUERY_PAGE_SIZE = 'QueryPageSize'
+    ATTRIBUTE_QUERY_PREFETCH = 'QueryPrefetch'
 
     def __init__(self, fully_qualified_name: str, schema_loader: SchemaLoader) -> None:
         super().__init__(fully_qualified_name, schema_loader)
         self.table_name = self._spec.get(self.ATTRIBUTE_TABLE, None)
         self.rcu = self._spec.get(self.ATTRIBUTE_READ_CAPACITY_UNITS, 5)
         self.wcu = self._spec.get(self.ATTRIBUTE_WRITE_CAPACITY_UNITS, 5)
-        self.query_limit = self.QUERY_LIMIT
+        self.query_page_size = self._spec.get(self.ATTRIBUTE_QUERY_PAGE_SIZE, 1000)
+        self.query_prefetch = self._spec.get(self.ATTRIBUTE_QUERY_PREFETCH, False)
+        self.write_buffer_size = self._spec.get(self.ATTRIBUTE_WRITE_BUFFER_SIZE, 100)
+        self.write_buffer_seconds = self._spec.get(self.ATTRIBUTE_WRITE_BUFFER_SECONDS, 60)
 
     def validate_schema_spec(self) -> None:
         super().validate_schema_spec()
         self.validate_required_attributes(self.ATTRIBUTE_TABLE)
+        self.validate_number_attribute(self.ATTRIBUTE_WRITE_BUFFER_SIZE, int, 1)
+        self.validate_number_attribute(self.ATTRIBUTE_WRITE_BUFFER_SECONDS, int, 1)
+        self.validate_number_attribute(self.ATTRIBUTE_QUERY_PAGE_SIZE, int, 1)
 
 
 class DynamoStore(Store):
     """
-    Dynamo store implementation
+    Dynamo store implementation.
+
+    Saves are buffered and written with `batch_write_item` when the buffer reaches
+    `WriteBufferSize` items, when the oldest buffered item is older than `WriteBufferSeconds`
+    and on `finalize()`, so that the items of several identities are written together. Buffered
+    items are visible to `get()` and are merged into the results of the queries.
+
+    Queries read all the pages of the result, `QueryPageSize` items at a time. When
+    `QueryPrefetch` is set the next page is requested while the current one is processed.
+    The pages, items and consumed capacity of the queries are counted per identity in
+    `query_stats` until `finalize()`.
+
+    Items are written as attributes by field name unless the `Codec` of the store encodes them
+    as bytes, in which case the encoded item is written as the `_snapshot` attribute alongside
+    the `_start_time` used by the range queries.
     """
 
+    # Maximum number of items DynamoDB accepts in one batch_write_item / batch_get_item request
+    BATCH_WRITE_LIMIT = 25
+    BATCH_GET_LIMIT = 100
+    # Retries of the unprocessed items of a batch request, with exponential backoff
+    BATCH_MAX_RETRIES = 8
+    BATCH_RETRY_BASE_SECONDS = 0.05
+    # Attribute of the items encoded as bytes by the codec of the store
+    SNAPSHOT_ATTRIBUTE = '_snapshot'
+
     def __init__(self, schema: DynamoStoreSchema) -> None:
         self._schema = schema
+        self._codec = schema.get_codec()
+        self._aggregate_schemas: Dict[str, Any] = {}
+        # Items to be written by (partition_key, range_key). A later save of a key replaces the
+        # buffered item so that a batch never contains the same key twice.
+        self._write_buffer: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._write_buffer_start: float = None
+        # Items loaded by `batch_get()` that are served by `get()` until `finalize()`
+        self._read_cache: Dict[Key, Any] = {}
+        self.query_stats: Dict[str, Counter] = defaultdict(Counter)
         self._dynamodb_resource = DynamoStore.get_dynamodb_resource()
         self._table = self._dynamodb_resource.Table(self._schema.table_name)
 
@@ -84,11 +131,41 @@ class DynamoStore(Store):
     def clean_item_for_save(item: Dict[str, Any]) -> Dict[str, Any]:
         return {k: v for k, v in item.items() if v}
 
+    def _get_aggregate_schema(self, key: Key) -> Any:
+        if key.group not in self._aggregate_schemas:
+            self._aggregate_schemas[key.group] = self._schema.get_aggregate_schema(key.group)
+        return self._aggregate_schemas[key.group]
+
+    def _encode_item(self, key: Key, item: Dict[str, Any]) -> Dict[str, Any]:
+        data = self._codec.encode(self._get_aggregate_schema(key), item)
+        if not isinstance(data, bytes):
+            return data
+        encoded_item = {self.SNAPSHOT_ATTRIBUTE: data}
+        if '_start_time' in item:
+            encoded_item['_start_time'] = item['_start_time']
+        return encoded_item
+
+    def _decode_item(self, key: Key, item: Dict[str, Any]) -> Dict[str, Any]:
+        item = self.clean_for_get(item)
+        if self.SNAPSHOT_ATTRIBUTE not in item:
+            return item
+        # boto3 reads binary attributes as `Binary` values that wrap the bytes
+        data = item[self.SNAPSHOT_ATTRIBUTE]
+        return self._codec.decode(self._get_aggregate_schema(key), getattr(data, 'value', data))
+
     def prepare_record(self, record: Dict[str, Any]) -> Tuple[Key, Any]:
         key = Key.parse_sort_key(record['partition_key'], record['range_key'])
-        return key, self.clean_for_get(record)
+        return key, self._decode_item(key, record)
 
     def get(self, key: Key) -> Any:
+        buffered_item = self._write_buffer.get((key.identity, key.sort_key), None)
+        if buffered_item is not None:
+            return self._decode_item(key, dict(buffered_item))
+
+        if key in self._read_cache:
+            item = self._read_cache[key]
+            return None if item is None else dict(item)
+
         item = self._table.get_item(Key={
             'partition_key': key.identity,
             'range_key': key.sort_key
@@ -97,22 +174,150 @@ class DynamoStore(Store):
         if not item:
             return None
 
-        return self.clean_for_get(item)
+        return self._decode_item(key, item)
+
+    def batch_get(self, keys: Iterable[Key]) -> Dict[Key, Any]:
+        """
+        Gets the items of the given keys with `batch_get_item` requests. The items are also cached
+        so that subsequent `get()` calls for the keys do not make a request until the next
+        `batch_get()` or `finalize()`.
+        :param keys: Keys to get.
+        :return: Dictionary of key and item. Item is None for keys that do not exist.
+        """
+        # Only the items of the last batch are cached to bound the memory used by the cache
+        self._read_cache.clear()
+        items = {}
+        keys_to_get = {}
+        for key in keys:
+            if (key.identity, key.sort_key) in self._write_buffer:
+                items[key] = self.get(key)
+            else:
+                keys_to_get[(key.identity, key.sort_key)] = key
+
+        key_list = list(keys_to_get.keys())
+        for i in range(0, len(key_list), self.BATCH_GET_LIMIT):
+            request_keys = [{
+                'partition_key': partition_key,
+                'range_key': range_key
+            } for partition_key, range_key in key_list[i:i + self.BATCH_GET_LIMIT]]
+            for item in self._batch_get_with_retries(request_keys):
+                key = keys_to_get[(item['partition_key'], item['range_key'])]
+                self._read_cache[key] = self._decode_item(key, item)
+
+        for key in keys_to_get.values():
+            self._read_cache.setdefault(key, None)
+            items[key] = self.get(key)
+        return items
+
+    def _batch_get_with_retries(self, request_keys: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        items = []
+        request = {self._schema.table_name: {'Keys': request_keys}}
+        for retry in range(self.BATCH_MAX_RETRIES + 1):
+            response = self._dynamodb_resource.batch_get_item(RequestItems=request)
+            items.extend(response.get('Responses', {}).get(self._schema.table_name, []))
+            request = response.get('UnprocessedKeys', None)
+            if not request:
+                return items
+            self._backoff(retry)
+
+        raise StoreBatchError('{} keys could not be read from {}'.format(
+            len(request[self._schema.table_name]['Keys']), self._schema.table_name))
+
+    def _query_pages(self, identity: str, **kwargs) -> Generator[List[Dict[str, Any]], None, None]:
+        """
+        Lazily iterates over the pages of a query, following `LastEvaluatedKey`.
+        :param identity: Identity being queried, used to record the query statistics.
+        :param kwargs: Arguments of the table query. `Limit` defaults to the page size.
+        """
+        kwargs.setdefault('Limit', self._schema.query_page_size)
+        kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+        stats = self.query_stats[identity]
+        stats['queries'] += 1
+
+        executor = None
+        next_page = None
+        response = self._table.query(**kwargs)
+        try:
+            while True:
+                last_evaluated_key = response.get('LastEvaluatedKey', None)
+                if last_evaluated_key and self._schema.query_prefetch:
+                    executor = executor or ThreadPoolExecutor(max_workers=1)
+                    next_page = executor.submit(
+                        self._table.query, ExclusiveStartKey=last_evaluated_key, **kwargs)
+
+                items = response.get('Items', [])
+                stats['pages'] += 1
+                stats['items'] += len(items)
+                stats['consumed_capacity'] += response.get('ConsumedCapacity', {}).get(
+                    'CapacityUnits', 0)
+                yield items
+
+                if not last_evaluated_key:
+                    return
+                response = next_page.result() if next_page else self._table.query(
+                    ExclusiveStartKey=last_evaluated_key, **kwargs)
+                next_page = None
+        finally:
+            if executor:
+                # Waits for a prefetch in flight so that the table is not queried concurrently
+                executor.shutdown(wait=True)
+
+    def _query_items(self, identity: str, **kwargs) -> Generator[Dict[str, Any], None, None]:
+        """ Lazily iterates over the items of all the pages of a query """
+        with closing(self._query_pages(identity, **kwargs)) as pages:
+            for page in pages:
+                yield from page
+
+    def _get_buffered_items(self, identity: str) -> Dict[Key, Any]:
+        """ Returns the buffered items of the identity, which may not be written to the table """
+        items = {}
+        for (partition_key, range_key), item in self._write_buffer.items():
+            if partition_key == identity:
+                key = Key.parse_sort_key(partition_key, range_key)
+                items[key] = self._decode_item(key, dict(item))
+        return items
+
+    def _merge_buffered_items(self, identity: str, records: List[Tuple[Key, Any]],
+                              matches: Callable[[Key, Any], bool]) -> List[Tuple[Key, Any]]:
+        """
+        Replaces the queried records with the buffered items of the same keys and adds the
+        buffered items that match the query.
+        """
+        buffered_items = self._get_buffered_items(identity)
+        if not buffered_items:
+            return records
+        records = [(key, item) for key, item in records if key not in buffered_items]
+        records.extend((key, item) for key, item in buffered_items.items() if matches(key, item))
+        return records
 
     def _get_range_timestamp_key(self, start: Key, end: Key,
                                  count: int = 0) -> List[Tuple[Key, Any]]:
         sort_key_condition = DynamoKey('range_key').between(start.sort_key, end.sort_key)
         # Limit is set to count+1 because for items where the start key matches exactly
         # KeyConditionExpression passes and FilterExpression fails.
-        response = self._table.query(
-            Limit=abs(count) + 1 if count else self._schema.query_limit,
-            KeyConditionExpression=DynamoKey('partition_key').eq(
-                start.identity) & sort_key_condition,
+        query_items = self._query_items(
+            start.identity,
+            Limit=min(abs(count) + 1, self._schema.query_page_size)
+            if count else self._schema.query_page_size,
+            KeyConditionExpression=DynamoKey('partition_key').eq(start.identity) &
+            sort_key_condition,
             FilterExpression=Attr('_start_time').gt(start.timestamp.isoformat()) &
             Attr('_start_time').lt(end.timestamp.isoformat()),
             ScanIndexForward=count >= 0,
         )
-        items = sorted([self.prepare_record(item) for item in response.get('Items', [])])
+        # Items are returned in range key order, so no more pages are read once count items
+        # have been found.
+        with closing(query_items):
+            records = [
+                self.prepare_record(item)
+                for item in (islice(query_items, abs(count)) if count else query_items)
+            ]
+        start_time, end_time = start.timestamp.isoformat(), end.timestamp.isoformat()
+        items = sorted(
+            self._merge_buffered_items(
+                start.identity, records,
+                lambda key, item: start.sort_key <= key.sort_key <= end.sort_key and
+                start_time < item.get('_start_time', start_time) < end_time))
         if count:
             items = self._restrict_items_to_count(items, count)
         return items
@@ -122,36 +327,84 @@ class DynamoStore(Store):
                                  start_time: datetime,
                                  end_time: datetime = None,
                                  count: int = 0) -> List[Tuple[Key, Any]]:
-        # A smaller limit cannot be set when abs(count) > 0 because all items need to be
-        # returned to find the count number of elements in a sorted manner.
+        # All items need to be read when abs(count) > 0 to find the count number of elements
+        # in a sorted manner.
         # TODO: Improve count query performance by using a secondary index.
-        response = self._table.query(
-            Limit=self._schema.query_limit,
-            KeyConditionExpression=DynamoKey('partition_key').eq(
-                base_key.identity) & DynamoKey('range_key').begins_with(base_key.sort_prefix_key),
+        query_items = self._query_items(
+            base_key.identity,
+            KeyConditionExpression=DynamoKey('partition_key').eq(base_key.identity) &
+            DynamoKey('range_key').begins_with(base_key.sort_prefix_key),
             FilterExpression=Attr('_start_time').gt(start_time.isoformat()) &
             Attr('_start_time').lt(end_time.isoformat()),
             ScanIndexForward=count >= 0,
         )
-        items = sorted(
-            [self.prepare_record(item) for item in response.get('Items', [])],
-            key=lambda i: i[1].get('_start_time', datetime.min.isoformat()))
+        start_time, end_time = start_time.isoformat(), end_time.isoformat()
+        records = self._merge_buffered_items(
+            base_key.identity, [self.prepare_record(item) for item in query_items],
+            lambda key, item: key.sort_key.startswith(base_key.sort_prefix_key) and
+            start_time < item.get('_start_time', start_time) < end_time)
+        items = sorted(records, key=lambda i: i[1].get('_start_time', datetime.min.isoformat()))
         if count:
             items = self._restrict_items_to_count(items, count)
         return items
 
     def get_all(self, identity: str) -> Dict[Key, Any]:
-        response = self._table.query(KeyConditionExpression=DynamoKey('partition_key').eq(identity))
-        return dict([self.prepare_record(item)
-                     for item in response['Items']] if 'Items' in response else [])
+        items = dict(
+            self.prepare_record(item) for item in self._query_items(
+                identity, KeyConditionExpression=DynamoKey('partition_key').eq(identity)))
+        items.update(self._get_buffered_items(identity))
+        return items
 
     def save(self, key: Key, item: Any) -> None:
+        item = self._encode_item(key, self.clean_item_for_save(item))
         item['partition_key'] = key.identity
         item['range_key'] = key.sort_key
-        self._table.put_item(Item=self.clean_item_for_save(item))
+
+        if not self._write_buffer:
+            self._write_buffer_start = time.monotonic()
+        self._write_buffer[(key.identity, key.sort_key)] = item
+        if key in self._read_cache:
+            self._read_cache[key] = self._decode_item(key, dict(item))
+
+        if len(self._write_buffer) >= self._schema.write_buffer_size or (
+                time.monotonic() - self._write_buffer_start >= self._schema.write_buffer_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes all the buffered items to the table in batches.
+        """
+        items = list(self._write_buffer.values())
+        for i in range(0, len(items), self.BATCH_WRITE_LIMIT):
+            self._batch_write_with_retries(items[i:i + self.BATCH_WRITE_LIMIT])
+
+        self._write_buffer.clear()
+        self._write_buffer_start = None
+
+    def _batch_write_with_retries(self, items: List[Dict[str, Any]]) -> None:
+        request = {self._schema.table_name: [{'PutRequest': {'Item': item}} for item in items]}
+        for retry in range(self.BATCH_MAX_RETRIES + 1):
+            response = self._dynamodb_resource.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems', None)
+            if not request:
+                return
+            self._backoff(retry)
+
+        raise StoreBatchError('{} items could not be written to {}'.format(
+            len(request[self._schema.table_name]), self._schema.table_name))
+
+    def _backoff(self, retry: int) -> None:
+        logging.debug('Retrying unprocessed items for {} (retry {})'.format(
+            self._schema.table_name, retry + 1))
+        time.sleep(self.BATCH_RETRY_BASE_SECONDS * (2**retry))
 
     def delete(self, key: Key) -> None:
         pass
 
     def finalize(self) -> None:
-        pass
+        self.flush()
+        self._read_cache.clear()
+        for identity, stats in self.query_stats.items():
+            logging.debug('Queried {} for {}: {}'.format(self._schema.table_name, identity,
+                                                         dict(stats)))
+        self.query_stats.clear()
@@ -1,8 +1,10 @@
-from datetime import datetime, timezone
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+from itertools import count
+from math import inf
 from typing import Any, Dict, List, Tuple
 
-from dateutil import parser
-
 from blurr.core.store import Store, Key, StoreSchema
 from blurr.core.store_key import KeyType
 
@@ -11,14 +13,58 @@ class MemoryStoreSchema(StoreSchema):
     pass
 
 
+class _SortedKeyIndex:
+    """
+    Keys of one identity and group sorted by a sort value for bisect based range queries.
+    """
+
+    def __init__(self) -> None:
+        self._values: List[Any] = []
+        self._keys: List[Key] = []
+
+    def add(self, value: Any, key: Key) -> None:
+        position = bisect_right(self._values, value)
+        self._values.insert(position, value)
+        self._keys.insert(position, key)
+
+    def remove(self, value: Any, key: Key) -> None:
+        position = bisect_left(self._values, value)
+        while self._keys[position] != key:
+            position += 1
+        del self._values[position]
+        del self._keys[position]
+
+    def range(self, lower: Any, upper: Any) -> List[Key]:
+        """ Returns the keys with sort values strictly between lower and upper in sorted order """
+        return self._keys[bisect_right(self._values, lower):bisect_left(self._values, upper)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
 class MemoryStore(Store):
     """
-    In-memory store implementation
+    In-memory store implementation.
+
+    Besides the items, the store maintains a per identity index so that identity and range queries
+    do not scan the items of other identities. Per identity and group, TIMESTAMP keys are kept
+    sorted by timestamp and DIMENSION keys are kept sorted by the `_start_time` of their item.
     """
 
+    DEFAULT_START_TIME = datetime.min.isoformat()
+
     def __init__(self, schema: MemoryStoreSchema) -> None:
         self._schema = schema
         self._cache: Dict[Key, Any] = dict()
+        self._identity_cache: Dict[str, Dict[Key, Any]] = defaultdict(dict)
+        self._timestamp_index: Dict[Tuple[str, str], _SortedKeyIndex] = defaultdict(
+            _SortedKeyIndex)
+        self._dimension_index: Dict[Tuple[str, str], _SortedKeyIndex] = defaultdict(
+            _SortedKeyIndex)
+        # Sort value of each key in the index it belongs to
+        self._sort_values: Dict[Key, Any] = dict()
+        # Items with the same `_start_time` are returned in the order they were first saved
+        self._sequence = count()
 
     def load(self):
         pass
@@ -27,44 +73,102 @@ class MemoryStore(Store):
         return self._cache.get(key, None)
 
     def get_all(self, identity: str = None) -> Dict[Key, Any]:
-        return {k: v
-                for k, v in self._cache.items()
-                if k.identity == identity} if identity else self._cache.copy()
+        if not identity:
+            return self._cache.copy()
+
+        return self._identity_cache[identity].copy() if identity in self._identity_cache else {}
 
     def _get_range_timestamp_key(self, start: Key, end: Key = None,
                                  count: int = 0) -> List[Tuple[Key, Any]]:
-        items = []
-        for key, item in self._cache.items():
-            if start < key < end:
-                items.append((key, item))
-        items = sorted(items)
+        index = self._timestamp_index.get((start.identity, start.group), None)
+        if not index:
+            return []
+
+        keys = index.range(start.timestamp, end.timestamp)
         if count:
-            items = self._restrict_items_to_count(items, count)
-        return items
+            keys = self._restrict_items_to_count(keys, count)
+        return [(key, self._cache[key]) for key in keys]
 
     def _get_range_dimension_key(self,
                                  base_key: Key,
                                  start_time: datetime,
                                  end_time: datetime,
                                  count: int = 0) -> List[Tuple[Key, Any]]:
-        start_time_str = start_time.isoformat()
-        end_time_str = end_time.isoformat()
-        items = []
-        for key, item in self._cache.items():
-            if key.starts_with(base_key):
-                item_time = item.get('_start_time', datetime.min.isoformat())
-                if start_time_str < item_time < end_time_str:
-                    items.append((key, item))
-        items = sorted(items, key=lambda i: i[1].get('_start_time', datetime.min.isoformat()))
+        index = self._dimension_index.get((base_key.identity, base_key.group), None)
+        if not index:
+            return []
+
+        keys = index.range((start_time.isoformat(), inf), (end_time.isoformat(), -1))
+        if base_key.dimensions:
+            keys = [key for key in keys if key.starts_with(base_key)]
         if count:
-            items = self._restrict_items_to_count(items, count)
-        return items
+            keys = self._restrict_items_to_count(keys, count)
+        return [(key, self._cache[key]) for key in keys]
 
     def save(self, key: Key, item: Any) -> None:
+        if key in self._cache:
+            self._remove_from_index(key)
+        sort_value = self._get_sort_value(key, item)
+
         self._cache[key] = item
+        self._identity_cache[key.identity][key] = item
+        if sort_value is None:
+            self._sort_values.pop(key, None)
+        else:
+            self._sort_values[key] = sort_value
+            self._get_index(key).add(sort_value, key)
 
     def delete(self, key: Key) -> None:
-        self._cache.pop(key, None)
+        if key not in self._cache:
+            return
+
+        self._remove_from_index(key)
+        self._sort_values.pop(key, None)
+        del self._cache[key]
+        del self._identity_cache[key.identity][key]
+        if not self._identity_cache[key.identity]:
+            del self._identity_cache[key.identity]
+
+    def clear(self) -> None:
+        """ Removes all the items from the store """
+        self._cache.clear()
+        self._identity_cache.clear()
+        self._timestamp_index.clear()
+        self._dimension_index.clear()
+        self._sort_values.clear()
 
     def finalize(self) -> None:
         pass
+
+    def _get_sort_value(self, key: Key, item: Any) -> Any:
+        if key.key_type == KeyType.TIMESTAMP:
+            return key.timestamp
+
+        if key.key_type == KeyType.DIMENSION and isinstance(item, dict):
+            start_time = item.get('_start_time', self.DEFAULT_START_TIME)
+            if not isinstance(start_time, str):
+                return None
+            # Items keep their position among items with the same start time when updated
+            sequence = self._sort_values[key][1] if key in self._sort_values else next(
+                self._sequence)
+            return start_time, sequence
+
+        return None
+
+    def _get_indexes(self, key: Key) -> Dict[Tuple[str, str], _SortedKeyIndex]:
+        if key.key_type == KeyType.TIMESTAMP:
+            return self._timestamp_index
+        return self._dimension_index
+
+    def _get_index(self, key: Key) -> _SortedKeyIndex:
+        return self._get_indexes(key)[(key.identity, key.group)]
+
+    def _remove_from_index(self, key: Key) -> None:
+        sort_value = self._sort_values.get(key, None)
+        if sort_value is None:
+            return
+
+        index = self._get_index(key)
+        index.remove(sort_value, key)
+        if not len(index):
+            del self._get_indexes(key)[(key.identity, key.group)]
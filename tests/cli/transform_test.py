@@ -11,7 +11,9 @@ def run_command(stream_bts_file: Optional[str],
                 source: Optional[str],
                 raw_json_files: Optional[str],
                 runner: Optional[str] = None,
-                data_processor: Optional[str] = None) -> int:
+                data_processor: Optional[str] = None,
+                workers: Optional[str] = None,
+                memory_budget: Optional[str] = None) -> int:
     return cli({
         'transform': True,
         'validate': False,
@@ -22,6 +24,8 @@ def run_command(stream_bts_file: Optional[str],
         '--data-processor': data_processor,
         '--source': source,
         '<raw-json-files>': raw_json_files,
+        '--workers': workers,
+        '--memory-budget': memory_budget,
     })
 
 
@@ -145,3 +149,60 @@ def test_transform_invalid_data_processor(capsys) -> None:
         data_processor='incorrect') == 1
     out, err = capsys.readouterr()
     assert 'Unknown data-processor: \'local\'. Possible values: [\'ipfix\', \'simple\']' in err
+
+
+def test_transform_workers_output_matches_serial(capsys) -> None:
+    assert run_command('tests/data/stream.yml', 'tests/data/window.yml', None,
+                       'tests/data/raw.json,tests/data/raw2.json') == 0
+    serial_out, _ = capsys.readouterr()
+    assert run_command(
+        'tests/data/stream.yml',
+        'tests/data/window.yml',
+        None,
+        'tests/data/raw.json,tests/data/raw2.json',
+        workers='2') == 0
+    parallel_out, err = capsys.readouterr()
+    assert parallel_out == serial_out
+    assert err == ''
+
+
+def test_transform_invalid_workers(capsys) -> None:
+    assert run_command(
+        stream_bts_file='tests/data/stream.yml',
+        window_bts_file='tests/data/window.yml',
+        source=None,
+        raw_json_files='tests/data/raw.json',
+        workers='0') == 1
+    out, err = capsys.readouterr()
+    assert 'Invalid workers: \'0\'. Must be a positive integer.' in err
+
+
+def test_transform_memory_budget(capsys) -> None:
+    assert run_command(
+        'tests/data/stream.yml',
+        'tests/data/window.yml',
+        None,
+        'tests/data/raw.json,tests/data/raw.json',
+        memory_budget='1') == 0
+    out, err = capsys.readouterr()
+    assert_record_in_ouput([
+        'userA', [{
+            'last_session._identity': 'userA',
+            'last_session.events': 2,
+            'last_day._identity': 'userA',
+            'last_day.total_events': 2
+        }]
+    ], out)
+    assert err == ''
+
+
+def test_transform_memory_budget_with_workers(capsys) -> None:
+    assert run_command(
+        'tests/data/stream.yml',
+        None,
+        None,
+        'tests/data/raw.json',
+        workers='2',
+        memory_budget='1') == 1
+    out, err = capsys.readouterr()
+    assert 'workers and memory-budget cannot be used together.' in err
@@ -0,0 +1,173 @@
+from typing import Dict, Any
+
+import pytest
+import yaml
+from pytest import fixture, raises
+
+from blurr.core.aggregate import AggregateSchema
+from blurr.core.errors import MissingAttributeError
+from blurr.core.record import Record
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.transformer_streaming import StreamingTransformer
+from blurr.core.type import Type
+from blurr.runner.local_runner import LocalRunner
+
+
+@fixture
+def schema_spec() -> Dict[str, Any]:
+    return {
+        'Name': 'test',
+        'Type': Type.BLURR_TRANSFORM_STREAMING,
+        'Version': '2018-03-01',
+        'Import': [{
+            'Module': 'dateutil',
+            'Identifiers': ['parser']
+        }],
+        'Time': 'parser.parse(source.event_time)',
+        'Identity': 'source.user_id',
+        'Stores': [{
+            'Type': Type.BLURR_STORE_MEMORY,
+            'Name': 'memory'
+        }],
+        'Aggregates': [{
+            'Name': 'user',
+            'Type': Type.BLURR_AGGREGATE_VARIABLE,
+            'When': 'source.event_id != \'ignored\'',
+            'Fields': [{
+                'Name': 'events',
+                'Type': Type.INTEGER,
+                'Value': 'user.events + 1'
+            }, {
+                'Name': 'score',
+                'Type': Type.FLOAT,
+                'Value': 'source.score',
+                'When': 'source.event_id == \'game_end\''
+            }, {
+                'Name': 'total_score',
+                'Type': Type.FLOAT,
+                'Value': 'user.total_score + user.score',
+                'When': 'source.event_id == \'game_end\''
+            }, {
+                'Name': 'scores',
+                'Type': Type.LIST,
+                'Value': 'user.scores.append(source.score)',
+                'When': 'source.event_id == \'game_end\''
+            }, {
+                'Name': 'doubled',
+                'Type': Type.LIST,
+                'Value': '[user * 2 for user in user.scores]'
+            }]
+        }]
+    }
+
+
+def get_transformer(schema_spec: Dict[str, Any]) -> StreamingTransformer:
+    schema_loader = SchemaLoader()
+    name = schema_loader.add_schema_spec(schema_spec)
+    return StreamingTransformer(schema_loader.get_schema_object(name), 'user1')
+
+
+def evaluate(transformer: StreamingTransformer, **record) -> None:
+    transformer.run_evaluate(
+        Record({
+            'user_id': 'user1',
+            'event_time': '2018-03-07T22:35:31+00:00',
+            **record
+        }))
+
+
+def test_fields_are_compiled(schema_spec: Dict[str, Any]) -> None:
+    transformer = get_transformer(schema_spec)
+    evaluate(transformer, event_id='game_start')
+
+    assert transformer.user._evaluate_fields
+    assert transformer.user.events == 1
+    assert transformer.user.score == 0
+    assert transformer.user._fields['score'].eval_error
+
+    evaluate(transformer, event_id='game_end', score='12.5')
+    evaluate(transformer, event_id='game_end', score=10)
+    evaluate(transformer, event_id='ignored', score=10)
+
+    assert transformer.user.events == 3
+    assert transformer.user.score == 10.0
+    assert transformer.user.total_score == 22.5
+    assert transformer.user.scores == ['12.5', 10]
+    assert transformer.user.doubled == ['12.512.5', 20]
+
+
+def test_cast_error_keeps_value(schema_spec: Dict[str, Any]) -> None:
+    transformer = get_transformer(schema_spec)
+    evaluate(transformer, event_id='game_end', score='5')
+    evaluate(transformer, event_id='game_end', score='not a number')
+
+    assert transformer.user.score == 5.0
+    assert transformer.user._fields['score'].eval_error
+
+
+@pytest.mark.parametrize('value, error',
+                         [('unknown_name + 1', NameError),
+                          ('user.unknown_field', MissingAttributeError)])
+def test_errors_are_raised(schema_spec: Dict[str, Any], value: str, error: type) -> None:
+    schema_spec['Aggregates'][0]['Fields'][0]['Value'] = value
+    transformer = get_transformer(schema_spec)
+
+    with raises(error):
+        evaluate(transformer, event_id='game_start')
+
+
+def test_compile_fields_disabled(schema_spec: Dict[str, Any], monkeypatch) -> None:
+    monkeypatch.setattr(AggregateSchema, 'COMPILE_FIELDS', False)
+    transformer = get_transformer(schema_spec)
+    evaluate(transformer, event_id='game_end', score=2)
+
+    assert transformer.user._evaluate_fields is False
+    assert transformer.user.total_score == 2.0
+
+
+def test_reserved_names_are_not_compiled(schema_spec: Dict[str, Any]) -> None:
+    schema_spec['Aggregates'][0]['Fields'][0]['Value'] = '_blurr_result'
+    transformer = get_transformer(schema_spec)
+
+    with raises(NameError):
+        evaluate(transformer, event_id='game_start')
+    assert transformer.user._evaluate_fields is False
+
+
+def execute_runner(stream_bts_file: str, window_bts_file: str, data_file: str) -> Dict:
+    runner = LocalRunner(stream_bts_file, window_bts_file)
+    return runner.execute(runner.get_identity_records_from_json_files([data_file]))
+
+
+@fixture
+def offer_ai_bts_file(tmpdir) -> str:
+    # The example uses dateutil's parser without importing it
+    with open('docs/examples/offer-ai/offer-ai-streaming-bts.yml') as bts_file:
+        bts = yaml.safe_load(bts_file)
+    bts['Import'] = [{'Module': 'dateutil', 'Identifiers': ['parser']}]
+    bts_file = tmpdir.join('offer-ai-streaming-bts.yml')
+    bts_file.write(yaml.safe_dump(bts))
+    return str(bts_file)
+
+
+def assert_compiled_output_matches_interpreted(stream_bts_file: str, window_bts_file: str,
+                                               data_file: str, monkeypatch) -> None:
+    compiled = execute_runner(stream_bts_file, window_bts_file, data_file)
+    monkeypatch.setattr(AggregateSchema, 'COMPILE_FIELDS', False)
+    interpreted = execute_runner(stream_bts_file, window_bts_file, data_file)
+
+    assert compiled
+    assert compiled == interpreted
+
+
+def test_tutorial_compiled_output_matches_interpreted(monkeypatch) -> None:
+    assert_compiled_output_matches_interpreted(
+        'docs/examples/tutorial/tutorial2-streaming-bts.yml',
+        'docs/examples/tutorial/tutorial2-window-bts.yml',
+        'docs/examples/tutorial/tutorial2-data.log', monkeypatch)
+
+
+def test_offer_ai_compiled_output_matches_interpreted(offer_ai_bts_file: str,
+                                                      monkeypatch) -> None:
+    assert_compiled_output_matches_interpreted(
+        offer_ai_bts_file, None, 'docs/examples/offer-ai/raw-data.json', monkeypatch)
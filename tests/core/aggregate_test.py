@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 from typing import Dict, Any
+from unittest import mock
 
-from pytest import fixture
+from pytest import fixture, mark
 
 from blurr.core.aggregate import AggregateSchema, Aggregate
 from blurr.core.evaluation import EvaluationContext
@@ -20,6 +21,10 @@ def get_aggregate_schema_spec() -> Dict[str, Any]:
             'Name': 'event_count',
             'Type': Type.INTEGER,
             'Value': 5
+        }, {
+            'Name': 'labels',
+            'Type': Type.MAP,
+            'Value': 'user.labels'
         }]
     }
 
@@ -67,7 +72,7 @@ def test_aggregate_nested_items(aggregate_schema_with_store):
         identity="12345",
         evaluation_context=EvaluationContext())
     nested_items = aggregate._nested_items
-    assert len(nested_items) == 2
+    assert len(nested_items) == 3
     assert "event_count" in nested_items
     assert isinstance(nested_items["event_count"], Field)
     assert "_identity" in nested_items
@@ -104,3 +109,49 @@ def test_aggregate_finalize(aggregate_schema_with_store):
         Key(KeyType.DIMENSION, identity="12345", group="user"))
     assert snapshot_aggregate is not None
     assert snapshot_aggregate == aggregate._snapshot
+
+
+@mark.parametrize('skip_unchanged_saves', [True, False])
+def test_aggregate_persist_unchanged(aggregate_schema_with_store, skip_unchanged_saves,
+                                     monkeypatch):
+    monkeypatch.setattr(AggregateSchema, 'SKIP_UNCHANGED_SAVES', skip_unchanged_saves)
+    key = Key(KeyType.DIMENSION, identity='12345', group='user')
+    snapshot = {'_identity': '12345', 'event_count': 5, 'labels': {'a': 1}}
+    aggregate = MockAggregate(
+        schema=aggregate_schema_with_store,
+        identity='12345',
+        evaluation_context=EvaluationContext()).run_restore(snapshot)
+    store = aggregate._store
+
+    with mock.patch.object(store, 'save', wraps=store.save) as save:
+        aggregate._persist()
+        assert save.call_count == (0 if skip_unchanged_saves else 1)
+        assert aggregate_schema_with_store.skipped_saves == (1 if skip_unchanged_saves else 0)
+
+        # Complex fields are modified in place
+        aggregate._fields['labels'].value.set('b', 2)
+        aggregate._persist()
+        assert store.get(key)['labels'] == {'a': 1, 'b': 2}
+
+        # Saved aggregates are saved again as the saved snapshot can still be modified
+        aggregate._persist()
+        assert save.call_count == (2 if skip_unchanged_saves else 3)
+
+        aggregate.run_reset()
+        aggregate._persist()
+        assert save.call_count == (3 if skip_unchanged_saves else 4)
+
+
+def test_aggregate_persist_nested_change(aggregate_schema_with_store):
+    key = Key(KeyType.DIMENSION, identity='12345', group='user')
+    snapshot = {'_identity': '12345', 'event_count': 5, 'labels': {'a': ['x']}}
+    aggregate = MockAggregate(
+        schema=aggregate_schema_with_store,
+        identity='12345',
+        evaluation_context=EvaluationContext()).run_restore(snapshot)
+
+    # Nested values of complex fields are modified in place
+    aggregate._fields['labels'].value['a'].append('y')
+    aggregate._persist()
+    assert aggregate._store.get(key)['labels'] == {'a': ['x', 'y']}
+    assert aggregate_schema_with_store.skipped_saves == 0
@@ -1,9 +1,11 @@
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from typing import List
 
 import pytest
 from pytest import fixture
 
-from blurr.core.aggregate_window import WindowAggregateSchema, WindowAggregate
+from blurr.core import aggregate_window
+from blurr.core.aggregate_window import WindowAggregateSchema, WindowAggregate, WindowColumn
 from blurr.core.errors import PrepareWindowMissingBlocksError
 from blurr.core.evaluation import EvaluationContext, Context
 from blurr.core.schema_loader import SchemaLoader
@@ -156,3 +158,103 @@ def test_evaluate(window_aggregate):
     window_aggregate._prepare_window(datetime(2018, 3, 7, 21, 36, 31, 0, timezone.utc))
     window_aggregate.run_evaluate()
     assert window_aggregate.total_events == 9
+
+
+def prepare_windows(window_aggregate: WindowAggregate, anchor_times: List[datetime]) -> List:
+    windows = []
+    for anchor_time in anchor_times:
+        try:
+            window_aggregate._prepare_window(anchor_time)
+            windows.append(window_aggregate._window_source.events)
+        except PrepareWindowMissingBlocksError as err:
+            windows.append(str(err))
+    return windows
+
+
+@pytest.mark.parametrize('window_type, window_value', [(Type.DAY, 1), (Type.DAY, -1),
+                                                       (Type.HOUR, 2), (Type.HOUR, -3),
+                                                       (Type.COUNT, 2), (Type.COUNT, -2)])
+def test_sliding_window_matches_store_range(window_aggregate: WindowAggregate, window_type: Type,
+                                            window_value: int, monkeypatch) -> None:
+    window_aggregate._schema.window_type = window_type
+    window_aggregate._schema.window_value = window_value
+    anchor_times = [
+        datetime(2018, 3, 7, 18, 35, 31, 0, timezone.utc) + timedelta(minutes=30 * i)
+        for i in range(60)
+    ] + [datetime(2018, 3, 7, 21, 36, 31, 0, timezone.utc)]
+    anchor_times += list(reversed(anchor_times))
+
+    windows = prepare_windows(window_aggregate, anchor_times)
+    monkeypatch.setattr(WindowAggregateSchema, 'INCREMENTAL_WINDOWS', False)
+    assert windows == prepare_windows(window_aggregate, anchor_times)
+
+
+def test_sliding_window_restores_blocks_once(window_aggregate: WindowAggregate) -> None:
+    window_aggregate._schema.window_type = Type.COUNT
+    window_aggregate._schema.window_value = 2
+    prepare_windows(window_aggregate, [
+        datetime(2018, 3, 7, 18, 35, 31, 0, timezone.utc) + timedelta(minutes=30 * i)
+        for i in range(60)
+    ])
+    assert window_aggregate.block_cache.stats == {
+        'hits': 0,
+        'misses': 6,
+        'evictions': 0,
+        'size': 6
+    }
+
+
+def test_window_source_columns(window_aggregate: WindowAggregate) -> None:
+    window_aggregate._schema.window_type = Type.COUNT
+    window_aggregate._schema.window_value = 3
+    window_aggregate._prepare_window(datetime(2018, 3, 7, 21, 36, 31, 0, timezone.utc))
+
+    events = window_aggregate._window_source.events
+    assert isinstance(events, WindowColumn)
+    assert events is window_aggregate._window_source.events
+    assert events == [4, 5, 6]
+    assert events + [7] == [4, 5, 6, 7]
+    assert sum(events) == events.sum() == 15
+    assert (events.min(), events.max()) == (4, 6)
+    assert events.mean() == events.median() == 5.0
+    assert events.percentile(25) == 4.5
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_window_column_aggregates(use_numpy: bool, monkeypatch) -> None:
+    if not use_numpy:
+        monkeypatch.setattr(aggregate_window, 'numpy', None)
+    elif aggregate_window.numpy is None:
+        pytest.skip('NumPy is not installed')
+    monkeypatch.setattr(WindowColumn, 'NUMPY_MIN_LENGTH', 0)
+
+    column = WindowColumn([1, 5, 2, 8], Type.INTEGER)
+    assert (column.array is None) != use_numpy
+    assert column.sum() == 16
+    assert type(column.sum()) is int
+    assert (column.min(), column.max()) == (1, 8)
+    assert column.mean() == 4.0
+    assert column.median() == 3.5
+    assert column.std() == pytest.approx(2.7386127875)
+    assert column.percentile(90) == pytest.approx(7.1)
+    assert column.percentile(0) == 1.0
+    assert column.percentile(100) == 8.0
+
+    assert WindowColumn([True, False, True], Type.BOOLEAN).sum() == 2
+    assert WindowColumn([0.5, 1.5], Type.FLOAT).mean() == 1.0
+    assert WindowColumn(['b', 'a'], Type.STRING).max() == 'b'
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_window_column_integer_sum_does_not_overflow(use_numpy: bool, monkeypatch) -> None:
+    if not use_numpy:
+        monkeypatch.setattr(aggregate_window, 'numpy', None)
+    elif aggregate_window.numpy is None:
+        pytest.skip('NumPy is not installed')
+
+    length = WindowColumn.NUMPY_MIN_LENGTH
+    column = WindowColumn([2**62] * length, Type.INTEGER)
+    assert column.sum() == length * 2**62
+    assert type(column.sum()) is int
+    assert column.mean() == float(2**62)
+    assert WindowColumn([2**62] * (length - 1), Type.INTEGER).sum() == (length - 1) * 2**62
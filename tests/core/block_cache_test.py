@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import yaml
+from pytest import fixture
+
+from blurr.core.aggregate_block import TimeAggregate
+from blurr.core.aggregate_time import TimeAggregateSchema
+from blurr.core.block_cache import BlockCache
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.store_key import Key, KeyType
+
+
+@fixture
+def session_schema() -> TimeAggregateSchema:
+    schema_loader = SchemaLoader()
+    stream_bts_name = schema_loader.add_schema_spec(
+        yaml.safe_load(open('tests/data/stream.yml')))
+    return schema_loader.get_schema_object(stream_bts_name + '.session')
+
+
+def get_block(i: int):
+    start_time = datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc) + timedelta(hours=i)
+    return Key(KeyType.TIMESTAMP, 'user1', 'session', [], start_time), {
+        'events': i,
+        '_start_time': start_time.isoformat()
+    }
+
+
+def test_block_cache_restores_blocks_once(session_schema: TimeAggregateSchema) -> None:
+    cache = BlockCache()
+    key, snapshot = get_block(1)
+    block = cache.get(session_schema, 'user1', key, snapshot)
+    assert isinstance(block, TimeAggregate)
+    assert block._identity == 'user1'
+    assert block.events == 1
+
+    assert cache.get(session_schema, 'user1', Key.parse(str(key)), snapshot) is block
+    assert cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}
+
+    cache.clear()
+    assert cache.get(session_schema, 'user1', key, snapshot) is not block
+    assert cache.stats == {'hits': 1, 'misses': 2, 'evictions': 0, 'size': 1}
+
+
+def test_block_cache_evicts_least_recently_used(session_schema: TimeAggregateSchema) -> None:
+    cache = BlockCache(max_size=2)
+    blocks = [get_block(i) for i in range(3)]
+    first = cache.get(session_schema, 'user1', *blocks[0])
+    cache.get(session_schema, 'user1', *blocks[1])
+    assert cache.get(session_schema, 'user1', *blocks[0]) is first
+
+    # The second block is the least recently used
+    cache.get(session_schema, 'user1', *blocks[2])
+    assert cache.get(session_schema, 'user1', *blocks[0]) is first
+    assert cache.stats == {'hits': 2, 'misses': 3, 'evictions': 1, 'size': 2}
+    cache.get(session_schema, 'user1', *blocks[1])
+    assert cache.stats == {'hits': 2, 'misses': 4, 'evictions': 2, 'size': 2}
+
+
+def test_block_cache_disabled(session_schema: TimeAggregateSchema) -> None:
+    cache = BlockCache(max_size=0)
+    key, snapshot = get_block(1)
+    assert cache.get(session_schema, 'user1', key, snapshot) is not cache.get(
+        session_schema, 'user1', key, snapshot)
+    assert cache.stats == {'hits': 0, 'misses': 2, 'evictions': 0, 'size': 0}
@@ -73,3 +73,30 @@ def test_builtin_override():
     """ Ensures that when built-in methods are overridden, the overrides are properly executed """
     sample = TestType()
     assert str(sample) == 'string'
+
+
+def test_methods_are_wrapped_once():
+    """ Ensures that methods are wrapped when the class is created and not on every access """
+    sample = TestType()
+    assert sample.method_without_return.__func__ is TestType.method_without_return
+    assert sample.base_method_without_return() is sample
+    assert TestType.base_method_without_return.__wrapped__ is BaseType.base_method_without_return
+
+
+class SubTestType(TestType):
+    """ Subclass of a complex type that inherits the wrapped methods """
+
+    def method_with_return(self, arg1, arg2):
+        return arg1
+
+    def method_returning_base_type(self):
+        return TestType()
+
+
+def test_subclass_methods():
+    """ Ensures that inherited methods are not wrapped again and overrides are wrapped """
+    sample = SubTestType()
+    assert 'method_without_return' not in vars(SubTestType)
+    assert sample.method_without_return() is sample
+    assert sample.method_with_return(0, 1) == 0
+    assert isinstance(sample.method_returning_base_type(), SubTestType)
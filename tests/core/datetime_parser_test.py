@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from dateutil import parser
+
+from blurr.core.datetime_parser import parse_datetime, _fromisoformat
+
+
+@pytest.mark.parametrize('value', [
+    datetime(2018, 3, 7, 22, 35, 31),
+    datetime(2018, 3, 7, 22, 35, 31, 12, timezone.utc),
+    datetime(2018, 3, 7, 22, 35, 31, 0, timezone(timedelta(hours=5, minutes=30))),
+    datetime(2018, 3, 7, 22, 35, 31, 0, timezone(-timedelta(hours=8))),
+])
+def test_parse_isoformat(value: datetime) -> None:
+    assert parse_datetime(value.isoformat()) == value
+    assert parse_datetime(value.isoformat()).utcoffset() == value.utcoffset()
+    assert _fromisoformat(value.isoformat()) == value
+    assert _fromisoformat(value.isoformat()).utcoffset() == value.utcoffset()
+
+
+@pytest.mark.parametrize('value', [
+    '2018-03-07T22:35:31Z',
+    '2018-03-07T22:35:31.123+0100',
+    'March 7 2018 22:35',
+    '07/03/2018',
+])
+def test_parse_other_formats(value: str) -> None:
+    assert parse_datetime(value) == parser.parse(value)
+
+
+def test_parse_invalid() -> None:
+    with pytest.raises(ValueError):
+        parse_datetime('not a date')
+    with pytest.raises(ValueError, match='Invalid isoformat string'):
+        _fromisoformat('March 7 2018 22:35')
+
+
+def test_parse_is_memoized() -> None:
+    value = datetime(2018, 3, 7, 22, 35, 31, 0, timezone.utc).isoformat()
+    assert parse_datetime(value) is parse_datetime(value)
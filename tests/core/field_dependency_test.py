@@ -0,0 +1,260 @@
+from typing import Dict, Any, Set, List, Optional
+
+import pytest
+from pytest import fixture
+
+from blurr.core.aggregate import AggregateSchema
+from blurr.core.evaluation import Expression
+from blurr.core.field_dependency import FieldDependency, get_imported_names, \
+    get_source_projection, get_source_reference
+from blurr.core.type import Type
+from tests.core.aggregate_compiler_test import get_transformer, evaluate, \
+    assert_compiled_output_matches_interpreted, offer_ai_bts_file, execute_runner
+
+
+@pytest.mark.parametrize('expression, required', [
+    ('source.amount', {'amount'}),
+    ('source.amount + user.total', {'amount'}),
+    ('user.total + source.amount', {'amount'}),
+    ('\'%s\' % source.amount', set()),
+    ('source.amount % 2', {'amount'}),
+    ('-source.amount', {'amount'}),
+    ('not source.amount', set()),
+    ('source.tags[0]', {'tags'}),
+    ('source.get(\'amount\', 1)', set()),
+    ('session.amount + source.get(\'amount\', 1)', set()),
+    ('len(source.keys())', set()),
+    ('source.items()[0]', set()),
+    ('source.user.name', {'user'}),
+    ('source.name.lower()', {'name'}),
+    ('float(source.amount)', {'amount'}),
+    ('str(source.amount)', set()),
+    ('parse(source.time)', set()),
+    ('source.event_id == \'start\'', set()),
+    ('source.amount > 5', {'amount'}),
+    ('\'a\' in source.tags', {'tags'}),
+    ('source.tag in [\'a\', \'b\']', set()),
+    ('source.a and source.b', {'a'}),
+    ('source.a or source.b', set()),
+    ('1 if source.a else 2', set()),
+    ('source.a if source.b > 1 else source.c', {'b'}),
+    ('source.a if source.b else source.a', {'a'}),
+    ('True if source.method == \'fb\' else False', set()),
+])
+def test_required_source_attributes(expression: str, required: Set[str]) -> None:
+    dependency = FieldDependency('user', 'field', [Expression(expression)], set())
+    assert dependency.required_source_attributes == required
+
+
+def test_shadowed_strict_function() -> None:
+    dependency = FieldDependency('user', 'field', [Expression('float(source.amount)')], {'float'})
+    assert dependency.required_source_attributes == set()
+
+
+def test_required_source_attributes_of_when_and_value() -> None:
+    dependency = FieldDependency(
+        'user', 'field', [Expression('source.a > 1'), Expression('source.b')], set())
+    assert dependency.required_source_attributes == {'a', 'b'}
+    assert dependency.source_attributes == {'a', 'b'}
+
+
+@pytest.mark.parametrize('expression, is_derived', [
+    ('user.won / user.played', True),
+    ('user.won / user.played if user.played else 0', True),
+    ('(identity, session.count)', True),
+    ('user.field + 1', False),
+    ('user.won + source.won', False),
+    ('user.won + time.hour', False),
+    ('round(user.won / user.played)', False),
+    ('[x for x in user.names]', False),
+    ('5', False),
+])
+def test_derived_fields(expression: str, is_derived: bool) -> None:
+    dependency = FieldDependency('user', 'field', [Expression(expression)], set())
+    assert dependency.is_derived == is_derived
+
+
+@pytest.mark.parametrize('expressions, projection', [
+    (['source.a', 'source.b.c + 1'], {'a', 'b'}),
+    (['source[\'a\'] + source.b[0]', 'user.c'], {'a', 'b'}),
+    (['[x for x in source.a]', '5'], {'a'}),
+    (['source.get(\'a\')'], None),
+    (['source.a', 'str(source)'], None),
+    (['source[key]'], None),
+    (['source[1]'], None),
+    (['\'a\' in source'], None),
+    (['[source for source in user.sources]'], None),
+])
+def test_get_source_projection(expressions: List[str], projection: Optional[Set[str]]) -> None:
+    assert get_source_projection(
+        [Expression(expression) for expression in expressions]) == projection
+
+
+@pytest.mark.parametrize('expression, key', [
+    ('source.user_id', 'user_id'),
+    ('source[\'user id\']', 'user id'),
+    ('source.user.id', None),
+    ('parse(source.time)', None),
+    ('source.get', None),
+    ('source', None),
+])
+def test_get_source_reference(expression: str, key: Optional[str]) -> None:
+    assert get_source_reference(Expression(expression)) == key
+
+
+def test_get_imported_names() -> None:
+    assert get_imported_names([{
+        'Module': 'dateutil',
+        'Identifiers': ['parser', 'tz as timezone']
+    }, {
+        'Module': 'os.path'
+    }, {
+        'Module': 'datetime as dt'
+    }]) == {'parser', 'timezone', 'os', 'dt'}
+
+
+@fixture
+def schema_spec() -> Dict[str, Any]:
+    return {
+        'Name': 'test',
+        'Type': Type.BLURR_TRANSFORM_STREAMING,
+        'Version': '2018-03-01',
+        'Import': [{
+            'Module': 'dateutil',
+            'Identifiers': ['parser']
+        }],
+        'Time': 'parser.parse(source.event_time)',
+        'Identity': 'source.user_id',
+        'Stores': [{
+            'Type': Type.BLURR_STORE_MEMORY,
+            'Name': 'memory'
+        }],
+        'Aggregates': [{
+            'Name': 'user',
+            'Type': Type.BLURR_AGGREGATE_VARIABLE,
+            'Fields': [{
+                'Name': 'played',
+                'Type': Type.INTEGER,
+                'Value': 'user.played + 1',
+                'When': 'source.event_id == \'game_start\''
+            }, {
+                'Name': 'won',
+                'Type': Type.INTEGER,
+                'Value': 'user.won + int(source.won)',
+            }, {
+                'Name': 'ratio',
+                'Type': Type.FLOAT,
+                'Value': 'user.won / user.played',
+            }]
+        }]
+    }
+
+
+@pytest.mark.parametrize('compile_fields', [False, True])
+def test_unaffected_fields_are_skipped(schema_spec: Dict[str, Any], compile_fields: bool,
+                                       monkeypatch) -> None:
+    monkeypatch.setattr(AggregateSchema, 'COMPILE_FIELDS', compile_fields)
+    transformer = get_transformer(schema_spec)
+    schema = transformer._schema.nested_schema['user']
+    assert schema.dependency_graph == {
+        '_identity': set(),
+        'played': {'played'},
+        'won': {'won'},
+        'ratio': {'won', 'played'}
+    }
+
+    evaluate(transformer, event_id='game_start')
+    assert transformer.user._fields['won'].eval_error
+    assert transformer.user.ratio == 0.0
+    assert schema.skipped_fields == {'won': 1}
+
+    evaluate(transformer, event_id='game_end', won='1')
+    evaluate(transformer, event_id='game_end')
+    assert transformer.user.played == 1
+    assert transformer.user.won == 1
+    assert transformer.user.ratio == 1.0
+    assert transformer.user._fields['won'].eval_error
+    assert not transformer.user._fields['ratio'].eval_error
+    assert schema.skipped_fields == {'won': 2, 'ratio': 1}
+
+    # Inputs are evaluated again after a reset
+    transformer.user.run_reset()
+    evaluate(transformer, event_id='game_start')
+    assert transformer.user.ratio == 0.0
+    assert schema.skipped_fields == {'won': 3, 'ratio': 1}
+
+
+def test_skip_unaffected_fields_disabled(schema_spec: Dict[str, Any], monkeypatch) -> None:
+    monkeypatch.setattr(AggregateSchema, 'SKIP_UNAFFECTED_FIELDS', False)
+    transformer = get_transformer(schema_spec)
+    evaluate(transformer, event_id='game_start')
+    evaluate(transformer, event_id='game_end')
+
+    schema = transformer._schema.nested_schema['user']
+    assert schema.field_dependencies == {}
+    assert schema.skipped_fields == {}
+    assert transformer.user._fields['won'].eval_error
+
+
+@pytest.mark.parametrize('compile_fields', [False, True])
+def test_record_methods_are_not_required_attributes(schema_spec: Dict[str, Any],
+                                                    compile_fields: bool, monkeypatch) -> None:
+    monkeypatch.setattr(AggregateSchema, 'COMPILE_FIELDS', compile_fields)
+    schema_spec['Aggregates'][0]['Fields'] = [{
+        'Name': 'amount',
+        'Type': Type.INTEGER,
+        'Value': 'user.amount + source.get(\'amount\', 1)'
+    }, {
+        'Name': 'keys',
+        'Type': Type.INTEGER,
+        'Value': 'len(source.keys())'
+    }]
+    transformer = get_transformer(schema_spec)
+    evaluate(transformer)
+    evaluate(transformer, amount=2)
+
+    assert transformer.user.amount == 3
+    assert transformer.user.keys == 3
+    assert transformer._schema.nested_schema['user'].skipped_fields == {}
+
+
+def test_undefined_names() -> None:
+    dependency = FieldDependency('user', 'field', [
+        Expression('[x + y for x in source.a]'),
+        Expression('parser.parse(source.b) + len(user.c)')
+    ], {'parser', 'user'})
+    assert dependency.undefined_names == {'y'}
+
+
+@pytest.mark.parametrize('compile_fields', [False, True])
+def test_fields_with_undefined_names_are_not_skipped(schema_spec: Dict[str, Any],
+                                                     compile_fields: bool, monkeypatch) -> None:
+    monkeypatch.setattr(AggregateSchema, 'COMPILE_FIELDS', compile_fields)
+    schema_spec['Aggregates'][0]['Fields'][1]['Value'] = 'usr.won + int(source.won)'
+    transformer = get_transformer(schema_spec)
+
+    assert 'won' not in transformer._schema.nested_schema['user'].field_dependencies
+    with pytest.raises(NameError, match='usr'):
+        evaluate(transformer, event_id='game_start')
+
+
+def assert_output_matches_without_skipping(stream_bts_file: str, window_bts_file: str,
+                                           data_file: str, monkeypatch) -> None:
+    skipped = execute_runner(stream_bts_file, window_bts_file, data_file)
+    monkeypatch.setattr(AggregateSchema, 'SKIP_UNAFFECTED_FIELDS', False)
+    assert_compiled_output_matches_interpreted(stream_bts_file, window_bts_file, data_file,
+                                               monkeypatch)
+
+    assert skipped == execute_runner(stream_bts_file, window_bts_file, data_file)
+
+
+def test_tutorial_output_matches_without_skipping(monkeypatch) -> None:
+    assert_output_matches_without_skipping('docs/examples/tutorial/tutorial2-streaming-bts.yml',
+                                           'docs/examples/tutorial/tutorial2-window-bts.yml',
+                                           'docs/examples/tutorial/tutorial2-data.log',
+                                           monkeypatch)
+
+
+def test_offer_ai_output_matches_without_skipping(offer_ai_bts_file: str, monkeypatch) -> None:
+    assert_output_matches_without_skipping(
+        offer_ai_bts_file, None, 'docs/examples/offer-ai/raw-data.json', monkeypatch)
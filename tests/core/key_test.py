@@ -1,4 +1,7 @@
-from datetime import datetime
+import pickle
+from bisect import bisect_left
+from copy import deepcopy
+from datetime import datetime, timedelta
 
 import pytest
 
@@ -88,7 +91,7 @@ def test_greater_than_timestamp_key():
 
 def test_less_than_dimension_key():
     assert (Key(KeyType.DIMENSION, 'a', 'b') < Key(KeyType.DIMENSION, 'a', 'b')) is False
-    assert (Key(KeyType.DIMENSION, 'a', 'b') < Key(KeyType.DIMENSION, 'a', 'c')) is False
+    assert (Key(KeyType.DIMENSION, 'a', 'b') < Key(KeyType.DIMENSION, 'a', 'c')) is True
     assert (Key(KeyType.DIMENSION, 'a', 'b') < Key(KeyType.DIMENSION, 'a', 'b', ['c'])) is True
     assert (Key(KeyType.DIMENSION, 'a', 'b', ['c']) < Key(KeyType.DIMENSION, 'a', 'b',
                                                           ['c'])) is False
@@ -102,7 +105,44 @@ def test_less_than_timestamp_key():
     assert (Key(KeyType.TIMESTAMP, 'a', 'b', [], datetime(2018, 3, 6, 22, 35, 31)) < Key(
         KeyType.TIMESTAMP, 'a', 'b', [], datetime(2018, 3, 7, 22, 35, 31))) is True
     assert (Key(KeyType.TIMESTAMP, 'a', 'b', [], datetime(2018, 3, 7, 22, 35, 31)) < Key(
-        KeyType.TIMESTAMP, 'a', 'c', [], datetime(2018, 3, 7, 22, 35, 31))) is False
+        KeyType.TIMESTAMP, 'a', 'c', [], datetime(2018, 3, 7, 22, 35, 31))) is True
+
+
+def test_keys_are_totally_ordered():
+    time = datetime(2018, 3, 7, 22, 35, 31)
+    keys = [
+        Key(KeyType.DIMENSION, 'a', 'b'),
+        Key(KeyType.DIMENSION, 'a', 'b', ['c']),
+        Key(KeyType.DIMENSION, 'a', 'b', ['c', 'd']),
+        Key(KeyType.TIMESTAMP, 'a', 'b', [], time),
+        Key(KeyType.TIMESTAMP, 'a', 'b', [], time + timedelta(seconds=1)),
+        Key(KeyType.DIMENSION, 'a', 'c'),
+        Key(KeyType.TIMESTAMP, 'b', 'a', [], time),
+    ]
+    assert sorted(reversed(keys)) == keys
+    assert keys[3] <= Key(KeyType.TIMESTAMP, 'a', 'b', [], time) <= keys[3]
+    assert keys[4] >= keys[3]
+    assert bisect_left(keys, Key(KeyType.TIMESTAMP, 'a', 'b', [], time)) == 3
+
+
+def test_key_is_immutable():
+    key = Key(KeyType.DIMENSION, 'a', 'b', ['c'])
+    with pytest.raises(AttributeError):
+        key.group = 'c'
+    with pytest.raises(AttributeError):
+        key.attribute = 'c'
+    assert key.dimensions == ('c', )
+
+
+def test_key_hash_and_copy():
+    key = Key(KeyType.TIMESTAMP, 'a', 'b', [], datetime(2018, 3, 7, 22, 35, 31))
+    assert key.sort_key == 'b//2018-03-07T22:35:31+00:00'
+    for copy in [pickle.loads(pickle.dumps(key)), deepcopy(key), Key.parse(str(key))]:
+        assert copy == key
+        assert hash(copy) == hash(key)
+        assert str(copy) == str(key)
+    assert {key: 1}[Key.parse('a/b//2018-03-07T22:35:31+00:00')] == 1
+    assert key != 'a/b//2018-03-07T22:35:31+00:00'
 
 
 def test_timestamp_key_starts_with():
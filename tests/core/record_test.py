@@ -50,3 +50,39 @@ def test_getattr():
     # Un-defined class attributes throw exception.
     with pytest.raises(AttributeError, match='Record object has no __test__ attribute.'):
         record.__test__
+
+
+def test_nested_views_are_cached() -> None:
+    record = Record({'a': {'b': {'c': 1}}, 'events': [{'name': 'one'}, [1, 2]], 'empty': []})
+    assert record.a is record.a
+    assert record.a.b is record['a']['b']
+    assert record.a.b.c == 1
+    assert record.events is record.events
+    assert record.events[0] is record.events[-2]
+    assert record.events[1][1] == 2
+    assert record.events[0:1] == [{'name': 'one'}]
+    assert record.empty == []
+    assert record.a.missing is None
+    assert record.a.b.missing is None
+
+
+def test_cached_view_is_dropped_when_key_is_set() -> None:
+    record = Record({'a': {'b': 1}, 'events': [{'name': 'one'}]})
+    assert record.a.b == 1
+    record['a'] = {'b': 2}
+    assert record.a.b == 2
+    del record['a']
+    assert record.a is None
+
+    assert record.events[0].name == 'one'
+    record.events[0] = {'name': 'two'}
+    assert record.events[0].name == 'two'
+
+
+def test_pickle_nested():
+    record = Record({'a': {'b': [{'c': 1}]}})
+    assert record.a.b[0].c == 1
+    unpickled_record = pickle.loads(pickle.dumps(record))
+    assert unpickled_record == record
+    assert unpickled_record.a.b[0].c == 1
+    assert pickle.loads(pickle.dumps(record.a.b)) == [{'c': 1}]
@@ -85,3 +85,15 @@ def test_import_module_and_identifier_error():
     schema_context = SchemaContext(spec)
     with pytest.raises(ImportError, match='cannot import name \'unknown_func\''):
         assert schema_context.context
+
+
+def test_context_is_not_shared():
+    spec = [{'Module': 'dateutil', 'Identifiers': ['parser']}]
+    schema_context = SchemaContext(spec)
+    context = schema_context.context
+    context.global_add('identity', 'userA')
+
+    new_context = schema_context.context
+    assert new_context is not context
+    assert 'identity' not in new_context.global_context
+    assert new_context.global_context['parser'] == context.global_context['parser']
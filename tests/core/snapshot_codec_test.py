@@ -0,0 +1,122 @@
+import json
+from typing import Any, Dict
+
+import yaml
+from pytest import fixture, raises, mark
+
+from blurr.core import snapshot_codec
+from blurr.core.aggregate_time import TimeAggregateSchema
+from blurr.core.errors import SnapshotError
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.snapshot_codec import BinarySnapshotCodec, DictSnapshotCodec, get_snapshot_codec
+from blurr.core.store import StoreSchema
+
+
+@fixture
+def schema_loader() -> SchemaLoader:
+    schema_loader = SchemaLoader()
+    schema_loader.add_schema_spec(yaml.safe_load(open('tests/data/stream.yml')))
+    return schema_loader
+
+
+@fixture
+def session_schema(schema_loader: SchemaLoader) -> TimeAggregateSchema:
+    return schema_loader.get_schema_object('Sessions.session')
+
+
+@fixture
+def snapshot() -> Dict[str, Any]:
+    return {
+        '_identity': 'user1',
+        '_start_time': '2018-03-07T19:35:31+00:00',
+        '_end_time': '2018-03-07T20:35:31.000250+00:00',
+        'events': 3,
+        'country': 'US'
+    }
+
+
+def test_dict_codec(session_schema: TimeAggregateSchema, snapshot: Dict[str, Any]) -> None:
+    codec = DictSnapshotCodec()
+    assert codec.decode(session_schema, codec.encode(session_schema, snapshot)) is snapshot
+
+
+def test_binary_codec_round_trip(session_schema: TimeAggregateSchema,
+                                 snapshot: Dict[str, Any]) -> None:
+    codec = BinarySnapshotCodec()
+    data = codec.encode(session_schema, snapshot)
+    assert isinstance(data, bytes)
+    assert codec.decode(session_schema, data) == snapshot
+    # Absent fields are not added on decode
+    assert 'continent' not in codec.decode(session_schema, data)
+    # A new codec decodes with the same layout
+    assert BinarySnapshotCodec().decode(session_schema, data) == snapshot
+
+
+def test_binary_codec_smaller_than_json(session_schema: TimeAggregateSchema,
+                                        snapshot: Dict[str, Any]) -> None:
+    data = BinarySnapshotCodec().encode(session_schema, snapshot)
+    assert len(data) < len(json.dumps(snapshot))
+    assert b'_start_time' not in data
+    assert b'2018' not in data
+
+
+@mark.parametrize('value', [
+    '2018-03-07T19:35:31-07:00',
+    '2018-03-07T19:35:31Z',
+    '2018-03-07 19:35:31+00:00',
+    'not a time',
+    None,
+])
+def test_binary_codec_keeps_datetimes_that_do_not_round_trip(
+        session_schema: TimeAggregateSchema, snapshot: Dict[str, Any], value: Any) -> None:
+    snapshot['_start_time'] = value
+    codec = BinarySnapshotCodec()
+    assert codec.decode(session_schema, codec.encode(session_schema, snapshot)) == snapshot
+
+
+def test_binary_codec_fields_not_in_schema(session_schema: TimeAggregateSchema,
+                                           snapshot: Dict[str, Any]) -> None:
+    snapshot['removed'] = [1, 'a']
+    codec = BinarySnapshotCodec()
+    assert codec.decode(session_schema, codec.encode(session_schema, snapshot)) == snapshot
+    assert codec.decode(None, codec.encode(None, snapshot)) == snapshot
+
+
+def test_binary_codec_schema_mismatch(schema_loader: SchemaLoader,
+                                      session_schema: TimeAggregateSchema,
+                                      snapshot: Dict[str, Any]) -> None:
+    codec = BinarySnapshotCodec()
+    data = codec.encode(session_schema, snapshot)
+    with raises(SnapshotError, match='Sessions.state'):
+        codec.decode(schema_loader.get_schema_object('Sessions.state'), data)
+
+
+def test_binary_codec_without_msgpack(session_schema: TimeAggregateSchema,
+                                      snapshot: Dict[str, Any], monkeypatch) -> None:
+    monkeypatch.setattr(snapshot_codec, 'msgpack', None)
+    codec = BinarySnapshotCodec()
+    data = codec.encode(session_schema, snapshot)
+    assert data.startswith(b'[')
+    assert codec.decode(session_schema, data) == snapshot
+
+
+def test_store_codec(schema_loader: SchemaLoader) -> None:
+    store_schema = schema_loader.get_schema_object('Sessions.memory')
+    assert isinstance(store_schema.get_codec(), DictSnapshotCodec)
+    assert store_schema.get_aggregate_schema('session') is schema_loader.get_schema_object(
+        'Sessions.session')
+    assert store_schema.get_aggregate_schema('unknown') is None
+    assert not schema_loader.get_errors()
+
+    assert isinstance(get_snapshot_codec('binary'), BinarySnapshotCodec)
+
+
+def test_store_codec_validation() -> None:
+    schema_loader = SchemaLoader()
+    name = schema_loader.add_schema_spec({
+        'Name': 'memory',
+        'Type': 'Blurr:Store:Memory',
+        'Codec': 'pickle'
+    })
+    assert isinstance(schema_loader.get_schema_object(name), StoreSchema)
+    assert 'Codec' in str(schema_loader.get_errors(name))
@@ -141,3 +141,80 @@ def test_get_range_start_end_time_no_dimensions_match(memory_store: MemoryStore)
 
 def test_get_all(memory_store: MemoryStore) -> None:
     assert len(memory_store.get_all('user1')) == 13
+
+
+def test_get_all_other_identities(memory_store: MemoryStore) -> None:
+    date = datetime(2018, 3, 7, 20, 35, 31, 0, timezone.utc)
+    memory_store.save(
+        Key(KeyType.TIMESTAMP, 'user2', 'session', [], date), {
+            'events': 1,
+            '_start_time': date.isoformat()
+        })
+
+    assert len(memory_store.get_all('user1')) == 13
+    assert list(memory_store.get_all('user2').keys()) == [
+        Key(KeyType.TIMESTAMP, 'user2', 'session', [], date)
+    ]
+    assert memory_store.get_all('user3') == {}
+    assert len(memory_store.get_all()) == 14
+
+
+def test_get_range_other_identities_not_included(memory_store: MemoryStore) -> None:
+    date = datetime(2018, 3, 7, 20, 35, 31, 0, timezone.utc)
+    memory_store.save(
+        Key(KeyType.TIMESTAMP, 'user2', 'session', [], date), {
+            'events': 10,
+            '_start_time': date.isoformat()
+        })
+    memory_store.save(
+        Key(KeyType.DIMENSION, 'user2', 'session_dim', ['dimA', 'session1']), {
+            'events': 10,
+            '_start_time': date.isoformat()
+        })
+
+    for key_type, group in [(KeyType.TIMESTAMP, 'session'), (KeyType.DIMENSION, 'session_dim')]:
+        blocks = memory_store.get_range(
+            Key(key_type, 'user1', group), datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc),
+            None, 10)
+        assert [block[1]['events'] for block in blocks] == [2, 3, 4, 5, 6]
+
+        blocks = memory_store.get_range(
+            Key(key_type, 'user2', group), datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc),
+            None, 10)
+        assert [block[1]['events'] for block in blocks] == [10]
+
+
+def test_get_range_dimension_key_updated_start_time(memory_store: MemoryStore) -> None:
+    date = datetime(2018, 3, 9, 19, 35, 31, 0, timezone.utc)
+    memory_store.save(
+        Key(KeyType.DIMENSION, 'user1', 'session_dim', ['dimA', 'session1']), {
+            'events': 7,
+            '_start_time': date.isoformat()
+        })
+
+    blocks = memory_store.get_range(
+        Key(KeyType.DIMENSION, 'user1', 'session_dim'),
+        datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc), None, 10)
+    assert [block[1]['events'] for block in blocks] == [2, 3, 4, 5, 6, 7]
+
+
+def test_get_range_after_delete(memory_store: MemoryStore) -> None:
+    date = datetime(2018, 3, 7, 21, 36, 31, 0, timezone.utc)
+    memory_store.delete(Key(KeyType.TIMESTAMP, 'user1', 'session', [], date))
+    memory_store.delete(Key(KeyType.DIMENSION, 'user1', 'session_dim', ['dimA', 'session3']))
+
+    for key_type, group in [(KeyType.TIMESTAMP, 'session'), (KeyType.DIMENSION, 'session_dim')]:
+        blocks = memory_store.get_range(
+            Key(key_type, 'user1', group), datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc),
+            None, 10)
+        assert [block[1]['events'] for block in blocks] == [2, 4, 5, 6]
+    assert len(memory_store.get_all('user1')) == 11
+
+
+def test_clear(memory_store: MemoryStore) -> None:
+    memory_store.clear()
+
+    assert memory_store.get_all() == {}
+    assert memory_store.get_range(
+        Key(KeyType.TIMESTAMP, 'user1', 'session'),
+        datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc), None, 10) == []
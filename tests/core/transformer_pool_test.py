@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import yaml
+from pytest import fixture
+
+from blurr.core.record import Record
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.transformer_pool import TransformerPool
+from blurr.core.transformer_streaming import StreamingTransformerSchema
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@fixture
+def schema_loader() -> SchemaLoader:
+    schema_loader = SchemaLoader()
+    schema_loader.add_schema_spec(yaml.safe_load(open('tests/data/stream.yml')))
+    return schema_loader
+
+
+@fixture
+def schema(schema_loader: SchemaLoader) -> StreamingTransformerSchema:
+    return schema_loader.get_schema_object('Sessions')
+
+
+def evaluate(pool: TransformerPool, identity: str) -> None:
+    pool.get(identity).run_evaluate(
+        Record({
+            'user_id': identity,
+            'event_time': datetime(2018, 3, 7, 22, 35, 31, 0, timezone.utc).isoformat(),
+            'country': 'US'
+        }))
+
+
+def get_store_items(schema_loader: SchemaLoader, identity: str):
+    return schema_loader.get_store('Sessions.memory').get_all(identity)
+
+
+def test_pool_reuses_transformers(schema: StreamingTransformerSchema) -> None:
+    pool = TransformerPool(schema)
+    transformer = pool.get('user1')
+    assert pool.get('user1') is transformer
+    assert pool.get('user2') is not transformer
+    assert 'user1' in pool
+    assert pool.stats == {
+        'hits': 1,
+        'misses': 2,
+        'hit_ratio': 1 / 3,
+        'evictions': 0,
+        'expirations': 0,
+        'size': 2
+    }
+
+
+def test_pool_evicts_least_recently_used(schema_loader: SchemaLoader,
+                                         schema: StreamingTransformerSchema) -> None:
+    pool = TransformerPool(schema, max_size=2)
+    evaluate(pool, 'user1')
+    evaluate(pool, 'user2')
+    pool.get('user1')
+    assert get_store_items(schema_loader, 'user2') == {}
+
+    evaluate(pool, 'user3')
+    assert 'user2' not in pool
+    assert pool.stats['evictions'] == 1
+    # Evicted transformers are finalized
+    assert len(get_store_items(schema_loader, 'user2')) == 2
+    assert get_store_items(schema_loader, 'user1') == {}
+
+    pool.clear()
+    assert len(pool) == 0
+    assert len(get_store_items(schema_loader, 'user1')) == 2
+
+
+def test_pool_expires_idle_transformers(schema_loader: SchemaLoader,
+                                        schema: StreamingTransformerSchema) -> None:
+    clock = Clock()
+    pool = TransformerPool(schema, ttl=10, clock=clock)
+    evaluate(pool, 'user1')
+    clock.now = 5
+    evaluate(pool, 'user2')
+    clock.now = 12
+    assert pool.expire() == 1
+    assert 'user1' not in pool
+    assert len(get_store_items(schema_loader, 'user1')) == 2
+
+    clock.now = 30
+    transformer = pool.get('user2')
+    assert pool.get('user2') is transformer
+    assert pool.stats['expirations'] == 2
+    assert pool.stats['hits'] == 1
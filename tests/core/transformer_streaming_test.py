@@ -174,3 +174,28 @@ def test_streaming_transformer_schema_missing_attributes_adds_error(schema_loade
                                   StreamingTransformerSchema.ATTRIBUTE_TIME) in schema.errors
     assert RequiredAttributeError(streaming_bts, schema_spec,
                                   StreamingTransformerSchema.ATTRIBUTE_STORES) in schema.errors
+
+
+def test_streaming_transformer_schema_source_projection(schema_loader: SchemaLoader,
+                                                        schema_spec: Dict[str, Any],
+                                                        monkeypatch) -> None:
+    schema_spec['Identity'] = 'source.user_id'
+    schema_spec['Aggregates'][0]['When'] = 'source.event_id != \'ignored\''
+    schema_spec['Aggregates'][0]['Dimensions'] = [{
+        'Name': 'country',
+        'Type': Type.STRING,
+        'Value': 'source[\'country\']'
+    }]
+    schema_spec['Aggregates'][0]['Fields'].append({
+        'Name': 'amount',
+        'Type': Type.FLOAT,
+        'Value': 'source.payment.amount',
+        'When': 'source.payment'
+    })
+    streaming_bts = schema_loader.add_schema_spec(schema_spec)
+    transformer_schema = StreamingTransformerSchema(streaming_bts, schema_loader)
+    assert transformer_schema.source_projection == {'user_id', 'event_id', 'country', 'payment'}
+
+    monkeypatch.setattr(StreamingTransformerSchema, 'PROJECT_SOURCE', False)
+    transformer_schema = StreamingTransformerSchema(streaming_bts, schema_loader)
+    assert transformer_schema.source_projection is None
@@ -132,6 +132,27 @@ def test_window_transformer(schema_loader, window_transformer, time_aggregate):
     }
 
 
+def test_window_aggregates_share_block_cache(schema_loader, window_transformer, time_aggregate):
+    init_memory_store(schema_loader.get_store('Sessions.memory'))
+    assert window_transformer.last_session.block_cache is window_transformer.block_cache
+    assert window_transformer.last_day.block_cache is window_transformer.block_cache
+
+    time_aggregate.run_restore({
+        'events': 3,
+        '_start_time': datetime(2018, 3, 7, 21, 36, 31, 0, timezone.utc).isoformat(),
+        '_end_time': datetime(2018, 3, 7, 21, 37, 31, 0, timezone.utc).isoformat()
+    })
+    assert window_transformer.run_evaluate(time_aggregate) is True
+
+    # The last session is part of the last day and is restored once
+    assert window_transformer.block_cache.stats == {
+        'hits': 1,
+        'misses': 2,
+        'evictions': 0,
+        'size': 2
+    }
+
+
 def test_window_transformer_internal_reset(schema_loader, window_transformer, time_aggregate):
     init_memory_store(schema_loader.get_store('Sessions.memory'))
     window_transformer._anchor._schema.max = None
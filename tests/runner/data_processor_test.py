@@ -1,7 +1,9 @@
 import pytest
 
 from blurr.core.record import Record
-from blurr.runner.data_processor import SimpleJsonDataProcessor, IpfixDataProcessor
+from blurr.runner import data_processor as data_processor_module
+from blurr.runner.data_processor import SimpleJsonDataProcessor, IpfixDataProcessor, \
+    SimpleDictionaryDataProcessor
 
 
 def test_simple_json_processor_success():
@@ -15,6 +17,51 @@ def test_simple_json_processor_invalid_json_error():
         data_processor.process_data('a')
 
 
+@pytest.mark.parametrize('use_orjson', [False, True])
+def test_simple_json_processor_json_backend(use_orjson: bool, monkeypatch):
+    if not use_orjson:
+        monkeypatch.setattr(data_processor_module, 'orjson', None)
+    elif data_processor_module.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    data_processor = SimpleJsonDataProcessor()
+    assert data_processor.process_data(b'{"test": [1, 2.5, "a", null, true]}') == [
+        Record({'test': [1, 2.5, 'a', None, True]})
+    ]
+    # Documents that orjson does not support are parsed with json
+    assert data_processor.process_data('{"test": Infinity}') == [Record({'test': float('inf')})]
+    with pytest.raises(ValueError):
+        data_processor.process_data('{"test": }')
+    # Integers larger than 64 bits are not parsed as floats
+    assert data_processor.process_data('{"test": 123456789012345678901234567890}') == [
+        Record({'test': 123456789012345678901234567890})
+    ]
+    assert data_processor.process_data(b'{"test": -18446744073709551616}') == [
+        Record({'test': -18446744073709551616})
+    ]
+
+
+def test_simple_json_processor_projection():
+    data_processor = SimpleJsonDataProcessor()
+    projected_data_processor = data_processor.project({'a', 'b'})
+    assert data_processor.projection is None
+    assert projected_data_processor.project({'b', 'a'}) is projected_data_processor
+
+    assert projected_data_processor.process_data('{"a": 1, "c": {"d": 2}}') == [Record({'a': 1})]
+    assert projected_data_processor.process_data('{"a": 1, "b": 2}') == [Record({'a': 1, 'b': 2})]
+    assert projected_data_processor.project(None).process_data('{"a": 1, "c": 2}') == [
+        Record({
+            'a': 1,
+            'c': 2
+        })
+    ]
+
+
+def test_simple_dictionary_processor_projection():
+    data_processor = SimpleDictionaryDataProcessor().project({'a'})
+    assert data_processor.process_data({'a': 1, 'b': 2}) == [Record({'a': 1})]
+
+
 def test_ipfix_data_processor_success():
     data_processor = IpfixDataProcessor()
     test_data = (
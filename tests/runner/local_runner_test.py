@@ -1,21 +1,42 @@
-from datetime import datetime
+import pickle
+from datetime import datetime, timedelta
 from typing import List, Tuple, Any, Optional, Dict
+from unittest import mock
 
+import yaml
 from dateutil.tz import tzutc
+from pytest import raises
 
+from blurr.core.aggregate_window import WindowAggregateSchema
 from blurr.core.store_key import Key, KeyType
 from blurr.runner.local_runner import LocalRunner
+from blurr.runner.runner import merge_state
+from tests.store.dynamo.utils import FakeDynamoResource
 
 
 def execute_runner(stream_bts_file: str,
                    window_bts_file: Optional[str],
                    local_json_files: List[str],
-                   old_state: Optional[Dict[str, Dict]] = None) -> Tuple[LocalRunner, Any]:
-    runner = LocalRunner(stream_bts_file, window_bts_file)
+                   old_state: Optional[Dict[str, Dict]] = None,
+                   workers: int = 1) -> Tuple[LocalRunner, Any]:
+    runner = LocalRunner(stream_bts_file, window_bts_file, workers)
     return runner, runner.execute(
         runner.get_identity_records_from_json_files(local_json_files), old_state)
 
 
+def test_records_only_keep_keys_read_by_stream_bts(tmpdir):
+    raw_file = tmpdir.join('raw.json')
+    raw_file.write('{"user_id": "userA", "event_time": "2018-03-07T22:35:31+00:00", '
+                   '"country": "US", "unused": {"a": 1}}\n')
+    runner = LocalRunner('tests/data/stream.yml', None)
+    identity_records = runner.get_identity_records_from_json_files([str(raw_file)])
+    assert identity_records['userA'][0][1] == {
+        'user_id': 'userA',
+        'event_time': '2018-03-07T22:35:31+00:00',
+        'country': 'US'
+    }
+
+
 def test_only_stream_bts_provided():
     runner, data = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
     assert len(data) == 3
@@ -91,10 +112,12 @@ def test_stream_bts_with_state():
         identity: block_data
         for identity, (block_data, window_data) in data_separate.items()
     }
-    _, data_separate = execute_runner('tests/data/stream.yml', None, ['tests/data/raw2.json'],
-                                      old_state)
+    runner, data_separate = execute_runner('tests/data/stream.yml', None,
+                                           ['tests/data/raw2.json'], old_state)
 
     assert data_separate == data_combined
+    # The state of userA and userC and the previous session of userC are restored and not changed
+    assert runner.skipped_saves == {'vars': 0, 'state': 2, 'session': 1}
 
 
 def test_stream_and_window_bts_with_state():
@@ -113,6 +136,176 @@ def test_stream_and_window_bts_with_state():
     assert data_separate == data_combined
 
 
+def test_stream_and_window_bts_with_state_file(tmpdir):
+    _, data_combined = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                      ['tests/data/raw.json', 'tests/data/raw2.json'], None)
+
+    runner, data_separate = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                           ['tests/data/raw.json'], None)
+    state_file = tmpdir.join('state.bin')
+    runner.write_state_file(str(state_file), data_separate)
+    old_state = runner.read_state_file(str(state_file))
+    assert old_state == {
+        identity: block_data
+        for identity, (block_data, window_data) in data_separate.items()
+    }
+
+    _, data_separate = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                      ['tests/data/raw2.json'], old_state)
+    assert data_separate == data_combined
+
+
+def test_stream_bts_with_delta_state(tmpdir):
+    _, data_combined = execute_runner('tests/data/stream.yml', None,
+                                      ['tests/data/raw.json', 'tests/data/raw2.json'], None)
+    runner, data_separate = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'],
+                                           None)
+    old_state = {
+        identity: block_data
+        for identity, (block_data, window_data) in data_separate.items()
+    }
+
+    delta_runner = LocalRunner('tests/data/stream.yml', None, delta_state=True)
+    delta = delta_runner.execute(
+        delta_runner.get_identity_records_from_json_files(['tests/data/raw2.json']), old_state)
+    # userB has no new records and the state of userC is unchanged
+    assert {identity: len(block_data) for identity, (block_data, _) in delta.items()} == {
+        'userA': 1,
+        'userC': 1
+    }
+    assert len(data_combined['userA'][0]) == 3
+
+    delta_state = {identity: block_data for identity, (block_data, _) in delta.items()}
+    expected_state = {identity: block_data for identity, (block_data, _) in data_combined.items()}
+    assert merge_state(old_state, delta_state) == expected_state
+    assert old_state == {
+        identity: block_data
+        for identity, (block_data, window_data) in data_separate.items()
+    }
+
+    base_state_file = str(tmpdir.join('base.bin'))
+    delta_state_file = str(tmpdir.join('delta.bin'))
+    state_file = str(tmpdir.join('state.bin'))
+    runner.write_state_file(base_state_file, data_separate)
+    runner.write_state_file(delta_state_file, delta)
+    runner.compact_state_files(base_state_file, [delta_state_file], state_file)
+    assert runner.read_state_file(state_file) == expected_state
+    runner.compact_state_files(None, [base_state_file, delta_state_file], state_file)
+    assert runner.read_state_file(state_file) == expected_state
+
+
+def test_schema_reused_across_identities():
+    runner, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                  ['tests/data/raw.json'])
+    schema_loader = runner._schema_loader
+    store = runner._get_store(schema_loader)
+
+    # Only the state of the last identity processed is left in the store
+    assert set(key.identity for key in store.get_all().keys()) == {list(data.keys())[-1]}
+
+    identity, (block_data, window_data) = runner.execute_per_identity_records('userA', [])
+    assert runner._schema_loader is schema_loader
+    assert block_data == {}
+    assert window_data == []
+
+    # The schema is built once per process for the copies of the runner shipped to other
+    # processes, e.g. for every Spark task
+    runner_copy = pickle.loads(pickle.dumps(runner))
+    assert runner_copy._compiled_schema_loader is None
+    assert runner_copy._schema_loader is not schema_loader
+    assert pickle.loads(pickle.dumps(runner))._schema_loader is runner_copy._schema_loader
+
+
+def test_workers_output_matches_serial():
+    _, data_serial = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                    ['tests/data/raw.json', 'tests/data/raw2.json'])
+    _, data_parallel = execute_runner(
+        'tests/data/stream.yml',
+        'tests/data/window.yml', ['tests/data/raw.json', 'tests/data/raw2.json'],
+        workers=3)
+
+    assert data_parallel == data_serial
+    assert list(data_parallel.keys()) == list(data_serial.keys())
+
+
+def test_workers_with_state():
+    _, data_separate = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
+    old_state = {
+        identity: block_data
+        for identity, (block_data, window_data) in data_separate.items()
+    }
+    _, data_serial = execute_runner('tests/data/stream.yml', None, ['tests/data/raw2.json'],
+                                    old_state)
+    _, data_parallel = execute_runner(
+        'tests/data/stream.yml', None, ['tests/data/raw2.json'], old_state, workers=2)
+
+    assert data_parallel == data_serial
+    assert list(data_parallel.keys()) == list(data_serial.keys())
+
+
+def test_invalid_workers():
+    with raises(ValueError, match='`workers` must be greater than 0.'):
+        LocalRunner('tests/data/stream.yml', None, 0)
+
+
+def test_streaming_matches_in_memory(tmpdir):
+    _, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                             ['tests/data/raw.json', 'tests/data/raw2.json'])
+
+    runner = LocalRunner('tests/data/stream.yml', 'tests/data/window.yml')
+    # A memory budget of 1 byte spills every record into its own sorted run
+    identity_records = runner.get_sorted_identity_records_from_json_files(
+        ['tests/data/raw.json', 'tests/data/raw2.json'], memory_budget=1, spill_dir=str(tmpdir))
+    streaming_data = list(runner.execute_streaming(identity_records))
+
+    assert [identity for identity, _ in streaming_data] == sorted(data.keys())
+    assert dict(streaming_data) == data
+    assert tmpdir.listdir() == []
+
+
+def test_sorted_identity_records_in_memory():
+    runner = LocalRunner('tests/data/stream.yml', None)
+    identity_records = list(
+        runner.get_sorted_identity_records_from_json_files(['tests/data/raw.json']))
+    unsorted_identity_records = runner.get_identity_records_from_json_files(['tests/data/raw.json'])
+
+    assert [identity for identity, _ in identity_records] == sorted(
+        unsorted_identity_records.keys())
+    for identity, records in identity_records:
+        assert records == sorted(unsorted_identity_records[identity], key=lambda x: x[0])
+
+
+def test_streaming_with_state():
+    _, data_separate = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
+    old_state = {
+        identity: block_data
+        for identity, (block_data, window_data) in data_separate.items()
+    }
+    _, data = execute_runner('tests/data/stream.yml', None, ['tests/data/raw2.json'], old_state)
+
+    runner = LocalRunner('tests/data/stream.yml', None)
+    streaming_data = runner.execute_streaming(
+        runner.get_sorted_identity_records_from_json_files(['tests/data/raw2.json'],
+                                                           memory_budget=100), old_state)
+
+    assert dict(streaming_data) == data
+
+
+def test_write_output_file_streaming(tmpdir):
+    runner, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                  ['tests/data/raw.json'])
+    output_file = tmpdir.join('out.txt')
+    runner.write_output_file(str(output_file), data)
+
+    streaming_output_file = tmpdir.join('streaming_out.txt')
+    runner.write_output_file(
+        str(streaming_output_file),
+        runner.execute_streaming(
+            runner.get_sorted_identity_records_from_json_files(['tests/data/raw.json'])))
+
+    assert streaming_output_file.read() == output_file.read()
+
+
 def test_write_output_file_only_source_bts_provided(tmpdir):
     runner, data = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
     output_file = tmpdir.join('out.txt')
@@ -136,3 +329,124 @@ def test_write_output_file_with_stream_and_window_bts_provided(tmpdir):
     output_text = output_file.readlines(cr=False)
     assert 'last_day._identity,last_day.total_events,last_session._identity,last_session.events' in output_text
     assert 'userA,1,userA,1' in output_text
+
+
+def test_incremental_windows_match_store_range(monkeypatch):
+    _, incremental = execute_runner('docs/examples/tutorial/tutorial2-streaming-bts.yml',
+                                    'docs/examples/tutorial/tutorial2-window-bts.yml',
+                                    ['docs/examples/tutorial/tutorial2-data.log'])
+    monkeypatch.setattr(WindowAggregateSchema, 'INCREMENTAL_WINDOWS', False)
+    _, store_range = execute_runner('docs/examples/tutorial/tutorial2-streaming-bts.yml',
+                                    'docs/examples/tutorial/tutorial2-window-bts.yml',
+                                    ['docs/examples/tutorial/tutorial2-data.log'])
+
+    assert any(window_data for _, window_data in incremental.values())
+    assert incremental == store_range
+
+
+def test_split_interval():
+    assert LocalRunner('tests/data/activity.yml').split_interval == timedelta(seconds=1800)
+    # The state aggregate keeps state across sessions
+    assert LocalRunner('tests/data/stream.yml').split_interval is None
+
+
+def execute_segments(runner: LocalRunner, identity: str, records: List[Tuple[datetime, Any]],
+                     old_state: Optional[Dict] = None) -> Tuple[str, Tuple[Dict, List]]:
+    """ Executes the records of an identity in segments split at the gaps of inactivity """
+    segments = [[records[0]]]
+    for previous, record in zip(records, records[1:]):
+        if record[0] - previous[0] > runner.split_interval:
+            segments.append([])
+        segments[-1].append(record)
+
+    segment_states = [
+        runner.execute_per_identity_segment(identity, segment, old_state if i == 0 else None)
+        for i, segment in enumerate(segments)
+    ]
+    return runner.merge_per_identity_segments(identity, segment_states, old_state)
+
+
+def test_segments_match_serial():
+    runner = LocalRunner('tests/data/activity.yml')
+    identity_records = runner.get_identity_records_from_json_files(
+        ['tests/data/raw.json', 'tests/data/raw2.json'])
+    records = sorted(identity_records['userA'], key=lambda x: x[0])
+
+    identity, (block_data, _) = execute_segments(runner, 'userA', records)
+    assert len(block_data) == 2
+    assert (identity, (block_data, [])) == runner.execute_per_identity_records('userA', records)
+
+
+def test_segments_with_delta_state():
+    runner = LocalRunner('tests/data/activity.yml')
+    old_records = sorted(
+        runner.get_identity_records_from_json_files(['tests/data/raw.json'])['userA'])
+    records = sorted(
+        runner.get_identity_records_from_json_files(['tests/data/raw2.json'])['userA'])
+    _, (old_state, _) = runner.execute_per_identity_records('userA', old_records)
+    expected = runner.execute_per_identity_records('userA', records, old_state)
+    assert execute_segments(runner, 'userA', records, old_state) == expected
+
+    delta_runner = LocalRunner('tests/data/activity.yml', delta_state=True)
+    _, (delta_state, _) = execute_segments(delta_runner, 'userA', records, old_state)
+    assert len(delta_state) == 1
+    assert merge_state({'userA': old_state}, {'userA': delta_state}) == {'userA': expected[1][0]}
+
+
+def test_delta_state_with_nested_changes(tmpdir):
+    bts_file = tmpdir.join('pages.yml')
+    bts_file.write('''
+Type: Blurr:Transform:Streaming
+Version: '2018-03-01'
+Name: Pages
+Import:
+  - { Module: dateutil.parser, Identifiers: [ parse ]}
+Identity: source.user_id
+Time: parse(source.event_time)
+Stores:
+  - { Type: 'Blurr:Store:Memory', Name: memory }
+Aggregates:
+  -
+    Type: 'Blurr:Aggregate:Identity'
+    Name: state
+    Store: memory
+    Fields:
+      - Name: by_country
+        Type: map
+        Value: state.by_country.setdefault(source.country, []).append(source.page) or state.by_country
+''')
+    raw_file = tmpdir.join('raw.json')
+    raw_file.write('{"user_id": "userA", "event_time": "2018-03-07T22:35:31+00:00", '
+                   '"country": "US", "page": "b"}\n')
+    key = Key(KeyType.DIMENSION, 'userA', 'state')
+    old_state = {'userA': {key: {'_identity': 'userA', 'by_country': {'US': ['a']}}}}
+
+    runner = LocalRunner(str(bts_file), None, delta_state=True)
+    delta = runner.execute(runner.get_identity_records_from_json_files([str(raw_file)]), old_state)
+
+    assert delta['userA'][0] == {key: {'_identity': 'userA', 'by_country': {'US': ['a', 'b']}}}
+    assert old_state == {'userA': {key: {'_identity': 'userA', 'by_country': {'US': ['a']}}}}
+
+
+def test_dynamo_store_requests_are_batched_across_identities(tmpdir):
+    stream_bts = yaml.safe_load(open('tests/data/stream.yml'))
+    stream_bts['Stores'] = [{'Type': 'Blurr:Store:Dynamo', 'Name': 'memory', 'Table': 'state'}]
+    bts_file = tmpdir.join('stream.yml')
+    bts_file.write(yaml.safe_dump(stream_bts))
+    resource = FakeDynamoResource()
+
+    runner = LocalRunner(str(bts_file), None)
+    with mock.patch(
+            'blurr.store.dynamo_store.DynamoStore.get_dynamodb_resource', new=lambda: resource):
+        data = runner.execute(runner.get_identity_records_from_json_files(['tests/data/raw.json']))
+
+    assert data['userA'][0][Key(KeyType.DIMENSION, 'userA', 'state')] == {
+        '_identity': 'userA',
+        'country': 'IN',
+        'continent': 'World'
+    }
+    # The identity state of the identities is read and written with one request
+    assert resource.requests['get_item'] == 0
+    assert resource.requests['batch_get_item'] == 1
+    assert resource.requests['batch_write_item'] == 1
+    assert len(resource.items) == 8
@@ -1,11 +1,13 @@
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from pathlib import PosixPath
 from typing import List, Tuple, Any, Optional, Dict
 
+import yaml
 from dateutil.tz import tzutc
 
 from blurr.core.store_key import Key, KeyType
-from blurr.runner.spark_runner import SparkRunner, get_spark_session
+from blurr.runner.spark_runner import SparkRunner, get_spark_session, get_segment_cuts
 
 
 def execute_runner(stream_bts_file: str,
@@ -140,26 +142,205 @@ def test_stream_and_window_bts_with_state():
     assert {}.update(data_separate.collect()) == {}.update(data_combined.collect())
 
 
+def test_stream_bts_with_delta_state():
+    _, data_combined = execute_runner('tests/data/stream.yml', None,
+                                      ['tests/data/raw.json', 'tests/data/raw2.json'], None)
+
+    _, data_separate = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'], None)
+    spark_context = get_spark_session().sparkContext
+    old_state = spark_context.parallelize(
+        [(identity, block_data) for identity, (block_data, _) in data_separate.collect()])
+    runner = SparkRunner('tests/data/stream.yml', None, delta_state=True)
+    delta = runner.execute(
+        runner.get_record_rdd_from_json_files(['tests/data/raw2.json']), old_state)
+    delta_state = delta.mapValues(lambda data: data[0])
+    # userB has no new records
+    assert sorted(delta_state.keys().collect()) == ['userA', 'userC']
+
+    assert dict(SparkRunner.compact_state(old_state, delta_state).collect()) == {
+        identity: block_data
+        for identity, (block_data, _) in data_combined.collect()
+    }
+
+    sorted_delta = runner.execute_sorted(
+        runner.get_record_rdd_from_json_files(['tests/data/raw2.json'], group_by_identity=False),
+        old_state)
+    assert dict(sorted_delta.collect()) == dict(delta.collect())
+
+
+def test_execute_sorted_matches_execute():
+    runner, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                  ['tests/data/raw.json'])
+    sorted_data = runner.execute_sorted(
+        runner.get_record_rdd_from_json_files(['tests/data/raw.json'], group_by_identity=False),
+        num_partitions=2)
+
+    assert dict(sorted_data.collect()) == dict(data.collect())
+
+
+def test_execute_sorted_with_state():
+    _, data_combined = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                      ['tests/data/raw.json', 'tests/data/raw2.json'], None)
+
+    runner, data_separate = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                           ['tests/data/raw.json'], None)
+    old_state = data_separate.mapValues(lambda data: data[0])
+    data_separate = runner.execute_sorted(
+        runner.get_record_rdd_from_json_files(['tests/data/raw2.json'], group_by_identity=False),
+        old_state)
+
+    assert dict(data_separate.collect()) == dict(data_combined.collect())
+
+
+
+def test_get_segment_cuts():
+    interval = timedelta(minutes=30)
+    time = datetime(2018, 3, 7, 22, 0, 0, 0, tzutc())
+    range_stats = [
+        (time, time + timedelta(minutes=20), None),
+        # Gap between the ranges and in the range
+        (time + timedelta(hours=1), time + timedelta(hours=3), time + timedelta(hours=2)),
+        # Gap of exactly the interval does not separate the sessions
+        (time + timedelta(hours=3, minutes=30), time + timedelta(hours=4), None),
+    ]
+    assert get_segment_cuts(range_stats, interval) == [
+        time + timedelta(hours=1), time + timedelta(hours=2)
+    ]
+    assert get_segment_cuts(range_stats[:1], interval) == []
+
+
+def test_execute_sorted_split_identities():
+    runner = SparkRunner('tests/data/activity.yml')
+    record_rdd = runner.get_record_rdd_from_json_files(
+        ['tests/data/raw.json', 'tests/data/raw2.json'], group_by_identity=False)
+    expected = dict(runner.execute_sorted(record_rdd).collect())
+
+    split_data = runner.execute_sorted(
+        record_rdd, num_partitions=2, split_records=1, sample_fraction=1.0)
+    assert runner.split_identities == {'userA': 4, 'userB': 2, 'userC': 2}
+    assert dict(split_data.collect()) == expected
+
+    # The streaming BTS with identity state cannot be split
+    runner = SparkRunner('tests/data/stream.yml')
+    runner.execute_sorted(record_rdd, split_records=1, sample_fraction=1.0)
+    assert runner.split_identities == {}
+
+
+def test_execute_sorted_split_identities_with_delta_state():
+    runner = SparkRunner('tests/data/activity.yml', delta_state=True)
+    record_rdd = runner.get_record_rdd_from_json_files(['tests/data/raw.json'],
+                                                       group_by_identity=False)
+    old_state = runner.execute_sorted(record_rdd.filter(lambda x: x[0] == 'userC')).mapValues(
+        lambda data: data[0])
+    record_rdd = record_rdd.filter(lambda x: x[0] != 'userC')
+
+    expected = dict(runner.execute_sorted(record_rdd, old_state).collect())
+    split_data = runner.execute_sorted(
+        record_rdd, old_state, num_partitions=2, split_records=1, sample_fraction=1.0)
+    assert runner.split_identities == {'userA': 3, 'userB': 2}
+    # userC has no new records
+    assert sorted(expected) == ['userA', 'userB']
+    assert dict(split_data.collect()) == expected
+
+
+
+def test_get_record_rdd_from_dataframe():
+    from pyspark.sql import functions
+    runner, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
+                                  ['tests/data/raw.json'])
+    dataframe = get_spark_session().read.json('tests/data/raw.json').withColumn(
+        'unused', functions.lit(1))
+    record_rdd = runner.get_record_rdd_from_dataframe(dataframe)
+
+    assert 'unused' not in record_rdd.first()[1][0][1]
+    assert dict(runner.execute(record_rdd).collect()) == dict(data.collect())
+
+
+def test_get_record_rdd_from_dataframe_timestamp_column(tmpdir):
+    from pyspark.sql import functions
+    stream_bts = yaml.safe_load(open('tests/data/stream.yml'))
+    stream_bts['Time'] = 'source.event_time'
+    stream_bts_file = tmpdir.join('stream.yml')
+    stream_bts_file.write(yaml.safe_dump(stream_bts))
+
+    records = SparkRunner('tests/data/stream.yml').get_record_rdd_from_json_files(
+        ['tests/data/raw.json'], group_by_identity=False)
+    dataframe = get_spark_session().read.json('tests/data/raw.json').withColumn(
+        'event_time', functions.to_timestamp('event_time'))
+    timestamp_records = SparkRunner(str(stream_bts_file)).get_record_rdd_from_dataframe(
+        dataframe, group_by_identity=False)
+
+    assert sorted((identity, time) for identity, (time, _) in timestamp_records.collect()) == \
+        sorted((identity, time) for identity, (time, _) in records.collect())
+
+
+def test_get_record_rdd_from_dataframe_matches_rdd(tmpdir):
+    from pyspark.sql import Row
+    stream_bts = yaml.safe_load(open('tests/data/stream.yml'))
+    stream_bts['Time'] = 'source.event_time'
+    stream_bts_file = tmpdir.join('stream.yml')
+    stream_bts_file.write(yaml.safe_dump(stream_bts))
+    runner = SparkRunner(str(stream_bts_file))
+    event = {
+        'user_id': 'userA',
+        'event_time': datetime(2018, 3, 7, 22, 35, 31, 250, tzinfo=tzutc()),
+        'country': 'US'
+    }
+
+    spark_session = get_spark_session()
+    [(dataframe_identity, (dataframe_time, dataframe_record))] = \
+        runner.get_record_rdd_from_dataframe(
+            spark_session.createDataFrame([Row(**event)]), group_by_identity=False).collect()
+    [(rdd_identity, (rdd_time, rdd_record))] = runner.get_record_rdd_from_rdd(
+        spark_session.sparkContext.parallelize([event]), group_by_identity=False).collect()
+
+    assert dataframe_identity == rdd_identity == 'userA'
+    assert dataframe_time == rdd_time == event['event_time']
+    assert dataframe_record['event_time'] == rdd_record['event_time'] == event['event_time']
+    # The time of the record can be compared with the timestamp column
+    assert dataframe_record['event_time'] <= dataframe_time
+    assert rdd_record['event_time'] <= rdd_time
+
+
 def test_write_output_file_only_source_bts_provided(tmpdir):
     runner, data = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
     out_dir = tmpdir.join('out')
-    runner.write_output_file(str(out_dir), data)
-    output_text = get_spark_output(out_dir)
-    assert ('["userA/session//2018-03-07T22:35:31+00:00", {'
-            '"_identity": "userA", '
-            '"_start_time": "2018-03-07T22:35:31+00:00", '
-            '"_end_time": "2018-03-07T22:35:31+00:00", '
-            '"events": 1, '
-            '"country": "US", '
-            '"continent": "North America"'
-            '}]') in output_text
+    runner.write_output_file(str(out_dir), data, output_format='json')
+    sessions = [json.loads(line) for line in get_spark_output(out_dir.join('session'))]
+    session = next(session for session in sessions
+                   if session['_key'] == 'userA/session//2018-03-07T22:35:31+00:00')
+    assert session['events'] == 1
+    assert session['continent'] == 'North America'
+    assert '_start_time' in session
+    assert len(get_spark_output(out_dir.join('state'))) == 3
+    assert not out_dir.join('vars').exists()
 
 
 def test_write_output_file_with_stream_and_window_bts_provided(tmpdir):
     runner, data = execute_runner('tests/data/stream.yml', 'tests/data/window.yml',
                                   ['tests/data/raw.json'])
     out_dir = tmpdir.join('out')
-    runner.write_output_file(str(out_dir), data)
+    runner.write_output_file(str(out_dir), data, output_format='csv', options={'header': 'true'})
     output_text = get_spark_output(out_dir)
-    assert 'last_day._identity,last_day.total_events,last_session._identity,last_session.events' in output_text
+    assert 'last_session._identity,last_session.events,last_day._identity,last_day.total_events' \
+        in output_text
     assert 'userA,1,userA,1' in output_text
+
+
+def test_write_output_file_parquet(tmpdir):
+    runner, data = execute_runner('tests/data/stream.yml', None, ['tests/data/raw.json'])
+    out_dir = tmpdir.join('out')
+    runner.write_output_file(str(out_dir), data, partition_by=['_identity'])
+
+    session = get_spark_session().read.parquet(str(out_dir.join('session')))
+    assert dict(session.dtypes) == {
+        '_key': 'string',
+        '_identity': 'string',
+        '_start_time': 'timestamp',
+        '_end_time': 'timestamp',
+        'events': 'bigint',
+        'country': 'string',
+        'continent': 'string'
+    }
+    assert session.count() == 5
+    assert out_dir.join('session', '_identity=userA').exists()
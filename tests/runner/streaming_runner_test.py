@@ -0,0 +1,118 @@
+import json
+import threading
+
+from pytest import raises
+
+from blurr.runner.data_processor import SimpleDictionaryDataProcessor
+from blurr.runner.local_runner import LocalRunner
+from blurr.runner.streaming_runner import StreamingRunner, QueueEventSource, FileEventSource
+
+
+def read_events(json_file: str):
+    with open(json_file) as file:
+        return [(line, 0.0) for line in file if line.strip()]
+
+
+def get_local_output(json_files):
+    runner = LocalRunner('tests/data/stream.yml', 'tests/data/window.yml')
+    return runner.execute(runner.get_identity_records_from_json_files(json_files))
+
+
+def test_batches_match_local_runner():
+    runner = StreamingRunner('tests/data/stream.yml', 'tests/data/window.yml')
+    first = runner.execute_batch(read_events('tests/data/raw.json'))
+    second = runner.execute_batch(read_events('tests/data/raw2.json'))
+
+    expected = get_local_output(['tests/data/raw.json', 'tests/data/raw2.json'])
+    for identity, (block_data, _) in expected.items():
+        assert runner.get_state(identity) == block_data
+
+    assert first == {identity: window_data for identity, (_, window_data)
+                     in get_local_output(['tests/data/raw.json']).items()}
+    # Only userA and userC have records in the second batch
+    assert set(second) == {'userA', 'userC'}
+    assert second['userA'] == expected['userA'][1]
+    assert runner.metrics['batches'] == 2
+    assert runner.metrics['records'] == 8
+    assert runner.metrics['identities'] == 3
+
+
+def test_evicted_identities_restored_from_store():
+    runner = StreamingRunner('tests/data/stream.yml', max_identities=1)
+    runner.execute_batch(read_events('tests/data/raw.json'))
+    runner.execute_batch(read_events('tests/data/raw2.json'))
+
+    expected = get_local_output(['tests/data/raw.json', 'tests/data/raw2.json'])
+    for identity, (block_data, _) in expected.items():
+        assert runner.get_state(identity) == block_data
+    assert runner.metrics['identities'] == 1
+    assert runner.metrics['transformers']['evictions'] == 4
+
+
+def test_state_saved_on_flush():
+    runner = StreamingRunner('tests/data/stream.yml')
+    runner.execute_batch(read_events('tests/data/raw.json'))
+    store = runner._get_store(runner._schema_loader)
+    # Without a window BTS only the closed sessions are saved until the transformers are flushed
+    assert len(store.get_all('userA')) == 1
+
+    runner.execute_batch(read_events('tests/data/raw2.json'))
+    assert runner.metrics['transformers']['hits'] == 2
+    runner.flush()
+    expected = get_local_output(['tests/data/raw.json', 'tests/data/raw2.json'])
+    assert store.get_all('userA') == expected['userA'][0]
+
+
+def test_queue_source():
+    source = QueueEventSource()
+    runner = StreamingRunner(
+        'tests/data/stream.yml', 'tests/data/window.yml', source,
+        SimpleDictionaryDataProcessor(), batch_interval=0.01)
+    producer = threading.Thread(target=lambda: [
+        source.put(json.loads(event)) for event, _ in read_events('tests/data/raw.json')])
+    producer.start()
+    producer.join()
+
+    window_data = next(runner.execute(max_batches=1))
+    assert window_data['userA'] == get_local_output(['tests/data/raw.json'])['userA'][1]
+    assert runner.metrics['events'] == 6
+    assert runner.metrics['latency_seconds'] > 0
+    assert source.read_batch(10, 0.01) == []
+
+
+def test_file_source(tmpdir):
+    events_file = tmpdir.join('events.json')
+    events_file.write('{"a": 1}\n{"a": 2}\n{"a": ')
+    source = FileEventSource(str(events_file))
+    assert [event for event, _ in source.read_batch(1, 0)] == ['{"a": 1}\n']
+    assert [event for event, _ in source.read_batch(10, 0)] == ['{"a": 2}\n']
+    assert source.read_batch(10, 0.01) == []
+
+    events_file.write('3}\n', mode='a')
+    assert [event for event, _ in source.read_batch(10, 0)] == ['{"a": 3}\n']
+
+
+def test_directory_source(tmpdir):
+    tmpdir.join('1.json').write('{"a": 1}\n')
+    source = FileEventSource(str(tmpdir), from_end=True)
+    assert source.read_batch(10, 0) == []
+
+    tmpdir.join('1.json').write('{"a": 2}\n', mode='a')
+    tmpdir.join('2.json').write('{"a": 3}\n')
+    assert [event for event, _ in source.read_batch(10, 0)] == ['{"a": 2}\n', '{"a": 3}\n']
+
+
+def test_write_output_file(tmpdir):
+    runner = StreamingRunner('tests/data/stream.yml', 'tests/data/window.yml')
+    output_file = str(tmpdir.join('out.json'))
+    runner.write_output_file(output_file, runner.execute_batch(read_events('tests/data/raw.json')))
+    runner.write_output_file(output_file, runner.execute_batch(read_events('tests/data/raw2.json')))
+    with open(output_file) as file:
+        rows = [json.loads(line) for line in file]
+    assert len(rows) == 2
+    assert rows[0][0] == 'userA'
+
+
+def test_execute_without_source():
+    with raises(ValueError):
+        next(StreamingRunner('tests/data/stream.yml').execute())
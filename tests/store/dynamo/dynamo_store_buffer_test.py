@@ -0,0 +1,214 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from unittest import mock
+
+from pytest import fixture, raises
+
+from blurr.core.errors import StoreBatchError
+from blurr.core.schema_loader import SchemaLoader
+from blurr.core.store_key import Key, KeyType
+from blurr.store.dynamo_store import DynamoStore
+from tests.store.dynamo.utils import FakeDynamoResource
+
+
+def get_store(resource: FakeDynamoResource, spec: Dict[str, Any] = None) -> DynamoStore:
+    schema_loader = SchemaLoader()
+    name = schema_loader.add_schema_spec({
+        'Name': 'dynamostore',
+        'Type': 'Blurr:Store:Dynamo',
+        'Table': '_unit_test_buffer',
+        **(spec or {})
+    })
+    with mock.patch(
+            'blurr.store.dynamo_store.DynamoStore.get_dynamodb_resource', new=lambda: resource):
+        return schema_loader.get_store(name)
+
+
+@fixture
+def resource() -> FakeDynamoResource:
+    return FakeDynamoResource()
+
+
+@fixture
+def store(resource: FakeDynamoResource) -> DynamoStore:
+    return get_store(resource)
+
+
+def save_items(store: DynamoStore, count: int, identity: str = 'user1') -> None:
+    for i in range(count):
+        store.save(Key(KeyType.DIMENSION, identity, 'state', [str(i)]), {'events': i})
+
+
+def test_save_is_buffered_until_finalize(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    save_items(store, 60)
+    assert resource.items == {}
+
+    store.finalize()
+    assert resource.requests['put_item'] == 0
+    assert resource.requests['batch_write_item'] == 3
+    assert resource.batch_sizes == [25, 25, 10]
+    assert len(resource.items) == 60
+    assert resource.items[('user1', 'state/5/')] == {
+        'partition_key': 'user1',
+        'range_key': 'state/5/',
+        'events': 5
+    }
+
+
+def test_save_same_key_is_written_once(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    key = Key(KeyType.DIMENSION, 'user1', 'state')
+    store.save(key, {'events': 1})
+    store.save(key, {'events': 2})
+    store.finalize()
+
+    assert resource.batch_sizes == [1]
+    assert store.get(key) == {'events': 2}
+
+
+def test_save_does_not_modify_item(store: DynamoStore) -> None:
+    item = {'events': 1}
+    store.save(Key(KeyType.DIMENSION, 'user1', 'state'), item)
+    assert item == {'events': 1}
+
+
+def test_flush_on_buffer_size(resource: FakeDynamoResource) -> None:
+    store = get_store(resource, {'WriteBufferSize': 10})
+    save_items(store, 25)
+
+    assert resource.batch_sizes == [10, 10]
+    assert len(resource.items) == 20
+
+
+def test_flush_on_buffer_time(resource: FakeDynamoResource) -> None:
+    store = get_store(resource, {'WriteBufferSeconds': 5})
+    with mock.patch('blurr.store.dynamo_store.time.monotonic', side_effect=[0, 0, 1, 6]):
+        save_items(store, 2)
+        assert resource.items == {}
+        save_items(store, 1, 'user2')
+
+    assert resource.batch_sizes == [3]
+
+
+def test_get_from_buffer(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    store.save(Key(KeyType.DIMENSION, 'user1', 'state'), {'events': 1, 'country': ''})
+
+    assert store.get(Key(KeyType.DIMENSION, 'user1', 'state')) == {'events': 1}
+    assert resource.requests['get_item'] == 0
+
+
+def test_binary_codec(resource: FakeDynamoResource) -> None:
+    store = get_store(resource, {'Codec': 'binary'})
+    start_time = datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc)
+    key = Key(KeyType.TIMESTAMP, 'user1', 'session', [], start_time)
+    item = {'events': 1, '_start_time': start_time.isoformat()}
+    store.save(key, item)
+    assert store.get(key) == item
+    store.finalize()
+
+    saved_item = resource.items[('user1', key.sort_key)]
+    assert set(saved_item) == {'partition_key', 'range_key', '_snapshot', '_start_time'}
+    assert isinstance(saved_item['_snapshot'], bytes)
+    assert store.get(key) == item
+    assert store.get_range(key, start_time.replace(hour=19, minute=0), count=1) == [(key, item)]
+
+
+def test_query_merges_buffer(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    save_items(store, 2)
+    store.finalize()
+    save_items(store, 3)
+    store.save(Key(KeyType.DIMENSION, 'user1', 'state', ['0']), {'events': 10})
+    save_items(store, 1, 'user2')
+
+    assert store.get_all('user1') == {
+        Key(KeyType.DIMENSION, 'user1', 'state', ['0']): {
+            'events': 10
+        },
+        Key(KeyType.DIMENSION, 'user1', 'state', ['1']): {
+            'events': 1
+        },
+        Key(KeyType.DIMENSION, 'user1', 'state', ['2']): {
+            'events': 2
+        }
+    }
+    assert resource.requests['batch_write_item'] == 1
+
+
+def test_range_query_merges_buffer(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    times = [datetime(2018, 3, 7, hour, 35, 31, 0, timezone.utc) for hour in range(19, 23)]
+    keys = [Key(KeyType.TIMESTAMP, 'user1', 'session', [], time) for time in times]
+    dimension_keys = [Key(KeyType.DIMENSION, 'user1', 'state', [str(i)]) for i in range(4)]
+    for i in range(3):
+        store.save(keys[i], {'events': i, '_start_time': times[i].isoformat()})
+        store.save(dimension_keys[i], {'events': i, '_start_time': times[i].isoformat()})
+    store.finalize()
+    store.save(keys[1], {'events': 10, '_start_time': times[1].isoformat()})
+    store.save(keys[3], {'events': 3, '_start_time': times[3].isoformat()})
+    store.save(dimension_keys[1], {'events': 10, '_start_time': times[1].isoformat()})
+    store.save(dimension_keys[3], {'events': 3, '_start_time': times[3].isoformat()})
+
+    def get_events(base_key: Key, *args) -> List[int]:
+        return [item['events'] for _, item in store.get_range(base_key, *args)]
+
+    session_key = Key(KeyType.TIMESTAMP, 'user1', 'session')
+    assert get_events(session_key, times[0], times[3]) == [10, 2]
+    assert get_events(session_key, times[0], None, 3) == [10, 2, 3]
+    state_key = Key(KeyType.DIMENSION, 'user1', 'state')
+    assert get_events(state_key, times[0], times[3]) == [10, 2]
+    assert get_events(state_key, times[3], None, -2) == [10, 2]
+    assert resource.requests['batch_write_item'] == 1
+
+
+def test_unprocessed_items_are_retried(resource: FakeDynamoResource) -> None:
+    resource.unprocessed_batches = 2
+    store = get_store(resource)
+    save_items(store, 30)
+    store.finalize()
+
+    assert resource.batch_sizes == [25, 1, 1, 5]
+    assert len(resource.items) == 30
+
+
+def test_unprocessed_items_error(resource: FakeDynamoResource) -> None:
+    resource.unprocessed_batches = 100
+    store = get_store(resource)
+    store.BATCH_RETRY_BASE_SECONDS = 0
+    save_items(store, 3)
+    store.BATCH_MAX_RETRIES = 1
+
+    with raises(StoreBatchError, match='1 items could not be written to _unit_test_buffer'):
+        store.finalize()
+
+
+def test_batch_get(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    save_items(store, 150)
+    store.finalize()
+    resource.batch_sizes = []
+    resource.unprocessed_batches = 1
+
+    keys = [Key(KeyType.DIMENSION, 'user1', 'state', [str(i)]) for i in range(151)]
+    items = store.batch_get(keys)
+
+    assert resource.batch_sizes == [100, 1, 51]
+    assert len(items) == 151
+    assert items[keys[10]] == {'events': 10}
+    assert items[keys[150]] is None
+
+    # Items are served from the cache after a batch get
+    assert store.get(keys[20]) == {'events': 20}
+    assert store.get(keys[150]) is None
+    assert resource.requests['get_item'] == 0
+
+    # Saved items replace the cached item
+    store.save(keys[20], {'events': 200})
+    store.finalize()
+    assert store.get(keys[20]) == {'events': 200}
+
+
+def test_finalize_clears_read_cache(store: DynamoStore, resource: FakeDynamoResource) -> None:
+    key = Key(KeyType.TIMESTAMP, 'user1', 'session', [],
+              datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc))
+    store.batch_get([key])
+    store.finalize()
+    store.get(key)
+
+    assert resource.requests['get_item'] == 1
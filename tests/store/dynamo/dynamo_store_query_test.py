@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+from pytest import fixture, mark
+
+from blurr.core.store_key import Key, KeyType
+from blurr.store.dynamo_store import DynamoStore
+from tests.store.dynamo.dynamo_store_buffer_test import get_store
+from tests.store.dynamo.utils import FakeDynamoResource
+
+START = datetime(2018, 3, 7, 19, 35, 31, 0, timezone.utc)
+
+
+@fixture
+def resource() -> FakeDynamoResource:
+    return FakeDynamoResource()
+
+
+def save_blocks(store: DynamoStore, count: int) -> None:
+    for i in range(count):
+        start_time = START + timedelta(hours=i)
+        item = {'events': i, '_start_time': start_time.isoformat()}
+        store.save(Key(KeyType.TIMESTAMP, 'user1', 'session', [], start_time), dict(item))
+        store.save(Key(KeyType.DIMENSION, 'user1', 'state', [str(i)]), dict(item))
+    store.flush()
+
+
+@mark.parametrize('prefetch', [False, True])
+def test_get_all_reads_all_pages(resource: FakeDynamoResource, prefetch: bool) -> None:
+    store = get_store(resource, {'QueryPageSize': 10, 'QueryPrefetch': prefetch})
+    save_blocks(store, 35)
+
+    items = store.get_all('user1')
+    assert len(items) == 70
+    assert resource.requests['query'] == 7
+    assert store.query_stats['user1'] == {
+        'queries': 1,
+        'pages': 7,
+        'items': 70,
+        'consumed_capacity': 35
+    }
+
+
+@mark.parametrize('prefetch', [False, True])
+def test_get_range_dimension_reads_all_pages(resource: FakeDynamoResource,
+                                             prefetch: bool) -> None:
+    store = get_store(resource, {'QueryPageSize': 10, 'QueryPrefetch': prefetch})
+    save_blocks(store, 35)
+
+    items = store.get_range(
+        Key(KeyType.DIMENSION, 'user1', 'state'), START, START + timedelta(hours=30))
+    assert [item['events'] for _, item in items] == list(range(1, 30))
+
+    items = store.get_range(Key(KeyType.DIMENSION, 'user1', 'state'), START, None, 3)
+    assert [item['events'] for _, item in items] == [1, 2, 3]
+
+
+def test_get_range_timestamp_reads_all_pages(resource: FakeDynamoResource) -> None:
+    store = get_store(resource, {'QueryPageSize': 10})
+    save_blocks(store, 35)
+
+    items = store.get_range(
+        Key(KeyType.TIMESTAMP, 'user1', 'session'), START, START + timedelta(hours=30))
+    assert [item['events'] for _, item in items] == list(range(1, 30))
+    assert store.query_stats['user1']['pages'] == 4
+
+
+def test_get_range_timestamp_count_stops_reading_pages(resource: FakeDynamoResource) -> None:
+    store = get_store(resource, {'QueryPageSize': 2, 'QueryPrefetch': True})
+    save_blocks(store, 35)
+
+    items = store.get_range(
+        Key(KeyType.TIMESTAMP, 'user1', 'session'), START + timedelta(hours=20), None, -3)
+    assert [item['events'] for _, item in items] == [17, 18, 19]
+    assert store.query_stats['user1']['pages'] == 2
+
+    items = store.get_range(Key(KeyType.TIMESTAMP, 'user1', 'session'), START, None, 5)
+    assert [item['events'] for _, item in items] == [1, 2, 3, 4, 5]
+
+
+def test_finalize_clears_query_stats(resource: FakeDynamoResource) -> None:
+    store = get_store(resource)
+    save_blocks(store, 1)
+    store.get_all('user1')
+    store.finalize()
+
+    assert store.query_stats == {}
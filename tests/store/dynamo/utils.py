@@ -4,3 +4,131 @@ DYNAMODB_KWARGS = {
     'aws_access_key_id': 'anything',
     'aws_secret_access_key': 'anything'
 }
+
+
+class FakeDynamoTable:
+    """ In-process stand-in for a boto3 DynamoDB Table that records the requests made """
+
+    def __init__(self, resource: 'FakeDynamoResource') -> None:
+        self._resource = resource
+        self.creation_date_time = 'now'
+
+    def get_item(self, Key):
+        self._resource.requests['get_item'] += 1
+        item = self._resource.items.get((Key['partition_key'], Key['range_key']), None)
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self._resource.requests['put_item'] += 1
+        self._resource.items[(Item['partition_key'], Item['range_key'])] = dict(Item)
+
+    def query(self,
+              KeyConditionExpression,
+              FilterExpression=None,
+              Limit=None,
+              ScanIndexForward=True,
+              ExclusiveStartKey=None,
+              ReturnConsumedCapacity=None):
+        self._resource.requests['query'] += 1
+        items = [
+            item for _, item in sorted(self._resource.items.items(), reverse=not ScanIndexForward)
+            if evaluate_condition(KeyConditionExpression, item)
+        ]
+        if ExclusiveStartKey:
+            start = [(item['partition_key'], item['range_key']) for item in items].index(
+                (ExclusiveStartKey['partition_key'], ExclusiveStartKey['range_key']))
+            items = items[start + 1:]
+
+        response = {}
+        if Limit and len(items) > Limit:
+            items = items[:Limit]
+            response['LastEvaluatedKey'] = {
+                'partition_key': items[-1]['partition_key'],
+                'range_key': items[-1]['range_key']
+            }
+        if ReturnConsumedCapacity:
+            response['ConsumedCapacity'] = {'CapacityUnits': len(items) * 0.5}
+        response['Items'] = [
+            dict(item) for item in items
+            if FilterExpression is None or evaluate_condition(FilterExpression, item)
+        ]
+        return response
+
+
+def evaluate_condition(condition, item) -> bool:
+    """ Evaluates the boto3 conditions used by DynamoStore against an item """
+    expression = condition.get_expression()
+    operator, values = expression['operator'], expression['values']
+    if operator == 'AND':
+        return all(evaluate_condition(value, item) for value in values)
+
+    value = item.get(values[0].name, None)
+    if value is None:
+        return False
+    if operator == '=':
+        return value == values[1]
+    if operator == '>':
+        return value > values[1]
+    if operator == '<':
+        return value < values[1]
+    if operator == 'BETWEEN':
+        return values[1] <= value <= values[2]
+    if operator == 'begins_with':
+        return value.startswith(values[1])
+    raise NotImplementedError(operator)
+
+
+class FakeDynamoResource:
+    """
+    In-process stand-in for the boto3 DynamoDB resource. `unprocessed_batches` is the number of
+    batch requests for which the last item / key is returned as unprocessed.
+    """
+
+    def __init__(self, unprocessed_batches: int = 0) -> None:
+        self.items = {}
+        self.requests = {'get_item': 0, 'put_item': 0, 'query': 0, 'batch_write_item': 0,
+                         'batch_get_item': 0}
+        self.batch_sizes = []
+        self.unprocessed_batches = unprocessed_batches
+
+    def Table(self, name: str) -> FakeDynamoTable:
+        return FakeDynamoTable(self)
+
+    def batch_write_item(self, RequestItems):
+        self.requests['batch_write_item'] += 1
+        (table, requests), = RequestItems.items()
+        assert len(requests) <= 25
+        self.batch_sizes.append(len(requests))
+        unprocessed = []
+        if self.unprocessed_batches:
+            self.unprocessed_batches -= 1
+            requests, unprocessed = requests[:-1], requests[-1:]
+        for request in requests:
+            item = request['PutRequest']['Item']
+            self.items[(item['partition_key'], item['range_key'])] = dict(item)
+        return {'UnprocessedItems': {table: unprocessed} if unprocessed else {}}
+
+    def batch_get_item(self, RequestItems):
+        self.requests['batch_get_item'] += 1
+        (table, request), = RequestItems.items()
+        keys = request['Keys']
+        assert len(keys) <= 100
+        self.batch_sizes.append(len(keys))
+        unprocessed = []
+        if self.unprocessed_batches:
+            self.unprocessed_batches -= 1
+            keys, unprocessed = keys[:-1], keys[-1:]
+        items = [
+            dict(self.items[(key['partition_key'], key['range_key'])]) for key in keys
+            if (key['partition_key'], key['range_key']) in self.items
+        ]
+        return {
+            'Responses': {
+                table: items
+            },
+            'UnprocessedKeys': {
+                table: {
+                    'Keys': unprocessed
+                }
+            } if unprocessed else {}
+        }